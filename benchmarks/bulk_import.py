@@ -0,0 +1,77 @@
+"""
+Бенчмарк загрузки баллов из CSV-файла
+
+Генерирует CSV-файл (по умолчанию 200 000 пользователей по 5 предметов = 1 000 000 строк)
+и загружает его дважды: первый раз создаются пользователи и баллы, второй раз - только
+обновляются баллы. Все изменения выполняются внутри транзакции, которая в конце откатывается.
+
+Запуск (нужна БД с примененными миграциями, параметры подключения берутся из .env):
+    python -m benchmarks.bulk_import --users 200000 --subjects 5
+"""
+import argparse
+import asyncio
+import csv
+import random
+import time
+from tempfile import TemporaryFile
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.admin.service import open_csv, run_import
+from bot.database import engine, maintenance_engine
+from bot.scores.service import load_subjects
+from bot.scores.subjects import subject_registry
+
+TELEGRAM_ID_OFFSET = 9_000_000_000_000  # Диапазон Telegram ID синтетических пользователей
+
+
+def write_csv(file, users_count: int, subjects_count: int) -> int:
+    text_file = open_csv(file)
+    writer = csv.writer(text_file)
+    writer.writerow(["telegram_id", "first_name", "last_name", "subject", "score"])
+    rows = 0
+    for i in range(users_count):
+        for subject in random.sample(subject_registry.names, subjects_count):
+            writer.writerow([TELEGRAM_ID_OFFSET + i, "Имя", "Фамилия", subject, random.randint(0, 100)])
+            rows += 1
+    text_file.flush()
+    text_file.detach()
+    return rows
+
+
+async def main(users_count: int, subjects_count: int) -> None:
+    logger.remove()  # Логи не должны влиять на измерения
+    await load_subjects()
+    with TemporaryFile() as file:
+        started = time.perf_counter()
+        rows = write_csv(file, users_count, subjects_count)
+        print(f"Сгенерирован файл: {rows} строк, {file.tell() / 1024 / 1024:.1f} МБ "
+              f"за {time.perf_counter() - started:.1f} с")
+
+        async with maintenance_engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                session = AsyncSession(bind=conn, join_transaction_mode="create_savepoint")
+                for title in ("новые пользователи и баллы", "обновление существующих баллов"):
+                    file.seek(0)
+                    text_file = open_csv(file)
+                    started = time.perf_counter()
+                    report = await run_import(session, text_file)
+                    elapsed = time.perf_counter() - started
+                    text_file.detach()
+                    print(
+                        f"{title}: {elapsed:.1f} с, {rows / elapsed:,.0f} строк/с "
+                        f"(пользователей создано {report.users_created}, баллов сохранено {report.scores_saved}, "
+                        f"ошибок {report.errors_count})"
+                    )
+            finally:
+                await transaction.rollback()
+    await maintenance_engine.dispose()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200_000, help="Количество пользователей в файле")
+    parser.add_argument("--subjects", type=int, default=5, help="Количество предметов у каждого пользователя")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.subjects))
@@ -0,0 +1,86 @@
+"""
+Бенчмарк массовой записи через BaseDAO
+
+Сравнивает время добавления пользователей через add_many (ORM), upsert_many
+(INSERT ... ON CONFLICT пачками) и bulk_insert (COPY), а также повторный upsert_many
+по тем же ключам (обновление существующих записей). Все изменения выполняются
+внутри транзакции, которая в конце откатывается.
+
+Запуск (нужна БД с примененными миграциями, параметры подключения берутся из .env):
+    python -m benchmarks.bulk_write --rows 1000 100000
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.database import engine
+from bot.users.dao import UsersDAO
+from bot.users.schemas import TelegramUserModel
+
+TELEGRAM_ID_OFFSET = 9_000_000_000_000  # Диапазон Telegram ID синтетических пользователей
+
+
+def make_users(start: int, count: int) -> List[TelegramUserModel]:
+    return [
+        TelegramUserModel(telegram_id=TELEGRAM_ID_OFFSET + start + i, first_name="Имя", last_name="Фамилия")
+        for i in range(count)
+    ]
+
+
+async def measure(write: Callable[[AsyncSession, List[TelegramUserModel]], Awaitable],
+                  session: AsyncSession, users: List[TelegramUserModel]) -> float:
+    started = time.perf_counter()
+    await write(session, users)
+    return time.perf_counter() - started
+
+
+async def add_many(session: AsyncSession, users: List[TelegramUserModel]):
+    return await UsersDAO.add_many(session, users)
+
+
+async def upsert_many(session: AsyncSession, users: List[TelegramUserModel]):
+    return await UsersDAO.upsert_many(session, users, index_elements=["telegram_id"])
+
+
+async def bulk_insert(session: AsyncSession, users: List[TelegramUserModel]):
+    return await UsersDAO.bulk_insert(session, users)
+
+
+async def main(sizes: List[int]) -> None:
+    logger.remove()  # Логи DAO не должны влиять на измерения
+    print(f"{'Записей':>10} {'add_many':>12} {'upsert_many':>12} {'повторный upsert':>17} {'bulk_insert':>12}")
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            session = AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False)
+            start = 0
+            for write in (add_many, upsert_many, bulk_insert):  # Прогрев: компиляция запросов, кэши asyncpg
+                await write(session, make_users(start, 10))
+                start += 10
+            session.expunge_all()
+            for size in sizes:
+                timings = []
+                for write in (add_many, upsert_many):
+                    users = make_users(start, size)
+                    start += size
+                    timings.append(await measure(write, session, users))
+                    if write is upsert_many:
+                        timings.append(await measure(write, session, users))  # Те же ключи: только обновление
+                    session.expunge_all()
+                timings.append(await measure(bulk_insert, session, make_users(start, size)))
+                start += size
+                print(f"{size:>10} " + " ".join(
+                    f"{timing:>{width}.3f}" for timing, width in zip(timings, (12, 12, 17, 12))
+                ) + "  (сек)")
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000], help="Размеры пачек записей")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
@@ -0,0 +1,126 @@
+"""
+Проверка планов горячих запросов DAO к таблицам users и examscores
+
+Скрипт заполняет локальную БД синтетическими данными (внутри транзакции, которая
+в конце откатывается), выполняет основные запросы DAO, перехватывает сгенерированный SQL
+и проверяет через EXPLAIN, что ни один из них не выполняет последовательное сканирование
+(Seq Scan) таблиц users и examscores.
+
+Запуск (нужна БД с примененными миграциями, параметры подключения берутся из .env):
+    python -m benchmarks.check_query_plans --users 100000
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Any, Iterator, List, Tuple
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.database import engine
+from bot.scores.dao import ExamScoresDAO
+from bot.scores.schemas import UserIDModel
+from bot.users.dao import UsersDAO
+from bot.users.schemas import TelegramIDModel
+
+CHECKED_TABLES = {"users", "examscores"}
+TELEGRAM_ID_OFFSET = 9_000_000_000_000  # Диапазон Telegram ID синтетических пользователей
+
+
+async def seed(conn, users_count: int) -> None:
+    """Заполняет таблицы синтетическими пользователями и баллами (~1/3 предметов на пользователя)"""
+    # Построчный триггер гистограмм слишком замедляет массовую вставку: отключаем его до конца транзакции
+    # и заполняем гистограммы одним запросом
+    await conn.execute(text("ALTER TABLE examscores DISABLE TRIGGER USER"))
+    await conn.execute(text("SET LOCAL statement_timeout = 0"))  # Массовая вставка дольше обычного ограничения
+    await conn.execute(
+        text(
+            "INSERT INTO users (telegram_id, first_name, last_name) "
+            "SELECT CAST(:offset AS bigint) + g, 'Имя', 'Фамилия' FROM generate_series(1, :n) AS g"
+        ),
+        {"offset": TELEGRAM_ID_OFFSET, "n": users_count},
+    )
+    await conn.execute(
+        text(
+            "INSERT INTO examscores (user_id, subject_id, score) "
+            "SELECT u.id, s.id, (random() * 100)::int "
+            "FROM users AS u CROSS JOIN subjects AS s "
+            "WHERE u.telegram_id > CAST(:offset AS bigint) AND (u.id + s.id) % 3 = 0"
+        ),
+        {"offset": TELEGRAM_ID_OFFSET},
+    )
+    await conn.execute(
+        text(
+            "INSERT INTO scorehistograms (subject_id, score, count) "
+            "SELECT subject_id, score, count(*) FROM examscores "
+            "WHERE user_id IN (SELECT id FROM users WHERE telegram_id > CAST(:offset AS bigint)) "
+            "GROUP BY subject_id, score "
+            "ON CONFLICT (subject_id, score) DO UPDATE SET count = scorehistograms.count + excluded.count"
+        ),
+        {"offset": TELEGRAM_ID_OFFSET},
+    )
+    await conn.execute(text("ALTER TABLE examscores ENABLE TRIGGER USER"))
+    await conn.execute(text("ANALYZE users"))
+    await conn.execute(text("ANALYZE examscores"))
+
+
+def iter_plan_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+async def run_hot_queries(session: AsyncSession, telegram_id: int, subject_id: int = 1) -> None:
+    """Выполняет запросы, которые бот делает на команды пользователя"""
+    user = await UsersDAO.find_one_or_none(session, TelegramIDModel(telegram_id=telegram_id))
+    await ExamScoresDAO.find_all(session, filters=UserIDModel(user_id=user.id))
+    await ExamScoresDAO.find_user_score(session, telegram_id, subject_id)
+    await ExamScoresDAO.find_leaderboard_page(session, subject_id, 11)
+    await ExamScoresDAO.find_leaderboard_page(session, subject_id, 11, after=(50, 1))
+    await ExamScoresDAO.find_leaderboard_page(session, subject_id, 11, before=(50, 1))
+
+
+async def main(users_count: int) -> int:
+    captured: List[Tuple[str, Any]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    failures = 0
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            print(f"Заполнение таблиц: {users_count} пользователей...")
+            await seed(conn, users_count)
+
+            event.listen(engine.sync_engine, "before_cursor_execute", capture)
+            try:
+                session = AsyncSession(bind=conn, join_transaction_mode="create_savepoint")
+                await run_hot_queries(session, TELEGRAM_ID_OFFSET + users_count // 2)
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+            for statement, parameters in captured:
+                result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                plan = result.scalar()
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                seq_scans = [
+                    node["Relation Name"] for node in iter_plan_nodes(plan[0]["Plan"])
+                    if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in CHECKED_TABLES
+                ]
+                status = "FAIL" if seq_scans else "OK"
+                failures += bool(seq_scans)
+                print(f"[{status}] {' '.join(statement.split())}")
+                if seq_scans:
+                    print(f"       Seq Scan по таблицам: {', '.join(seq_scans)}")
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000, help="Количество синтетических пользователей")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.users)))
@@ -0,0 +1,97 @@
+"""
+Проверка восстановления сессии обновления после ошибки запроса
+
+Сервисы с декоратором connection используют одну сессию на все обновление, и часть из них перехватывает
+ошибки БД (возвращает None или False). Скрипт имитирует обработку обновления: выполняет сервис, запрос
+которого завершается ошибкой, и проверяет, что следующие запросы того же обновления (сервисы, чтение
+набора команд чата, как в finally хендлеров) выполняются, а не падают с "current transaction is aborted".
+
+Запуск (нужна БД с примененными миграциями, параметры подключения берутся из .env):
+    python -m benchmarks.check_session_recovery
+"""
+import asyncio
+import random
+import sys
+from typing import Optional
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.database import TRANSACTION_FAILED, async_session_maker, connection, current_session, engine
+from bot.users.dao import UsersDAO
+from bot.users.service import chat_commands
+
+
+@connection
+async def failing_service(session: AsyncSession) -> Optional[int]:
+    """Сервис, который перехватывает ошибку БД и возвращает None (как fetch_user или get_exam_scores)"""
+    try:
+        return (await session.execute(text("SELECT 1 / 0"))).scalar()
+    except Exception as e:
+        logger.info(f"Ошибка запроса обработана в сервисе: {type(e).__name__}")
+        return None
+
+
+@connection
+async def raising_service(session: AsyncSession) -> None:
+    """Сервис, который пробрасывает ошибку БД вызывающему коду (как get_existing_score)"""
+    await session.execute(text("SELECT CAST('x' AS integer)"))
+
+
+@connection
+async def count_users(session: AsyncSession) -> int:
+    return await UsersDAO.count(session)
+
+
+async def run_update() -> list:
+    """Запросы одного обновления в общей сессии (как в DatabaseSessionMiddleware), возвращает ошибки проверок"""
+    errors = []
+    chat_id = -random.randint(10 ** 12, 10 ** 13)  # Чат, набора команд которого нет ни в кэше, ни в БД
+    async with async_session_maker() as session:
+        token = current_session.set(session)
+        try:
+            expected = await count_users()
+
+            if await failing_service() is not None:
+                errors.append("запрос failing_service неожиданно выполнился")
+            try:
+                if await count_users() != expected:
+                    errors.append("после обработанной ошибки сервис вернул другой результат")
+                if await chat_commands.get(chat_id) is not None:
+                    errors.append("после обработанной ошибки прочитан чужой набор команд")
+            except Exception as e:
+                errors.append(f"после обработанной в сервисе ошибки запрос обновления не выполнился: {e}")
+
+            try:
+                await raising_service()
+                errors.append("запрос raising_service неожиданно выполнился")
+            except Exception:
+                pass
+            try:
+                if await count_users() != expected:
+                    errors.append("после проброшенной ошибки сервис вернул другой результат")
+            except Exception as e:
+                errors.append(f"после проброшенной из сервиса ошибки запрос обновления не выполнился: {e}")
+        finally:
+            current_session.reset(token)
+
+    # Признак ошибки не должен остаться на соединении, вернувшемся в пул
+    async with engine.connect() as conn:
+        if conn.info.get(TRANSACTION_FAILED):
+            errors.append("признак ошибки транзакции остался на соединении из пула")
+    return errors
+
+
+async def main() -> int:
+    try:
+        errors = await run_update()
+    finally:
+        await engine.dispose()
+    for error in errors:
+        print(f"ОШИБКА: {error}")
+    if not errors:
+        print("Запросы обновления выполняются после ошибки в одном из сервисов")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,99 @@
+"""
+Бенчмарк накладных расходов логирования в BaseDAO
+
+Сравнивает стоимость вызова UsersDAO.find_one_or_none без обращения к БД (сессия подменяется
+заглушкой) при прежнем подходе (f-строки на уровне INFO с синхронной записью в файл) и при
+текущем (отложенное форматирование на уровне DEBUG, синхронный или асинхронный файловый sink).
+
+Запуск:
+    python -m benchmarks.dao_logging --calls 20000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable
+from loguru import logger
+from sqlalchemy.future import select
+from bot.users.dao import UsersDAO
+from bot.users.models import Users
+from bot.users.schemas import TelegramIDModel
+
+
+class FakeResult:
+    def __init__(self, record):
+        self.record = record
+
+    def scalar_one_or_none(self):
+        return self.record
+
+
+class FakeSession:
+    """Заглушка сессии, возвращающая готовую запись без обращения к БД"""
+
+    def __init__(self):
+        self.record = Users(id=1, telegram_id=123456789, first_name="Иван", last_name="Петров")
+
+    async def execute(self, query):
+        return FakeResult(self.record)
+
+
+async def eager_find_one_or_none(session, filters):
+    """Прежняя реализация find_one_or_none: f-строки форматируются при каждом вызове"""
+    filter_dict = filters.model_dump(exclude_unset=True)
+    logger.info(f"Поиск {Users.__name__} с фильтрами: {filter_dict}")
+    query = select(Users).filter_by(**filter_dict)
+    result = await session.execute(query)
+    record = result.scalar_one_or_none()
+    if record:
+        logger.info(f"Запись {Users.__name__} найдена: {record}")
+    else:
+        logger.info(f"Запись {Users.__name__} не найдена по фильтрам: {filter_dict}")
+    return record
+
+
+def configure_sink(path: str, level: str, enqueue: bool = False, buffering: int = 1) -> None:
+    logger.remove()
+    logger.add(
+        path, level=level, rotation="10 MB", retention="7 days", compression="zip",
+        enqueue=enqueue, buffering=buffering
+    )
+
+
+async def measure(find: Callable[..., Awaitable], calls: int) -> float:
+    session = FakeSession()
+    filters = TelegramIDModel(telegram_id=123456789)
+    started = time.perf_counter()
+    for _ in range(calls):
+        await find(session, filters)
+    elapsed = time.perf_counter() - started
+    await logger.complete()
+    return elapsed / calls * 1_000_000
+
+
+async def main(calls: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "log.txt")
+        scenarios = [
+            ("до: f-строки, INFO, синхронный файл", eager_find_one_or_none, "INFO", False, 1),
+            ("после: уровень INFO (DEBUG отключен)", UsersDAO.find_one_or_none, "INFO", False, 1),
+            ("после: уровень DEBUG, синхронный файл", UsersDAO.find_one_or_none, "DEBUG", False, 1),
+            ("после: уровень DEBUG, файл с буфером 64 КБ", UsersDAO.find_one_or_none, "DEBUG", False, 65536),
+            ("после: уровень DEBUG, очередь и буфер 64 КБ", UsersDAO.find_one_or_none, "DEBUG", True, 65536),
+        ]
+        results = []
+        for title, find, level, enqueue, buffering in scenarios:
+            configure_sink(path, level, enqueue, buffering)
+            await measure(find, min(calls, 1000))  # Прогрев
+            results.append((title, await measure(find, calls)))
+        logger.remove()
+
+    for title, per_call in results:
+        print(f"{title:<50} {per_call:8.1f} мкс/вызов")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20_000, help="Количество вызовов в каждом сценарии")
+    asyncio.run(main(parser.parse_args().calls))
@@ -0,0 +1,318 @@
+"""
+Нагрузочный бенчмарк обработки обновлений внутри процесса
+
+Собирает диспетчер с настоящими маршрутами users и scores, хранилищем FSM и middleware сессии БД,
+подменяет HTTP-сессию бота заглушкой (запросы к Telegram не отправляются) и прогоняет через
+dp.feed_update полные сценарии синтетических пользователей: регистрацию (/register), ввод одного
+балла и нескольких баллов одним сообщением (/enter_scores) и просмотр баллов (/view_scores).
+Шаги одного пользователя выполняются последовательно, пользователи - параллельно.
+
+Выводит пропускную способность, p50/p95/p99 времени обработки и наибольшее количество запросов к БД
+за одно обновление по каждому обработчику. С --check-query-budgets превышение бюджета запросов
+обработчика (QUERY_BUDGETS в bot/querylog.py) считается ошибкой, а скрипт завершается с кодом 1.
+Результаты дописываются в файл (по строке JSON на запуск) и сравниваются с предыдущим запуском
+с теми же параметрами, чтобы замечать регрессии между коммитами. Синтетические пользователи
+и их данные удаляются из БД после замера.
+
+Запуск (нужна БД с примененными миграциями, параметры подключения берутся из .env):
+    python -m benchmarks.dispatcher_load --users 2000 --concurrency 50
+    python -m benchmarks.dispatcher_load --users 100 --check-query-budgets
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.base import DefaultKeyBuilder, StorageKey
+from aiogram.methods import TelegramMethod
+from aiogram.types import CallbackQuery, Chat, Message, TelegramObject, Update, User
+from loguru import logger
+from sqlalchemy import text
+from benchmarks.webhook_load import percentile
+from bot.config import bot, create_fsm_storage
+from bot.database import async_session_maker, engine
+from bot.middlewares.database import DatabaseSessionMiddleware
+from bot.middlewares.querylog import QueryTrackingMiddleware
+from bot.querylog import QUERY_BUDGETS, QueryBudgetExceeded
+from bot.scores.keyboards import ConfirmCallback, SubjectCallback
+from bot.scores.router import router as scores_router
+from bot.scores.service import load_subjects
+from bot.scores.subjects import subject_registry
+from bot.users.router import router as users_router
+from bot.users.service import chat_commands
+
+TELEGRAM_ID_OFFSET = 9_000_000_000_000  # Диапазон Telegram ID синтетических пользователей
+DEFAULT_RESULTS = os.path.join("benchmarks", "results", "dispatcher_load.jsonl")
+UNHANDLED = "<не обработано>"
+
+
+class StubSession(BaseSession):
+    """HTTP-сессия бота без сети: запоминает последний ответ в каждый чат и сразу возвращает результат"""
+
+    def __init__(self):
+        super().__init__()
+        self.replies: Dict[int, str] = {}
+        self.requests = 0
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        self.requests += 1
+        chat_id = getattr(method, "chat_id", None)
+        message_text = getattr(method, "text", None)
+        if message_text is None:
+            return True
+        self.replies[chat_id] = message_text
+        return Message(
+            message_id=next(self._message_ids), date=datetime.now(),
+            chat=Chat(id=chat_id, type="private"), text=message_text,
+        )
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class HandlerTraceMiddleware(BaseMiddleware):
+    """Запоминает имя обработчика, выбранного для обновления (для группировки замеров)"""
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        data["trace"]["handler"] = data["handler"].callback.__name__
+        return await handler(event, data)
+
+
+class UpdateFactory:
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def message(self, user_id: int, message_text: str) -> Update:
+        user = User(id=user_id, is_bot=False, first_name="Бенчмарк")
+        return Update(update_id=next(self._ids), message=Message(
+            message_id=next(self._ids), date=datetime.now(), chat=Chat(id=user_id, type="private"),
+            from_user=user, text=message_text,
+        ))
+
+    def callback(self, user_id: int, data: str) -> Update:
+        user = User(id=user_id, is_bot=False, first_name="Бенчмарк")
+        message = Message(message_id=next(self._ids), date=datetime.now(), chat=Chat(id=user_id, type="private"))
+        return Update(update_id=next(self._ids), callback_query=CallbackQuery(
+            id=str(next(self._ids)), from_user=user, chat_instance="benchmark", message=message, data=data,
+        ))
+
+
+def build_dispatcher(query_tracking: QueryTrackingMiddleware) -> Dispatcher:
+    """Диспетчер с теми же маршрутами, хранилищем FSM и middleware, что и у бота"""
+    dp = Dispatcher(storage=create_fsm_storage())
+    dp.update.outer_middleware(DatabaseSessionMiddleware(async_session_maker))
+    dp.message.middleware(query_tracking)
+    dp.callback_query.middleware(query_tracking)
+    dp.message.middleware(HandlerTraceMiddleware())
+    dp.callback_query.middleware(HandlerTraceMiddleware())
+    dp.include_router(users_router)
+    dp.include_router(scores_router)
+    return dp
+
+
+def user_scenario(user_id: int) -> List[Tuple[str, str, str]]:
+    """Шаги пользователя: (тип обновления, текст или данные кнопки, ожидаемый фрагмент ответа)"""
+    physics = subject_registry.get_id("Физика")
+    return [
+        ("message", "/register", "Введите ваше имя"),
+        ("message", "Иван", "введите вашу фамилию"),
+        ("message", "Петров", "Регистрация завершена"),
+        ("message", "/enter_scores", "Введите название предмета"),
+        ("message", "физика", "Подтвердите выбранный предмет"),
+        ("callback", SubjectCallback(code=physics).pack(), "Введите балл"),
+        ("message", str(user_id % 101), "успешно сохранен"),
+        ("message", "/enter_scores", "Введите название предмета"),
+        ("message", f"Химия {user_id % 97}\nБиология {user_id % 89}", "Сохранить баллы?"),
+        ("callback", ConfirmCallback(answer=True).pack(), "Баллы успешно сохранены"),
+        ("message", "/view_scores", "Ваши баллы"),
+    ]
+
+
+async def run_user(
+        dp: Dispatcher, session: StubSession, factory: UpdateFactory, user_id: int,
+        latencies: Dict[str, List[float]], errors: Dict[str, int], budget_violations: Set[str]
+) -> None:
+    for kind, payload, expected in user_scenario(user_id):
+        update = factory.message(user_id, payload) if kind == "message" else factory.callback(user_id, payload)
+        trace = {"handler": UNHANDLED}
+        session.replies.pop(user_id, None)
+        started = time.perf_counter()
+        try:
+            await dp.feed_update(bot, update, trace=trace)
+        except QueryBudgetExceeded as e:
+            errors[trace["handler"]] += 1
+            budget_violations.add(str(e))
+            return
+        latencies[trace["handler"]].append(time.perf_counter() - started)
+        if expected not in session.replies.get(user_id, ""):
+            errors[trace["handler"]] += 1
+            return  # Следующие шаги сценария без этого ответа не имеют смысла
+
+
+async def delete_users(user_ids: List[int]) -> None:
+    """Удаляет синтетических пользователей, их баллы, состояния FSM и команды чатов"""
+    key_builder = DefaultKeyBuilder()
+    fsm_keys = [
+        key_builder.build(StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id)) for user_id in user_ids
+    ]
+    async with async_session_maker() as session:
+        ids = {"ids": user_ids}
+        await session.execute(text(
+            "DELETE FROM examscores WHERE user_id IN (SELECT id FROM users WHERE telegram_id = ANY(:ids))"
+        ), ids)
+        await session.execute(text("DELETE FROM users WHERE telegram_id = ANY(:ids)"), ids)
+        await session.execute(text("DELETE FROM chatcommands WHERE chat_id = ANY(:ids)"), ids)
+        await session.execute(text("DELETE FROM fsmstates WHERE key = ANY(:keys)"), {"keys": fsm_keys})
+        await session.commit()
+
+
+async def cleanup(dp: Dispatcher, user_ids: List[int]) -> None:
+    # Сначала сохраняем отложенные изменения, иначе они записались бы в БД уже после удаления
+    await dp.storage.close()
+    await chat_commands.close()
+    await delete_users(user_ids)
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(latencies),
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+    }
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(path: str, users: int, concurrency: int) -> Optional[Dict[str, Any]]:
+    """Последний сохраненный результат с теми же параметрами"""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            if record["users"] == users and record["concurrency"] == concurrency:
+                previous = record
+    return previous
+
+
+def change(current: float, before: float) -> str:
+    return f"{(current - before) / before * 100:+.0f}%" if before else ""
+
+
+def report(result: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> None:
+    print(
+        f"Пользователей: {result['users']}, параллельно: {result['concurrency']}, обновлений: {result['updates']}, "
+        f"ошибок: {result['errors']}, запросов к Telegram: {result['telegram_requests']}"
+    )
+    line = f"Пропускная способность: {result['throughput']:.0f} обновлений/с за {result['elapsed']:.2f} с"
+    if previous:
+        line += f" (было {previous['throughput']:.0f} в {previous['commit']}, {change(result['throughput'], previous['throughput'])})"
+    print(line)
+
+    print(
+        f"\n{'Обработчик':<40}{'кол-во':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'запросов':>10}  p95 было"
+    )
+    previous_handlers = previous["handlers"] if previous else {}
+    for name, stats in result["handlers"].items():
+        before = previous_handlers.get(name)
+        was = f"{before['p95']:.1f} ({change(stats['p95'], before['p95'])})" if before else ""
+        print(
+            f"{name:<40}{stats['count']:>8}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}"
+            f"{result['queries'].get(name, ''):>10}  {was}"
+        )
+
+
+async def main(args: argparse.Namespace) -> None:
+    logger.remove()  # Логи не должны влиять на измерения
+    await load_subjects()
+    session = StubSession()
+    bot.session = session
+    # Запросы к БД считаются всегда, бюджеты проверяются только по запросу
+    query_tracking = QueryTrackingMiddleware(QUERY_BUDGETS, repeat_threshold=0, strict=args.check_query_budgets)
+    dp = build_dispatcher(query_tracking)
+    factory = UpdateFactory()
+    user_ids = [TELEGRAM_ID_OFFSET + i for i in range(args.users)]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    budget_violations: Set[str] = set()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def simulate(user_id: int) -> None:
+        async with semaphore:
+            await run_user(dp, session, factory, user_id, latencies, errors, budget_violations)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(simulate(user_id) for user_id in user_ids))
+        elapsed = time.perf_counter() - started
+    finally:
+        await cleanup(dp, user_ids)
+        await engine.dispose()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    handlers = {name: summarize(values) for name, values in sorted(latencies.items())}
+    handlers["Все обновления"] = summarize(all_latencies)
+    result = {
+        "commit": current_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "updates": len(all_latencies),
+        "errors": sum(errors.values()),
+        "errors_by_handler": dict(errors),
+        "telegram_requests": session.requests,
+        "elapsed": elapsed,
+        "throughput": len(all_latencies) / elapsed,
+        "handlers": handlers,
+        "queries": dict(sorted(query_tracking.max_queries.items())),
+    }
+    report(result, load_previous(args.results, args.users, args.concurrency))
+    if errors:
+        print(f"\nОшибки по обработчикам: {dict(errors)}")
+
+    os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as file:
+        file.write(json.dumps(result, ensure_ascii=False) + "\n")
+    print(f"\nРезультат сохранен в {args.results}")
+
+    if budget_violations:
+        print("\nПревышены бюджеты запросов к БД:")
+        for violation in sorted(budget_violations):
+            print(f"  {violation}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2_000, help="Количество синтетических пользователей")
+    parser.add_argument("--concurrency", type=int, default=50, help="Количество одновременно активных пользователей")
+    parser.add_argument(
+        "--check-query-budgets", action="store_true", help="Считать превышение бюджета запросов к БД ошибкой"
+    )
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="Файл для сохранения результатов (JSON Lines)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,253 @@
+"""
+Локальная заглушка Telegram Bot API для сквозных нагрузочных тестов
+
+Запускает aiohttp-сервер, который отвечает боту вместо api.telegram.org: отдает через getUpdates
+обновления синтетических пользователей и записывает каждый исходящий вызов бота с отметкой времени.
+Пользователи проходят тот же сценарий, что и в benchmarks.dispatcher_load (регистрация, ввод
+одного и нескольких баллов, просмотр баллов): следующее обновление пользователя отправляется,
+только когда бот ответил на предыдущее ожидаемым сообщением.
+
+Выводит сквозную пропускную способность, p50/p95/p99 времени ответа (от постановки обновления
+в очередь до ответа бота, без паузы пользователя между действиями) и количество исходящих вызовов каждого метода на одно действие
+пользователя. Журнал вызовов сохраняется в файл (по строке JSON на вызов). Синтетические
+пользователи удаляются из БД после замера.
+
+Запуск (бот запускается отдельно в режиме polling с адресом заглушки):
+    python -m benchmarks.fake_bot_api --port 8081 --users 1000 --concurrency 100
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python -m bot.main
+
+Ограничитель частоты бота рассчитан на лимиты Telegram, поэтому для замера пропускной способности
+самого бота поднимите TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE и TELEGRAM_CHAT_BURST.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from aiohttp import web
+from loguru import logger
+from benchmarks.dispatcher_load import delete_users, user_scenario
+from benchmarks.webhook_load import make_update, percentile
+from bot.config import settings
+from bot.database import engine
+from bot.scores.service import load_subjects
+
+TELEGRAM_ID_OFFSET = 9_000_000_000_000  # Диапазон Telegram ID синтетических пользователей
+DEFAULT_CALLS_LOG = os.path.join("benchmarks", "results", "fake_bot_api_calls.jsonl")
+MESSAGE_METHODS = {"sendmessage", "editmessagetext", "senddocument"}
+
+
+def make_callback_update(update_id: int, user_id: int, data: str) -> Dict[str, Any]:
+    """Формирует обновление Telegram с нажатием инлайн-кнопки"""
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": f"{user_id}:{update_id}",
+            "from": {"id": user_id, "is_bot": False, "first_name": "Бенчмарк"},
+            "chat_instance": "benchmark",
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private", "first_name": "Бенчмарк"},
+                "text": "Бенчмарк",
+            },
+            "data": data,
+        },
+    }
+
+
+class SimulatedUser:
+    """Пользователь, проходящий сценарий: следующий шаг отправляется после ожидаемого ответа бота"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.steps: Iterator[Tuple[str, str, str]] = iter(user_scenario(user_id))
+        self.expected: Optional[str] = None
+        self.sent_at = 0.0
+
+
+class FakeBotAPI:
+    """Bot API сервер с очередью обновлений для getUpdates и журналом исходящих вызовов"""
+
+    def __init__(self, user_ids: List[int], concurrency: int, poll_timeout: float, think_time: float):
+        self.poll_timeout = poll_timeout
+        self.think_time = think_time
+        self.waiting = [SimulatedUser(user_id) for user_id in reversed(user_ids)]
+        self.active: Dict[int, SimulatedUser] = {}
+        self.concurrency = concurrency
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.pending: List[Dict[str, Any]] = []
+        self.has_updates = asyncio.Event()
+        self.done = asyncio.Event()
+        self.calls: List[Tuple[float, str, Optional[int]]] = []
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.started_at: Optional[float] = None
+        self.started_wall = 0.0  # Время начала замера для журнала вызовов
+        self.finished_at: Optional[float] = None
+
+    def start_users(self) -> None:
+        while self.waiting and len(self.active) < self.concurrency:
+            user = self.waiting.pop()
+            self.active[user.user_id] = user
+            self.next_step(user)
+        if not self.active:
+            self.finished_at = time.perf_counter()
+            self.done.set()
+
+    def next_step(self, user: SimulatedUser) -> None:
+        step = next(user.steps, None)
+        if step is None:
+            del self.active[user.user_id]
+            self.start_users()
+            return
+        kind, payload, user.expected = step
+        update_id = next(self.update_ids)
+        if kind == "message":
+            update = make_update(update_id, user.user_id, payload)
+        else:
+            update = make_callback_update(update_id, user.user_id, payload)
+        user.sent_at = time.perf_counter()
+        self.pending.append(update)
+        self.has_updates.set()
+
+    def on_message(self, chat_id: Optional[int], message_text: str) -> None:
+        """Ответ бота пользователю: переход к следующему шагу или завершение сценария с ошибкой"""
+        user = self.active.get(chat_id)
+        if user is None or user.expected is None:
+            return
+        if user.expected in message_text:
+            self.latencies.append(time.perf_counter() - user.sent_at)
+            user.expected = None
+            # Пауза перед следующим действием: хендлер продолжает работу и после отправки ответа
+            # (например, сбрасывает состояние), а живой пользователь не отвечает мгновенно
+            asyncio.get_running_loop().call_later(self.think_time, self.next_step, user)
+        else:
+            logger.warning(f"Пользователь {chat_id}: ожидалось «{user.expected}», получено «{message_text[:60]}»")
+            self.errors += 1
+            del self.active[chat_id]
+            self.start_users()
+
+    async def get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if self.started_at is None:
+            # Бот начал получать обновления - запускаем сценарии
+            self.started_at = time.perf_counter()
+            self.started_wall = time.time()
+            self.start_users()
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        self.pending = [update for update in self.pending if update["update_id"] >= offset]
+        if not self.pending:
+            self.has_updates.clear()
+            try:
+                await asyncio.wait_for(
+                    self.has_updates.wait(), timeout=min(float(params.get("timeout") or 0), self.poll_timeout)
+                )
+            except asyncio.TimeoutError:
+                pass
+        return self.pending[:limit]
+
+    def message_result(self, chat_id: Optional[int], message_text: Optional[str]) -> Dict[str, Any]:
+        return {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": message_text or "",
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post()) if request.can_read_body else {}
+        params.update(request.query)
+        name = method.lower()
+        chat_id = int(params["chat_id"]) if str(params.get("chat_id", "")).lstrip("-").isdigit() else None
+        if name != "getupdates":
+            self.calls.append((time.time(), method, chat_id))
+
+        if name == "getupdates":
+            result: Any = await self.get_updates(params)
+        elif name == "getme":
+            bot_id = int(request.match_info["token"].split(":")[0])
+            result = {"id": bot_id, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        elif name == "getmycommands":
+            result = []
+        elif name in MESSAGE_METHODS:
+            message_text = params.get("text") or params.get("caption")
+            result = self.message_result(chat_id, message_text)
+            self.on_message(chat_id, message_text or "")
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+def report(api: FakeBotAPI, users: int) -> None:
+    elapsed = (api.finished_at or time.perf_counter()) - (api.started_at or time.perf_counter())
+    actions = len(api.latencies) + api.errors
+    print(f"Пользователей: {users}, действий: {actions}, ошибок: {api.errors}")
+    if not api.latencies or not elapsed:
+        return
+    print(f"Сквозная пропускная способность: {len(api.latencies) / elapsed:.0f} обновлений/с за {elapsed:.2f} с")
+    print(
+        f"Время ответа: p50={percentile(api.latencies, 50) * 1000:.1f} мс, "
+        f"p95={percentile(api.latencies, 95) * 1000:.1f} мс, p99={percentile(api.latencies, 99) * 1000:.1f} мс"
+    )
+    workload_calls = Counter(method for timestamp, method, _ in api.calls if timestamp >= api.started_wall)
+    print(f"\nИсходящие вызовы во время замера: {sum(workload_calls.values())} "
+          f"({sum(workload_calls.values()) / actions:.2f} на действие)")
+    for method, count in workload_calls.most_common():
+        print(f"  {method:<24}{count:>8}{count / actions:>8.2f} на действие")
+
+
+def save_calls(api: FakeBotAPI, path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        for timestamp, method, chat_id in api.calls:
+            file.write(json.dumps({"time": timestamp, "method": method, "chat_id": chat_id}) + "\n")
+    print(f"Журнал вызовов ({len(api.calls)}) сохранен в {path}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    await load_subjects()
+    # Каждый запуск использует новых пользователей: работающий бот кэширует данные прежних
+    first_id = TELEGRAM_ID_OFFSET + int(time.time()) % 1_000_000 * 100_000
+    user_ids = [first_id + i for i in range(args.users)]
+    api = FakeBotAPI(user_ids, args.concurrency, args.poll_timeout, args.think_time)
+
+    app = web.Application()
+    app.router.add_route("*", "/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=args.host, port=args.port).start()
+    print(f"Bot API заглушка слушает http://{args.host}:{args.port}, ожидание бота...")
+
+    try:
+        await asyncio.wait_for(api.done.wait(), timeout=args.timeout)
+    except asyncio.TimeoutError:
+        print(f"Сценарии не завершились за {args.timeout} с, незавершенных пользователей: {len(api.active)}")
+    finally:
+        report(api, args.users)
+        save_calls(api, args.calls_log)
+        await runner.cleanup()
+        # Даем боту сохранить отложенные изменения FSM и команд, чтобы удалить и их
+        await asyncio.sleep(settings.FSM_FLUSH_INTERVAL + settings.CHAT_COMMANDS_FLUSH_INTERVAL + 1)
+        await delete_users(user_ids)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес для входящих запросов бота")
+    parser.add_argument("--port", type=int, default=8081, help="Порт для входящих запросов бота")
+    parser.add_argument("--users", type=int, default=1_000, help="Количество синтетических пользователей")
+    parser.add_argument("--concurrency", type=int, default=100, help="Количество одновременно активных пользователей")
+    parser.add_argument(
+        "--think-time", type=float, default=0.1, help="Пауза пользователя перед следующим действием (сек)"
+    )
+    parser.add_argument("--poll-timeout", type=float, default=1.0, help="Максимальное ожидание в getUpdates (сек)")
+    parser.add_argument("--timeout", type=float, default=600, help="Ограничение времени замера (сек)")
+    parser.add_argument("--calls-log", default=DEFAULT_CALLS_LOG, help="Файл журнала исходящих вызовов (JSON Lines)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,151 @@
+"""
+Бенчмарк и проверка качества поиска предмета по введенному тексту
+
+Сравнивает прежний алгоритм check_subject (поиск подстроки и difflib.get_close_matches)
+с индексом SubjectMatcher по скорости и по точности на корпусе типичных вводов пользователей.
+Ответ считается верным, если найденный набор предметов совпадает с ожидаемым.
+
+Запуск:
+    python -m benchmarks.subject_matching --rounds 200
+"""
+import argparse
+import time
+from difflib import get_close_matches
+from typing import Callable, List, Sequence, Set, Tuple
+from bot.scores.subjects import EXAM_SUBJECTS, subject_matcher
+
+BASE_MATH = "Математика (базовая)"
+PROFILE_MATH = "Математика (профильная)"
+MATH = {BASE_MATH, PROFILE_MATH}
+
+# Ввод пользователя -> ожидаемый набор предметов
+CORPUS: List[Tuple[str, Set[str]]] = [
+    # Полные и частичные названия
+    ("Русский язык", {"Русский язык"}),
+    ("русский", {"Русский язык"}),
+    ("Физика", {"Физика"}),
+    ("химия", {"Химия"}),
+    ("Биология", {"Биология"}),
+    ("история", {"История"}),
+    ("география", {"География"}),
+    ("литература", {"Литература"}),
+    ("информатика", {"Информатика"}),
+    ("обществознание", {"Обществознание"}),
+    ("английский", {"Английский язык"}),
+    ("немецкий", {"Немецкий язык"}),
+    ("французский язык", {"Французский язык"}),
+    ("испанский", {"Испанский язык"}),
+    ("математика", MATH),
+    ("Математика профильная", {PROFILE_MATH}),
+    ("математика (базовая)", {BASE_MATH}),
+    ("профильная математика", {PROFILE_MATH}),
+    ("базовая математика", {BASE_MATH}),
+    # Сокращения и разговорные названия
+    ("матеша", MATH),
+    ("матан", MATH),
+    ("мат", MATH),
+    ("профиль", {PROFILE_MATH}),
+    ("профилька", {PROFILE_MATH}),
+    ("база", {BASE_MATH}),
+    ("инфа", {"Информатика"}),
+    ("инф", {"Информатика"}),
+    ("икт", {"Информатика"}),
+    ("англ", {"Английский язык"}),
+    ("инглиш", {"Английский язык"}),
+    ("общага", {"Обществознание"}),
+    ("общество", {"Обществознание"}),
+    ("рус", {"Русский язык"}),
+    ("литра", {"Литература"}),
+    ("лит-ра", {"Литература"}),
+    ("био", {"Биология"}),
+    ("хим", {"Химия"}),
+    ("физ", {"Физика"}),
+    ("гео", {"География"}),
+    ("нем", {"Немецкий язык"}),
+    ("исп", {"Испанский язык"}),
+    # Опечатки
+    ("физекa", {"Физика"}),
+    ("биолгия", {"Биология"}),
+    ("геогрaфя", {"География"}),
+    ("обществозание", {"Обществознание"}),
+    ("ангийский", {"Английский язык"}),
+    ("информатика!", {"Информатика"}),
+    ("хмия", {"Химия"}),
+    ("литиратура", {"Литература"}),
+    ("русский язык ", {"Русский язык"}),
+    # Латиница: английские названия и транслитерация
+    ("math", MATH),
+    ("physics", {"Физика"}),
+    ("chemistry", {"Химия"}),
+    ("english", {"Английский язык"}),
+    ("history", {"История"}),
+    ("biology", {"Биология"}),
+    ("matematika", MATH),
+    ("fizika", {"Физика"}),
+    ("himiya", {"Химия"}),
+    ("istoriya", {"История"}),
+    ("informatika", {"Информатика"}),
+    ("obshestvoznanie", {"Обществознание"}),
+    ("literatura", {"Литература"}),
+    ("geografiya", {"География"}),
+    ("biologiya", {"Биология"}),
+    ("russkiy", {"Русский язык"}),
+    # Не относящиеся к предметам вводы
+    ("привет", set()),
+    ("12345", set()),
+]
+
+
+def old_check_subject(subject_entered: str) -> List[str]:
+    """Прежняя реализация check_subject"""
+    matching_subjects = [subject for subject in EXAM_SUBJECTS if subject_entered.lower() in subject.lower()]
+    if not matching_subjects:
+        matching_subjects = get_close_matches(subject_entered, EXAM_SUBJECTS, n=3, cutoff=0.3)
+    return matching_subjects
+
+
+def new_check_subject(subject_entered: str) -> Sequence[str]:
+    return subject_matcher.match(subject_entered)
+
+
+def accuracy(check: Callable[[str], Sequence[str]]) -> Tuple[float, List[str]]:
+    errors = []
+    for text, expected in CORPUS:
+        found = set(check(text))
+        if found != expected:
+            errors.append(f"{text!r}: ожидалось {sorted(expected)}, найдено {sorted(found)}")
+    return 1 - len(errors) / len(CORPUS), errors
+
+
+def timing(check: Callable[[str], Sequence[str]], rounds: int, clear_cache: bool = False) -> float:
+    total = 0.0
+    for _ in range(rounds):
+        if clear_cache:
+            subject_matcher.match.cache_clear()
+        started = time.perf_counter()
+        for text, _ in CORPUS:
+            check(text)
+        total += time.perf_counter() - started
+    return total / (rounds * len(CORPUS)) * 1_000_000
+
+
+def main(rounds: int, verbose: bool) -> None:
+    print(f"Корпус: {len(CORPUS)} вводов")
+    for title, check in (("прежний алгоритм", old_check_subject), ("SubjectMatcher", new_check_subject)):
+        score, errors = accuracy(check)
+        print(f"Точность ({title}): {score:.1%}, ошибок: {len(errors)}")
+        if verbose:
+            for error in errors:
+                print(f"    {error}")
+
+    print(f"Прежний алгоритм:            {timing(old_check_subject, rounds):8.1f} мкс/вызов")
+    print(f"SubjectMatcher без кэша:     {timing(new_check_subject, rounds, clear_cache=True):8.1f} мкс/вызов")
+    print(f"SubjectMatcher с LRU-кэшем:  {timing(new_check_subject, rounds):8.1f} мкс/вызов")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200, help="Количество проходов по корпусу")
+    parser.add_argument("--verbose", action="store_true", help="Показать ошибочные ответы")
+    args = parser.parse_args()
+    main(args.rounds, args.verbose)
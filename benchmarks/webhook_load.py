@@ -0,0 +1,87 @@
+"""
+Нагрузочный стенд для режима вебхука
+
+Отправляет на вебхук бота синтетические обновления (текстовые сообщения от разных
+пользователей) и измеряет пропускную способность приема обновлений и время ответа сервера.
+Бот при этом должен быть запущен с BOT_MODE=webhook. Исходящие запросы бота уходят
+на настроенный Bot API сервер, поэтому для замеров без реального Telegram его нужно
+направить на локальную заглушку.
+
+Запуск:
+    python -m benchmarks.webhook_load --url http://127.0.0.1:8080/webhook --secret <WEBHOOK_SECRET> \\
+        --updates 10000 --concurrency 100 --text /view_scores
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from typing import Any, Dict, List
+from aiohttp import ClientSession, TCPConnector
+
+USER_ID_OFFSET = 9_000_000_000  # Диапазон ID синтетических пользователей
+
+
+def make_update(update_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    """Формирует обновление Telegram с текстовым сообщением от пользователя"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": "Бенчмарк"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Бенчмарк"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+            if text.startswith("/") else [],
+        },
+    }
+
+
+def percentile(values: List[float], percent: int) -> float:
+    return statistics.quantiles(values, n=100)[percent - 1] if len(values) > 1 else values[0]
+
+
+async def main(args: argparse.Namespace) -> None:
+    update_ids = itertools.count(1)
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for i in range(args.updates):
+        queue.put_nowait(i)
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret}
+    async with ClientSession(connector=TCPConnector(limit=args.concurrency)) as http:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                i = queue.get_nowait()
+                update = make_update(next(update_ids), USER_ID_OFFSET + i % args.users, args.text)
+                started = time.perf_counter()
+                async with http.post(args.url, json=update, headers=headers) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - started
+
+    print(f"Обновлений: {args.updates}, параллельно: {args.concurrency}, ошибок: {errors}")
+    print(f"Пропускная способность: {args.updates / elapsed:.0f} обновлений/с за {elapsed:.2f} с")
+    print(
+        f"Время ответа: p50={percentile(latencies, 50) * 1000:.1f} мс, "
+        f"p95={percentile(latencies, 95) * 1000:.1f} мс, p99={percentile(latencies, 99) * 1000:.1f} мс"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook", help="Адрес вебхука бота")
+    parser.add_argument("--secret", required=True, help="Значение WEBHOOK_SECRET")
+    parser.add_argument("--updates", type=int, default=10_000, help="Количество отправляемых обновлений")
+    parser.add_argument("--concurrency", type=int, default=100, help="Количество параллельных запросов")
+    parser.add_argument("--users", type=int, default=1_000, help="Количество синтетических пользователей")
+    parser.add_argument("--text", default="/view_scores", help="Текст сообщений")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+from typing import Iterable, List, Tuple
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.dao.base import copy_records
+
+STAGING_TABLE = "import_staging"
+STAGING_COLUMNS = ["line", "telegram_id", "first_name", "last_name", "subject_id", "score"]
+
+
+class ScoresImportDAO:
+    """
+    Загрузка баллов через промежуточную временную таблицу
+    Все методы выполняются в транзакции переданной сессии и не фиксируют ее
+    """
+
+    @classmethod
+    async def create_staging(cls, session: AsyncSession) -> None:
+        """Создать временную таблицу для загружаемых строк (удаляется при завершении транзакции)"""
+        await session.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+        await session.execute(text(
+            f"CREATE TEMPORARY TABLE {STAGING_TABLE} ("
+            "line integer NOT NULL, telegram_id bigint NOT NULL, "
+            "first_name varchar(100), last_name varchar(100), "
+            "subject_id smallint NOT NULL, score integer NOT NULL"
+            ") ON COMMIT DROP"
+        ))
+
+    @classmethod
+    async def copy_rows(cls, session: AsyncSession, rows: Iterable[Tuple]) -> int:
+        """Загрузить проверенные строки во временную таблицу командой COPY"""
+        return await copy_records(session, STAGING_TABLE, STAGING_COLUMNS, rows)
+
+    @classmethod
+    async def merge(cls, session: AsyncSession) -> Tuple[int, int]:
+        """
+        Перенести строки из временной таблицы одним запросом: создать отсутствующих пользователей
+        (если указаны имя и фамилия), найти ID всех пользователей по Telegram ID и создать или обновить баллы.
+        При повторе пары (пользователь, предмет) в файле сохраняется последняя строка.
+        Возвращает количество созданных пользователей и сохраненных баллов
+        """
+        logger.debug("Перенос загруженных баллов из {}", STAGING_TABLE)
+        try:
+            # У временной таблицы нет статистики, без нее планировщик ошибается в оценке числа строк
+            await session.execute(text(f"ANALYZE {STAGING_TABLE}"))
+            result = await session.execute(text(
+                f"""
+                WITH staged AS (
+                    SELECT DISTINCT ON (telegram_id, subject_id)
+                        line, telegram_id, first_name, last_name, subject_id, score
+                    FROM {STAGING_TABLE}
+                    ORDER BY telegram_id, subject_id, line DESC
+                ),
+                new_users AS (
+                    INSERT INTO users (telegram_id, first_name, last_name)
+                    SELECT DISTINCT ON (telegram_id) telegram_id, first_name, last_name
+                    FROM staged
+                    WHERE first_name IS NOT NULL AND last_name IS NOT NULL
+                    ORDER BY telegram_id, line DESC
+                    ON CONFLICT (telegram_id) DO NOTHING
+                    RETURNING id, telegram_id
+                ),
+                resolved AS (
+                    SELECT id, telegram_id FROM new_users
+                    UNION ALL
+                    SELECT id, telegram_id FROM users WHERE telegram_id IN (SELECT telegram_id FROM staged)
+                ),
+                saved AS (
+                    INSERT INTO examscores (user_id, subject_id, score)
+                    SELECT resolved.id, staged.subject_id, staged.score
+                    FROM staged JOIN resolved ON resolved.telegram_id = staged.telegram_id
+                    ON CONFLICT (user_id, subject_id) DO UPDATE SET score = excluded.score, updated_at = now()
+                    RETURNING 1
+                )
+                SELECT (SELECT count(*) FROM new_users), (SELECT count(*) FROM saved)
+                """
+            ))
+            users_created, scores_saved = result.one()
+            return users_created, scores_saved
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при переносе загруженных баллов: {e}")
+            raise
+
+    @classmethod
+    async def find_unknown_users(cls, session: AsyncSession, limit: int) -> Tuple[int, List[Tuple[int, int]]]:
+        """Найти строки, для которых не нашлось пользователя: их количество и первые limit (строка, Telegram ID)"""
+        unknown = (
+            f"FROM {STAGING_TABLE} AS s "
+            "WHERE NOT EXISTS (SELECT 1 FROM users AS u WHERE u.telegram_id = s.telegram_id)"
+        )
+        count = (await session.execute(text(f"SELECT count(*) {unknown}"))).scalar_one()
+        if not count:
+            return 0, []
+        rows = await session.execute(
+            text(f"SELECT line, telegram_id {unknown} ORDER BY line LIMIT :limit"), {"limit": limit}
+        )
+        return count, [tuple(row) for row in rows.all()]
@@ -0,0 +1,32 @@
+"""
+Выгрузка всех баллов с данными пользователей в CSV-файл
+
+Подходит для больших выгрузок, которые нельзя отправить через Telegram (больше 50 МБ).
+
+Запуск:
+    python -m bot.admin.export_scores --output scores.csv
+"""
+import argparse
+import asyncio
+from loguru import logger
+from bot.admin.service import write_scores_csv
+from bot.database import engine, maintenance_engine
+from bot.scores.service import load_subjects
+
+
+async def main(output: str) -> None:
+    try:
+        await load_subjects()
+        with open(output, "wb") as file:
+            rows_count = await write_scores_csv(file)
+        logger.info(f"Баллы выгружены в {output}: {rows_count} строк")
+    finally:
+        await maintenance_engine.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="scores.csv", help="Путь к CSV-файлу")
+    args = parser.parse_args()
+    asyncio.run(main(args.output))
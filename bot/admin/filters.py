@@ -0,0 +1,17 @@
+from aiogram.filters import BaseFilter
+from aiogram.types import CallbackQuery, Message
+from bot.config import settings
+
+# Множество для проверки за O(1)
+ADMIN_IDS = frozenset(settings.ADMIN_IDS)
+
+
+def is_admin(telegram_id: int) -> bool:
+    return telegram_id in ADMIN_IDS
+
+
+class IsAdmin(BaseFilter):
+    """Пропускает только сообщения и нажатия кнопок от администраторов (ADMIN_IDS)"""
+
+    async def __call__(self, event: Message | CallbackQuery) -> bool:
+        return event.from_user is not None and is_admin(event.from_user.id)
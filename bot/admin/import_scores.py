@@ -0,0 +1,33 @@
+"""
+Загрузка пользователей и баллов из CSV-файла
+
+Обязательные столбцы: telegram_id, subject, score. Для пользователей, которых еще нет в базе,
+нужны также first_name и last_name. Строки с ошибками пропускаются и попадают в отчет.
+
+Запуск:
+    python -m bot.admin.import_scores --input scores.csv
+"""
+import argparse
+import asyncio
+from loguru import logger
+from bot.admin.service import format_import_report, import_scores_csv, open_csv
+from bot.database import engine, maintenance_engine
+from bot.scores.service import load_subjects
+
+
+async def main(path: str) -> None:
+    try:
+        await load_subjects()
+        with open(path, "rb") as file:
+            report = await import_scores_csv(open_csv(file))
+        logger.info(f"Отчет о загрузке {path}:\n{format_import_report(report)}")
+    finally:
+        await maintenance_engine.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", required=True, help="Путь к CSV-файлу")
+    args = parser.parse_args()
+    asyncio.run(main(args.input))
@@ -0,0 +1,166 @@
+import asyncio
+from datetime import datetime
+from tempfile import SpooledTemporaryFile, TemporaryFile
+from aiogram import F
+from aiogram.dispatcher.router import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+from loguru import logger
+from bot.admin.filters import IsAdmin
+from bot.admin.service import SpooledInputFile, TELEGRAM_MAX_FILE_SIZE, write_scores_csv, open_csv, \
+    import_scores_csv, format_import_report
+from bot.broadcast.service import broadcaster, cancel_broadcast, create_broadcast, extract_broadcast_text, \
+    format_broadcast, get_last_broadcast
+from bot.config import bot, settings
+
+router = Router()
+router.message.filter(IsAdmin())
+
+# Одновременно выполняется не больше одной выгрузки и одной загрузки
+export_lock = asyncio.Lock()
+import_lock = asyncio.Lock()
+
+# Максимальный размер файла, который бот может скачать через Bot API
+TELEGRAM_MAX_DOWNLOAD_SIZE = 20 * 1024 * 1024
+
+
+@router.message(Command("export"))
+async def export_handler(message: Message):
+    """
+    Хендлер для команды /export
+    Выгружает все баллы в CSV-файл и отправляет его администратору
+    """
+    telegram_id = message.from_user.id
+    logger.info(f"Команда /export от администратора {telegram_id}")
+
+    if export_lock.locked():
+        await message.answer("Выгрузка уже выполняется. Попробуйте позже")
+        return
+
+    async with export_lock:
+        try:
+            await message.answer("Формирую выгрузку баллов...")
+            with SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_SIZE) as file:
+                rows_count = await write_scores_csv(file)
+                if file.tell() > TELEGRAM_MAX_FILE_SIZE:
+                    await message.answer(
+                        "Файл выгрузки превышает 50 МБ и не может быть отправлен в Telegram.\n"
+                        "Используйте выгрузку из командной строки: `python -m bot.admin.export_scores`"
+                    )
+                    logger.warning(f"Выгрузка для администратора {telegram_id} превышает лимит Telegram")
+                    return
+
+                filename = f"scores_{datetime.now():%Y%m%d_%H%M%S}.csv"
+                await bot.send_document(
+                    message.chat.id,
+                    SpooledInputFile(file, filename=filename),
+                    caption=f"Выгружено баллов: {rows_count}",
+                    request_timeout=settings.EXPORT_UPLOAD_TIMEOUT,
+                )
+                logger.info(f"Выгрузка отправлена администратору {telegram_id}: {rows_count} строк")
+        except Exception as e:
+            logger.error(f"Ошибка при выгрузке баллов для администратора {telegram_id}: {e}")
+            await message.answer("Произошла ошибка. Попробуйте снова позже")
+
+
+@router.message(Command("import"))
+async def import_help_handler(message: Message):
+    """Хендлер для команды /import: описание формата файла загрузки"""
+    await message.answer(
+        "Отправьте CSV-файл с баллами (разделитель - запятая или точка с запятой).\n"
+        "Обязательные столбцы: telegram\\_id, subject, score.\n"
+        "Для новых пользователей укажите также first\\_name и last\\_name.\n"
+        "Подходит и файл, полученный командой /export"
+    )
+
+
+@router.message(F.document)
+async def import_document_handler(message: Message):
+    """Загружает баллы из CSV-файла, отправленного администратором"""
+    telegram_id = message.from_user.id
+    document = message.document
+    logger.info(f"Файл {document.file_name} для загрузки от администратора {telegram_id}")
+
+    if not (document.file_name or "").lower().endswith(".csv"):
+        await message.answer("Для загрузки баллов отправьте файл в формате CSV")
+        return
+
+    if document.file_size and document.file_size > TELEGRAM_MAX_DOWNLOAD_SIZE:
+        await message.answer(
+            "Telegram позволяет боту скачивать файлы до 20 МБ.\n"
+            "Используйте загрузку из командной строки: `python -m bot.admin.import_scores --input scores.csv`"
+        )
+        return
+
+    if import_lock.locked():
+        await message.answer("Загрузка уже выполняется. Попробуйте позже")
+        return
+
+    async with import_lock:
+        try:
+            await message.answer("Загружаю баллы...")
+            with TemporaryFile() as file:
+                await bot.download(document, destination=file)
+                file.seek(0)
+                text_file = open_csv(file)
+                try:
+                    report = await import_scores_csv(text_file)
+                finally:
+                    text_file.detach()  # Файл закрывается вместе с временным файлом
+            # Отчет и ошибки содержат названия столбцов и значения из файла (telegram_id и т.п.), поэтому без Markdown
+            await message.answer(format_import_report(report), parse_mode=None)
+        except ValueError as e:
+            await message.answer(f"Файл не загружен: {e}", parse_mode=None)
+            logger.warning(f"Некорректный файл загрузки от администратора {telegram_id}: {e}")
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке баллов для администратора {telegram_id}: {e}")
+            await message.answer("Произошла ошибка. Попробуйте снова позже")
+
+
+@router.message(Command("broadcast"))
+async def broadcast_handler(message: Message):
+    """
+    Хендлер для команды /broadcast
+    С текстом запускает рассылку всем пользователям, без текста показывает ход последней рассылки
+    """
+    telegram_id = message.from_user.id
+    text = extract_broadcast_text(message.html_text)
+    try:
+        if not text:
+            broadcast = await get_last_broadcast()
+            status = format_broadcast(broadcast) if broadcast else "Рассылок еще не было"
+            await message.answer(
+                f"{status}\n\n"
+                "Чтобы запустить рассылку, отправьте: /broadcast текст сообщения\n"
+                "Отменить выполняемую рассылку: /broadcast_cancel",
+                parse_mode=None,
+            )
+            return
+
+        broadcast = await create_broadcast(text, telegram_id)
+        broadcaster.start()
+        await message.answer(
+            f"Рассылка {broadcast.id} запущена: {broadcast.total} получателей.\n"
+            "Ход рассылки: /broadcast, по завершении придет отчет",
+            parse_mode=None,
+        )
+    except ValueError as e:
+        await message.answer(f"{e}. Ход рассылки: /broadcast", parse_mode=None)
+    except Exception as e:
+        logger.error(f"Ошибка при запуске рассылки администратором {telegram_id}: {e}")
+        await message.answer("Произошла ошибка. Попробуйте снова позже")
+
+
+@router.message(Command("broadcast_cancel"))
+async def broadcast_cancel_handler(message: Message):
+    """Хендлер для команды /broadcast_cancel: отмена выполняемой рассылки"""
+    try:
+        broadcast = await cancel_broadcast()
+        if broadcast is None:
+            await message.answer("Нет выполняемой рассылки")
+            return
+        logger.info(f"Администратор {message.from_user.id} отменил рассылку {broadcast.id}")
+        await message.answer(format_broadcast(broadcast), parse_mode=None)
+    except Exception as e:
+        logger.error(f"Ошибка при отмене рассылки: {e}")
+        await message.answer("Произошла ошибка. Попробуйте снова позже")
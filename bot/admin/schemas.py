@@ -0,0 +1,48 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from bot.scores.schemas import ScoreModel
+from bot.scores.subjects import subject_matcher
+from bot.users.schemas import TelegramIDModel
+
+
+class ImportRowModel(TelegramIDModel, ScoreModel):
+    """Строка файла загрузки баллов"""
+    line: int = Field(..., description="Номер строки в файле")
+    subject: str = Field(..., description="Название предмета")
+    first_name: Optional[str] = Field(None, min_length=1, max_length=100, description="Имя пользователя")
+    last_name: Optional[str] = Field(None, min_length=1, max_length=100, description="Фамилия пользователя")
+
+    @field_validator("first_name", "last_name", mode="before")
+    @classmethod
+    def empty_to_none(cls, value: Optional[str]) -> Optional[str]:
+        if isinstance(value, str):
+            value = value.strip()
+        return value or None
+
+    @field_validator("subject")
+    @classmethod
+    def resolve_subject(cls, value: str) -> str:
+        """Приводит название предмета к каноническому (допускаются точные сокращения, например "Профиль")"""
+        subjects = subject_matcher.match_exact(value)
+        if len(subjects) != 1:
+            raise ValueError("неизвестный предмет" if not subjects else f"неоднозначный предмет ({', '.join(subjects)})")
+        return subjects[0]
+
+    @model_validator(mode="after")
+    def check_full_name(self) -> "ImportRowModel":
+        if (self.first_name is None) != (self.last_name is None):
+            raise ValueError("имя и фамилия указываются вместе")
+        return self
+
+
+class ImportErrorModel(BaseModel):
+    line: int = Field(..., description="Номер строки в файле")
+    message: str = Field(..., description="Описание ошибки")
+
+
+class ImportReportModel(BaseModel):
+    rows_total: int = Field(0, description="Количество строк с данными в файле")
+    users_created: int = Field(0, description="Количество новых пользователей")
+    scores_saved: int = Field(0, description="Количество созданных и обновленных баллов")
+    errors_count: int = Field(0, description="Количество строк с ошибками")
+    errors: List[ImportErrorModel] = Field(default_factory=list, description="Первые ошибки для отчета")
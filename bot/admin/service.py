@@ -0,0 +1,222 @@
+import asyncio
+import codecs
+import csv
+import io
+from typing import IO, AsyncGenerator, Dict, Iterator, List, Sequence, Tuple
+from aiogram import Bot
+from aiogram.types import InputFile
+from loguru import logger
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.admin.dao import ScoresImportDAO
+from bot.admin.schemas import ImportErrorModel, ImportReportModel, ImportRowModel
+from bot.config import settings
+from bot.database import maintenance_session_maker
+from bot.scores.dao import ExamScoresDAO
+from bot.scores.subjects import subject_registry
+
+EXPORT_COLUMNS = ["telegram_id", "first_name", "last_name", "subject", "score", "updated_at"]
+
+# Максимальный размер файла, который бот может отправить через Bot API
+TELEGRAM_MAX_FILE_SIZE = 50 * 1024 * 1024
+
+
+class SpooledInputFile(InputFile):
+    """Файл для отправки в Telegram, читаемый частями из открытого файлового объекта (например, SpooledTemporaryFile)"""
+
+    def __init__(self, file: IO[bytes], filename: str, chunk_size: int = 64 * 1024):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+
+
+def write_csv_rows(file: IO[bytes], rows: Sequence[Sequence], encoding: str = "utf-8") -> None:
+    """Записывает пачку строк в CSV-файл (вызывается в отдельном потоке, чтобы не блокировать цикл событий)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        (telegram_id, first_name, last_name, subject_registry.get_name(subject_id), score, updated_at)
+        for telegram_id, first_name, last_name, subject_id, score, updated_at in rows
+    )
+    file.write(buffer.getvalue().encode(encoding))
+
+
+async def write_scores_csv(file: IO[bytes]) -> int:
+    """
+    Записывает все баллы с данными пользователей в CSV-файл (UTF-8 с BOM для корректного открытия в Excel)
+    Строки читаются из БД через отдельное соединение для длительных операций (без ограничения времени
+    запроса и не занимая пул обработчиков) и записываются в файл пачками в отдельном потоке.
+    Возвращает количество записанных строк
+    """
+    header = io.StringIO()
+    csv.writer(header).writerow(EXPORT_COLUMNS)
+    file.write(header.getvalue().encode("utf-8-sig"))
+
+    rows_count = 0
+    async with maintenance_session_maker() as session:
+        async for rows in ExamScoresDAO.stream_with_users(session, settings.EXPORT_BATCH_SIZE):
+            await asyncio.to_thread(write_csv_rows, file, rows)
+            rows_count += len(rows)
+
+    await asyncio.to_thread(file.flush)
+    logger.info(f"Выгружено баллов: {rows_count}")
+    return rows_count
+
+
+IMPORT_REQUIRED_COLUMNS = {"telegram_id", "subject", "score"}
+
+# Названия полей и описания типовых ошибок проверки для отчета о загрузке
+IMPORT_FIELD_NAMES = {
+    "telegram_id": "Telegram ID", "subject": "предмет", "score": "балл", "first_name": "имя", "last_name": "фамилия",
+}
+IMPORT_ERROR_MESSAGES = {
+    "missing": "не заполнено",
+    "string_type": "не заполнено",
+    "int_type": "ожидается целое число",
+    "int_parsing": "ожидается целое число",
+    "int_from_float": "ожидается целое число",
+    "greater_than": "должно быть больше {gt}",
+    "greater_than_equal": "должно быть не меньше {ge}",
+    "less_than_equal": "должно быть не больше {le}",
+    "string_too_short": "пустое значение",
+    "string_too_long": "длиннее {max_length} символов",
+}
+
+import_rows_adapter = TypeAdapter(List[ImportRowModel])
+
+
+def open_csv(file: IO[bytes]) -> io.TextIOWrapper:
+    """Открывает CSV-файл как текст: UTF-8 (в том числе с BOM) или Windows-1251, в которой сохраняет Excel"""
+    sample = file.read(64 * 1024)
+    file.seek(0)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "cp1251"
+    return io.TextIOWrapper(file, encoding=encoding, newline="")
+
+
+def read_csv_batches(file: IO[str], batch_size: int) -> Iterator[List[Dict[str, str]]]:
+    """Читает строки CSV-файла пачками, добавляя к каждой строке ее номер в файле"""
+    sample = file.read(64 * 1024)
+    file.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.DictReader(file, dialect=dialect)
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    missing = IMPORT_REQUIRED_COLUMNS - set(reader.fieldnames)
+    if missing:
+        raise ValueError(f"В файле нет обязательных столбцов: {', '.join(sorted(missing))}")
+
+    batch = []
+    for row in reader:
+        row["line"] = reader.line_num
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def describe_import_error(error: dict) -> str:
+    field = error["loc"][1] if len(error["loc"]) > 1 else None
+    if error["type"] == "value_error":
+        message = str(error["ctx"]["error"])
+    elif error["type"] in IMPORT_ERROR_MESSAGES:
+        message = IMPORT_ERROR_MESSAGES[error["type"]].format(**error.get("ctx", {}))
+    else:
+        message = error["msg"]
+    return f"{IMPORT_FIELD_NAMES.get(field, field)}: {message}" if field else message
+
+
+def validate_import_rows(rows: List[Dict[str, str]]) -> Tuple[List[ImportRowModel], List[ImportErrorModel]]:
+    """Проверяет пачку строк целиком, строки с ошибками исключаются из загрузки"""
+    try:
+        return import_rows_adapter.validate_python(rows), []
+    except ValidationError as e:
+        invalid: Dict[int, str] = {}
+        for error in e.errors():
+            invalid.setdefault(error["loc"][0], describe_import_error(error))
+        errors = [ImportErrorModel(line=rows[index]["line"], message=message) for index, message in invalid.items()]
+        valid_rows = [row for index, row in enumerate(rows) if index not in invalid]
+        return import_rows_adapter.validate_python(valid_rows), errors
+
+
+async def run_import(session: AsyncSession, file: IO[str]) -> ImportReportModel:
+    """
+    Загружает пользователей и баллы из CSV-файла в одной транзакции
+    Строки проверяются и копируются во временную таблицу пачками, затем переносятся одним запросом.
+    Строки с ошибками пропускаются и попадают в отчет
+    """
+    report = ImportReportModel()
+    errors: List[ImportErrorModel] = []
+
+    await ScoresImportDAO.create_staging(session)
+    for rows in read_csv_batches(file, settings.IMPORT_BATCH_SIZE):
+        valid_rows, batch_errors = validate_import_rows(rows)
+        report.rows_total += len(rows)
+        report.errors_count += len(batch_errors)
+        errors.extend(batch_errors[:settings.IMPORT_MAX_REPORTED_ERRORS - len(errors)])
+        if valid_rows:
+            await ScoresImportDAO.copy_rows(
+                session,
+                (
+                    (row.line, row.telegram_id, row.first_name, row.last_name, subject_registry.get_id(row.subject), row.score)
+                    for row in valid_rows
+                )
+            )
+        await asyncio.sleep(0)  # Проверка пачки занимает процессор, даем поработать другим обработчикам
+
+    report.users_created, report.scores_saved = await ScoresImportDAO.merge(session)
+
+    unknown_count, unknown_rows = await ScoresImportDAO.find_unknown_users(
+        session, settings.IMPORT_MAX_REPORTED_ERRORS
+    )
+    report.errors_count += unknown_count
+    errors.extend(
+        ImportErrorModel(line=line, message=f"пользователь {telegram_id} не зарегистрирован, укажите имя и фамилию")
+        for line, telegram_id in unknown_rows
+    )
+    report.errors = sorted(errors, key=lambda error: error.line)[:settings.IMPORT_MAX_REPORTED_ERRORS]
+
+    await session.commit()
+    logger.info(
+        f"Загрузка баллов завершена: строк {report.rows_total}, новых пользователей {report.users_created}, "
+        f"сохранено баллов {report.scores_saved}, строк с ошибками {report.errors_count}"
+    )
+    return report
+
+
+async def import_scores_csv(file: IO[str]) -> ImportReportModel:
+    """Загружает баллы из CSV-файла через отдельное соединение для длительных операций"""
+    async with maintenance_session_maker() as session:
+        try:
+            return await run_import(session, file)
+        except Exception:
+            await session.rollback()
+            raise
+
+
+def format_import_report(report: ImportReportModel) -> str:
+    lines = [
+        "Загрузка завершена",
+        f"Строк в файле: {report.rows_total}",
+        f"Новых пользователей: {report.users_created}",
+        f"Сохранено баллов: {report.scores_saved}",
+        f"Строк с ошибками: {report.errors_count}",
+    ]
+    if report.errors:
+        lines.append("")
+        lines.extend(f"Строка {error.line}: {error.message}" for error in report.errors)
+        if report.errors_count > len(report.errors):
+            lines.append(f"... и еще {report.errors_count - len(report.errors)}")
+    return "\n".join(lines)
@@ -0,0 +1,116 @@
+from datetime import timedelta
+from typing import Optional
+from loguru import logger
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.broadcast.models import Broadcasts
+from bot.broadcast.schemas import BroadcastModel, BroadcastProgressModel
+from bot.dao.base import BaseDAO
+
+RUNNING = "running"
+FINISHED = "finished"
+CANCELLED = "cancelled"
+
+
+class BroadcastsDAO(BaseDAO):
+    model = Broadcasts
+
+    @classmethod
+    async def find_running(cls, session: AsyncSession) -> Optional[BroadcastModel]:
+        """Найти незавершенную рассылку (одновременно выполняется не больше одной)"""
+        query = select(cls.model).where(cls.model.status == RUNNING).order_by(cls.model.id).limit(1)
+        record = (await session.execute(query)).scalar_one_or_none()
+        return BroadcastModel.model_validate(record) if record else None
+
+    @classmethod
+    async def find_last(cls, session: AsyncSession) -> Optional[BroadcastModel]:
+        """Найти последнюю запущенную рассылку"""
+        query = select(cls.model).order_by(cls.model.id.desc()).limit(1)
+        record = (await session.execute(query)).scalar_one_or_none()
+        return BroadcastModel.model_validate(record) if record else None
+
+    @classmethod
+    async def claim(cls, session: AsyncSession, broadcast_id: int, lease: float) -> Optional[BroadcastModel]:
+        """
+        Взять незавершенную рассылку в работу на lease секунд, если ее не выполняет другой экземпляр бота
+        Возвращает рассылку с последней контрольной точкой или None, если рассылка занята или завершена
+        """
+        logger.debug("Захват рассылки {} на {} с", broadcast_id, lease)
+        try:
+            query = (
+                update(cls.model)
+                .where(
+                    cls.model.id == broadcast_id,
+                    cls.model.status == RUNNING,
+                    or_(cls.model.claimed_until.is_(None), cls.model.claimed_until < func.now()),
+                )
+                .values(claimed_until=func.now() + timedelta(seconds=lease))
+                .returning(cls.model)
+            )
+            record = (await session.execute(query)).scalar_one_or_none()
+            result = BroadcastModel.model_validate(record) if record else None
+            await session.commit()
+            return result
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при захвате рассылки {broadcast_id}: {e}")
+            raise
+
+    @classmethod
+    async def save_progress(
+            cls, session: AsyncSession, broadcast_id: int, progress: BroadcastProgressModel, lease: float
+    ) -> bool:
+        """
+        Сохранить контрольную точку после обработанной пачки пользователей и продлить аренду
+        Возвращает False, если рассылка была отменена
+        """
+        logger.debug("Контрольная точка рассылки {}: {}", broadcast_id, progress)
+        try:
+            query = (
+                update(cls.model)
+                .where(cls.model.id == broadcast_id, cls.model.status == RUNNING)
+                .values(
+                    last_user_id=progress.last_user_id,
+                    sent=cls.model.sent + progress.sent,
+                    blocked=cls.model.blocked + progress.blocked,
+                    failed=cls.model.failed + progress.failed,
+                    claimed_until=func.now() + timedelta(seconds=lease),
+                    updated_at=func.now(),
+                )
+            )
+            result = await session.execute(query)
+            await session.commit()
+            return result.rowcount > 0
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при сохранении контрольной точки рассылки {broadcast_id}: {e}")
+            raise
+
+    @classmethod
+    async def set_status(cls, session: AsyncSession, broadcast_id: int, status: str) -> Optional[BroadcastModel]:
+        """Завершить или отменить незавершенную рассылку и снять аренду"""
+        logger.debug("Рассылка {} переводится в состояние {}", broadcast_id, status)
+        try:
+            query = (
+                update(cls.model)
+                .where(cls.model.id == broadcast_id, cls.model.status == RUNNING)
+                .values(status=status, claimed_until=None, updated_at=func.now())
+                .returning(cls.model)
+            )
+            record = (await session.execute(query)).scalar_one_or_none()
+            result = BroadcastModel.model_validate(record) if record else None
+            await session.commit()
+            return result
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при изменении состояния рассылки {broadcast_id}: {e}")
+            raise
+
+    @classmethod
+    async def release(cls, session: AsyncSession, broadcast_id: int) -> None:
+        """Снять аренду, чтобы рассылку сразу мог продолжить другой экземпляр бота"""
+        try:
+            query = update(cls.model).where(cls.model.id == broadcast_id).values(claimed_until=None)
+            await session.execute(query)
+            await session.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при освобождении рассылки {broadcast_id}: {e}")
+            raise
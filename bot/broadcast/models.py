@@ -0,0 +1,30 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Index, Integer, String, Text, text
+from sqlalchemy.orm import Mapped, mapped_column
+from bot.database import Base
+
+
+class Broadcasts(Base):
+    """
+    Рассылка сообщения всем пользователям
+    last_user_id - контрольная точка: сообщение отправлено всем пользователям с ID не больше этого значения.
+    claimed_until - до какого момента рассылку выполняет запущенный экземпляр бота (аренда),
+    после истечения аренды рассылку может продолжить другой экземпляр или бот после перезапуска
+    """
+    __table_args__ = (
+        # Одновременно может выполняться только одна рассылка
+        Index("uq_broadcasts_running", "status", unique=True, postgresql_where=text("status = 'running'")),
+    )
+
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, server_default="running")
+    created_by: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    total: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    last_user_id: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    sent: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    blocked: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    claimed_until: Mapped[datetime | None] = mapped_column(nullable=True)
+
+    def __str__(self):
+        return f"<Broadcast {self.id}: {self.status} {self.sent}/{self.total}>"
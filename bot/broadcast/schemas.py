@@ -0,0 +1,30 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class BroadcastCreateModel(BaseModel):
+    text: str = Field(..., min_length=1, max_length=4096, description="Текст сообщения")
+    created_by: int = Field(..., gt=0, description="Telegram ID администратора, запустившего рассылку")
+    total: int = Field(..., ge=0, description="Количество пользователей на момент запуска")
+
+
+class BroadcastModel(BroadcastCreateModel):
+    id: int = Field(..., gt=0, description="Уникальный ID рассылки")
+    status: str = Field(..., description="Состояние: running, finished или cancelled")
+    last_user_id: int = Field(..., ge=0, description="ID последнего обработанного пользователя")
+    sent: int = Field(..., ge=0, description="Количество доставленных сообщений")
+    blocked: int = Field(..., ge=0, description="Количество пользователей, заблокировавших бота")
+    failed: int = Field(..., ge=0, description="Количество сообщений, которые не удалось отправить")
+
+    # Конфигурация модели для поддержки ORM и работы с объектами
+    model_config = ConfigDict(from_attributes=True)
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.blocked + self.failed
+
+
+class BroadcastProgressModel(BaseModel):
+    last_user_id: int = Field(..., ge=0, description="ID последнего обработанного пользователя")
+    sent: int = Field(0, ge=0, description="Доставлено сообщений")
+    blocked: int = Field(0, ge=0, description="Пользователей, заблокировавших бота")
+    failed: int = Field(0, ge=0, description="Не удалось отправить")
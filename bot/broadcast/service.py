@@ -0,0 +1,220 @@
+import asyncio
+import re
+from typing import List, Optional, Tuple
+from aiogram import Bot
+from aiogram.enums import ParseMode
+from aiogram.exceptions import (
+    TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+)
+from loguru import logger
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.broadcast.dao import BroadcastsDAO, CANCELLED, FINISHED
+from bot.broadcast.schemas import BroadcastCreateModel, BroadcastModel, BroadcastProgressModel
+from bot.config import bot, settings
+from bot.database import connection, current_session
+from bot.ratelimit import TokenBucket
+from bot.users.dao import UsersDAO
+
+# Результаты доставки одного сообщения
+SENT, BLOCKED, FAILED = "sent", "blocked", "failed"
+
+STATUS_TITLES = {"running": "выполняется", FINISHED: "завершена", CANCELLED: "отменена"}
+
+
+@connection
+async def create_broadcast(text: str, created_by: int, session: AsyncSession) -> BroadcastModel:
+    """Создает рассылку всем пользователям (ValueError, если другая рассылка еще выполняется)"""
+    if await BroadcastsDAO.find_running(session):
+        raise ValueError("Рассылка уже выполняется")
+    total = await UsersDAO.count(session)
+    try:
+        record = await BroadcastsDAO.add(
+            session, BroadcastCreateModel(text=text, created_by=created_by, total=total)
+        )
+    except IntegrityError:
+        # Рассылку одновременно запустил другой администратор (уникальный индекс на выполняемую рассылку)
+        raise ValueError("Рассылка уже выполняется")
+    logger.info(f"Администратор {created_by} запустил рассылку {record.id} для {total} пользователей")
+    return BroadcastModel.model_validate(record)
+
+
+@connection
+async def cancel_broadcast(session: AsyncSession) -> Optional[BroadcastModel]:
+    """Отменяет выполняемую рассылку (останавливается на ближайшей контрольной точке)"""
+    broadcast = await BroadcastsDAO.find_running(session)
+    if broadcast is None:
+        return None
+    return await BroadcastsDAO.set_status(session, broadcast.id, CANCELLED)
+
+
+@connection
+async def get_last_broadcast(session: AsyncSession) -> Optional[BroadcastModel]:
+    return await BroadcastsDAO.find_last(session)
+
+
+def extract_broadcast_text(html_text: str) -> str:
+    """Текст рассылки из сообщения с командой: все после "/broadcast" с сохранением форматирования (HTML)"""
+    parts = re.split(r"\s", html_text, maxsplit=1)
+    return parts[1].strip() if len(parts) > 1 else ""
+
+
+def format_broadcast(broadcast: BroadcastModel) -> str:
+    """Отчет о ходе рассылки для администратора"""
+    return (
+        f"Рассылка {broadcast.id} {STATUS_TITLES.get(broadcast.status, broadcast.status)}: "
+        f"обработано {broadcast.processed} из {broadcast.total}\n"
+        f"Доставлено: {broadcast.sent}\n"
+        f"Заблокировали бота: {broadcast.blocked}\n"
+        f"Ошибки: {broadcast.failed}"
+    )
+
+
+class Broadcaster:
+    """
+    Выполнение рассылки в фоновой задаче, независимо от обработки обновлений
+    Получатели читаются из таблицы users пачками по chunk_size в порядке ID. Сообщения пачки отправляются
+    параллельно (не больше concurrency одновременно), общая частота ограничена корзиной токенов.
+    Повторы при RetryAfter и временных ошибках выполняет ограничитель запросов сессии бота
+    (TelegramRateLimitMiddleware), здесь обрабатывается только окончательный результат: если Telegram
+    продолжает отвечать RetryAfter, отправка приостанавливается для всей рассылки. После каждой пачки в БД сохраняется
+    контрольная точка, поэтому после перезапуска рассылка продолжается с нее: повторно сообщение могут
+    получить только пользователи пачки, обработка которой была прервана
+    """
+
+    def __init__(
+            self,
+            bot: Bot,
+            bucket: TokenBucket,
+            chunk_size: int,
+            concurrency: int,
+            lease: float,
+    ):
+        self.bot = bot
+        self.bucket = bucket
+        self.chunk_size = chunk_size
+        self.lease = lease
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self._broadcast_id: Optional[int] = None  # Рассылка, которую выполняет этот экземпляр
+
+    def start(self) -> None:
+        """Запускает фоновую задачу, если она еще не запущена (вызывается при создании рассылки и старте бота)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает рассылку при завершении работы бота и снимает аренду для быстрого продолжения"""
+        if self._task is None or self._task.done():
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        if self._broadcast_id is not None:
+            await self._release(self._broadcast_id)
+
+    @connection
+    async def _release(self, broadcast_id: int, session: AsyncSession) -> None:
+        await BroadcastsDAO.release(session, broadcast_id)
+        logger.info(f"Рассылка {broadcast_id} приостановлена до следующего запуска")
+
+    @connection
+    async def _claim(self, session: AsyncSession) -> Tuple[bool, Optional[BroadcastModel]]:
+        """Находит незавершенную рассылку и берет ее в работу: (есть ли рассылка, захваченная рассылка)"""
+        broadcast = await BroadcastsDAO.find_running(session)
+        if broadcast is None:
+            return False, None
+        return True, await BroadcastsDAO.claim(session, broadcast.id, self.lease)
+
+    async def _run(self) -> None:
+        # Задача создается из обработчика и наследует его контекст: сессия обновления здесь недоступна
+        current_session.set(None)
+        try:
+            while True:
+                exists, broadcast = await self._claim()
+                if not exists:
+                    return
+                if broadcast is None:
+                    # Рассылку выполняет другой экземпляр бота, продолжим после истечения его аренды
+                    await asyncio.sleep(self.lease)
+                    continue
+                self._broadcast_id = broadcast.id
+                await self._send_all(broadcast)
+                self._broadcast_id = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Контрольная точка сохранена в БД, рассылка продолжится после перезапуска или новой команды
+            logger.error(f"Ошибка при выполнении рассылки: {e}")
+
+    @connection
+    async def _next_recipients(self, after_id: int, session: AsyncSession) -> List[Tuple[int, int]]:
+        return await UsersDAO.find_telegram_ids_after(session, after_id, self.chunk_size)
+
+    @connection
+    async def _checkpoint(self, broadcast_id: int, progress: BroadcastProgressModel, session: AsyncSession) -> bool:
+        return await BroadcastsDAO.save_progress(session, broadcast_id, progress, self.lease)
+
+    @connection
+    async def _finish(self, broadcast_id: int, session: AsyncSession) -> Optional[BroadcastModel]:
+        return await BroadcastsDAO.set_status(session, broadcast_id, FINISHED)
+
+    async def _send_all(self, broadcast: BroadcastModel) -> None:
+        logger.info(f"Рассылка {broadcast.id} выполняется с пользователя ID > {broadcast.last_user_id}")
+        after_id = broadcast.last_user_id
+        while recipients := await self._next_recipients(after_id):
+            results = await asyncio.gather(
+                *(self._deliver(broadcast.text, telegram_id) for _, telegram_id in recipients)
+            )
+            after_id = recipients[-1][0]
+            progress = BroadcastProgressModel(
+                last_user_id=after_id,
+                sent=results.count(SENT),
+                blocked=results.count(BLOCKED),
+                failed=results.count(FAILED),
+            )
+            if not await self._checkpoint(broadcast.id, progress):
+                logger.info(f"Рассылка {broadcast.id} отменена")
+                return
+
+        finished = await self._finish(broadcast.id)
+        if finished is None:
+            return
+        logger.info(f"Рассылка {broadcast.id} завершена: {finished}")
+        try:
+            await self.bot.send_message(finished.created_by, format_broadcast(finished))
+        except TelegramAPIError as e:
+            logger.warning(f"Не удалось отправить отчет о рассылке {broadcast.id}: {e}")
+
+    async def _deliver(self, text: str, telegram_id: int) -> str:
+        """Отправляет сообщение одному пользователю (повторы выполняет ограничитель запросов сессии бота)"""
+        async with self._semaphore:
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(telegram_id, text, parse_mode=ParseMode.HTML)
+                return SENT
+            except TelegramRetryAfter as e:
+                # Ограничитель исчерпал повторы: Telegram ограничивает всю рассылку, а не один чат
+                logger.warning(f"Превышен лимит Telegram при рассылке, пауза {e.retry_after} с")
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError:
+                return BLOCKED  # Пользователь заблокировал бота
+            except TelegramAPIError as e:
+                logger.warning(f"Сообщение рассылки не отправлено пользователю {telegram_id}: {e}")
+            return FAILED
+
+
+broadcaster = Broadcaster(
+    bot,
+    TokenBucket(rate=settings.BROADCAST_RATE),
+    chunk_size=settings.BROADCAST_CHUNK_SIZE,
+    concurrency=settings.BROADCAST_CONCURRENCY,
+    lease=settings.BROADCAST_LEASE,
+)
+
+
+async def resume_broadcasts() -> None:
+    """Продолжает незавершенную рассылку после перезапуска бота"""
+    broadcaster.start()
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Маркер отсутствия записи в кэше (позволяет хранить None как полноценное значение)
+NOT_CACHED: Any = object()
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Ограниченный по размеру LRU-кэш с временем жизни записей
+    При переполнении вытесняется запись, к которой дольше всего не обращались
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, Tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K, default: Any = NOT_CACHED) -> V | Any:
+        """Возвращает значение по ключу или default, если записи нет или она устарела"""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение (ttl позволяет задать время жизни конкретной записи)"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K, default: Any = None) -> V | Any:
+        """Удаляет запись из кэша"""
+        item = self._data.pop(key, None)
+        return item[1] if item is not None else default
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        """Статистика обращений к кэшу"""
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SingleFlight(Generic[K, V]):
+    """
+    Объединение одновременных загрузок по одному ключу
+    Пока загрузка выполняется, остальные вызовы с тем же ключом ждут ее результат, а не запускают свою
+    """
+
+    def __init__(self):
+        self._inflight: Dict[K, asyncio.Future] = {}
+
+    async def do(self, key: K, load: Callable[[], Awaitable[V]]) -> V:
+        while (future := self._inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # Отменен сам ожидающий вызов
+                # Отменена исходная загрузка - выполняем ее заново
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Ошибка передается ожидающим, предупреждение о неполученной ошибке не нужно
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
@@ -0,0 +1,41 @@
+from typing import Dict, Iterable, List
+from aiogram.types import BotCommand
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.commands.models import ChatCommands
+from bot.commands.schemas import BotCommandModel, ChatCommandsModel
+from bot.dao.base import BaseDAO
+
+
+class ChatCommandsDAO(BaseDAO):
+    model = ChatCommands
+
+    @classmethod
+    async def find_many(cls, session: AsyncSession, chat_ids: Iterable[int]) -> Dict[int, List[BotCommand]]:
+        """Найти сохраненные наборы команд для нескольких чатов одним запросом"""
+        chat_ids = list(chat_ids)
+        logger.debug("Поиск команд для чатов: {}", len(chat_ids))
+        try:
+            query = select(cls.model.chat_id, cls.model.commands).where(cls.model.chat_id.in_(chat_ids))
+            result = await session.execute(query)
+            return {chat_id: [BotCommand(**command) for command in commands] for chat_id, commands in result.all()}
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске команд чатов: {e}")
+            raise
+
+    @classmethod
+    async def save_many(cls, session: AsyncSession, chat_commands: Dict[int, List[BotCommand]]) -> int:
+        """Сохранить установленные наборы команд (создать или обновить по chat_id)"""
+        return await cls.upsert_many(
+            session,
+            [
+                ChatCommandsModel(
+                    chat_id=chat_id,
+                    commands=[BotCommandModel(command=c.command, description=c.description) for c in commands],
+                )
+                for chat_id, commands in chat_commands.items()
+            ],
+            index_elements=["chat_id"],
+        )
@@ -0,0 +1,14 @@
+from typing import Dict, List
+from sqlalchemy import BigInteger
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from bot.database import Base
+
+
+class ChatCommands(Base):
+    """Набор команд, последним установленный в Telegram для чата (меню команд)"""
+    chat_id: Mapped[int] = mapped_column(BigInteger, unique=True, nullable=False)
+    commands: Mapped[List[Dict[str, str]]] = mapped_column(JSONB, nullable=False, server_default="[]")
+
+    def __str__(self):
+        return f"<ChatCommands {self.chat_id}: {len(self.commands)}>"
@@ -0,0 +1,15 @@
+from typing import List
+from pydantic import BaseModel, Field
+
+
+class ChatIDModel(BaseModel):
+    chat_id: int = Field(..., description="ID чата Telegram")
+
+
+class BotCommandModel(BaseModel):
+    command: str = Field(..., min_length=1, max_length=32, description="Команда без символа /")
+    description: str = Field(..., min_length=1, max_length=256, description="Описание команды в меню")
+
+
+class ChatCommandsModel(ChatIDModel):
+    commands: List[BotCommandModel] = Field(default_factory=list, description="Набор команд чата")
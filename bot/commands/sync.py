@@ -0,0 +1,128 @@
+import asyncio
+from typing import Dict, List, Optional
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import BotCommand, BotCommandScopeChat
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from bot.cache import TTLCache, NOT_CACHED
+
+
+class ChatCommandsSync:
+    """
+    Синхронизация меню команд чатов с Telegram
+    Последний установленный в каждом чате набор команд хранится в таблице chatcommands (и в локальном кэше),
+    поэтому переживает перезапуск. Новые наборы не отправляются сразу: они копятся в памяти и раз в
+    flush_interval секунд устанавливаются в фоне, при этом несколько изменений одного чата объединяются
+    в один запрос, а набор, совпадающий с уже установленным, не отправляется совсем.
+    Установленные наборы перед сравнением перечитываются из БД: набор мог изменить другой экземпляр бота,
+    а локальный кэш (на cache_ttl секунд) используется только для чтения текущего набора в хендлерах
+    """
+
+    def __init__(
+            self,
+            bot: Bot,
+            session_maker: Optional[async_sessionmaker[AsyncSession]] = None,
+            flush_interval: float = 1.0,
+            cache_size: int = 100000,
+            cache_ttl: float = 600,
+    ):
+        self.bot = bot
+        self._session_maker = session_maker
+        self.flush_interval = flush_interval
+        self._applied: TTLCache[int, List[BotCommand]] = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._pending: Dict[int, List[BotCommand]] = {}  # Наборы, которые еще нужно установить
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def session_maker(self) -> async_sessionmaker[AsyncSession]:
+        if self._session_maker is None:
+            from bot.database import async_session_maker
+            self._session_maker = async_session_maker
+        return self._session_maker
+
+    async def get(self, chat_id: int) -> Optional[List[BotCommand]]:
+        """Текущий набор команд чата (с учетом еще не установленных изменений) или None, если он неизвестен"""
+        if chat_id in self._pending:
+            return self._pending[chat_id]
+        commands = self._applied.get(chat_id)
+        if commands is NOT_CACHED:
+            # В хендлере читаем через сессию обновления: второе соединение из пула на каждое обновление
+            # при нагрузке исчерпывает пул, и обновления ждут друг друга до истечения DB_POOL_TIMEOUT
+            from bot.database import current_session
+            commands = (await self._load([chat_id], current_session.get())).get(chat_id)
+        return commands
+
+    def set(self, chat_id: int, commands: List[BotCommand]) -> None:
+        """Планирует установку набора команд для чата (без ожидания запроса к Telegram)"""
+        # Совпадение с набором из локального кэша не проверяем: его мог изменить другой экземпляр бота
+        self._pending[chat_id] = commands
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _load(
+            self, chat_ids: List[int], session: Optional[AsyncSession] = None
+    ) -> Dict[int, List[BotCommand]]:
+        """Загружает сохраненные наборы команд из БД (в переданной или новой сессии) и кэширует их"""
+        from bot.commands.dao import ChatCommandsDAO
+        if session is not None:
+            saved = await ChatCommandsDAO.find_many(session, chat_ids)
+        else:
+            async with self.session_maker() as session:
+                saved = await ChatCommandsDAO.find_many(session, chat_ids)
+        for chat_id, commands in saved.items():
+            self._applied.set(chat_id, commands)
+        return saved
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        await self.flush()
+
+    async def _apply(self, chat_id: int, commands: List[BotCommand]) -> bool:
+        try:
+            await self.bot.set_my_commands(commands, scope=BotCommandScopeChat(chat_id=chat_id))
+            return True
+        except TelegramAPIError as e:
+            # Состояние меню в Telegram не изменилось: при следующем изменении набор будет отправлен снова
+            logger.error(f"Ошибка при обновлении команд для чата {chat_id}: {e}")
+            return False
+
+    async def flush(self) -> None:
+        """Устанавливает накопленные наборы команд и сохраняет их в БД"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            # Установленные наборы читаем из БД одним запросом, а не из кэша: их мог изменить другой экземпляр
+            applied = await self._load(list(pending))
+            changed = {
+                chat_id: commands for chat_id, commands in pending.items()
+                if applied.get(chat_id) != commands
+            }
+            if not changed:
+                return
+
+            results = await asyncio.gather(*(self._apply(chat_id, commands) for chat_id, commands in changed.items()))
+            updated = {chat_id: commands for (chat_id, commands), ok in zip(changed.items(), results) if ok}
+            for chat_id, commands in updated.items():
+                self._applied.set(chat_id, commands)
+            if updated:
+                from bot.commands.dao import ChatCommandsDAO
+                async with self.session_maker() as session:
+                    await ChatCommandsDAO.save_many(session, updated)
+            logger.info(f"Обновлены команды для чатов: {len(updated)} из {len(pending)}")
+        except Exception as e:
+            logger.error(f"Ошибка при синхронизации команд чатов ({len(pending)}): {e}")
+            # Сохраненное состояние неизвестно: перечитаем его из БД и повторим, если не было более новых изменений
+            for chat_id, commands in pending.items():
+                self._applied.pop(chat_id)
+                self._pending.setdefault(chat_id, commands)
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def close(self) -> None:
+        # Дожидаемся запланированной синхронизации и отправляем оставшиеся изменения
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
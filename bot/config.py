@@ -1,10 +1,16 @@
 import os
+import sys
+from typing import List, Literal
 from loguru import logger
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from bot.middlewares.telegram import TelegramRateLimitMiddleware
 
 BASEDIR = os.path.dirname(os.path.abspath(__file__))  # Базовая директория проекта
 
@@ -13,6 +19,38 @@ class Settings(BaseSettings):
     # Основные настройки приложения, считываемые из .env файла
     BOT_TOKEN: str  # Токен Telegram-бота
 
+    # Telegram ID администраторов (в .env задается списком: ADMIN_IDS=[123456789, 987654321])
+    ADMIN_IDS: List[int] = []
+
+    # Режим получения обновлений: long polling или вебхук
+    BOT_MODE: Literal["polling", "webhook"] = "polling"
+
+    # Адрес Bot API сервера (пусто - api.telegram.org). Например, локальная заглушка для нагрузочных
+    # тестов: TELEGRAM_API_URL=http://127.0.0.1:8081 (см. benchmarks/fake_bot_api.py)
+    TELEGRAM_API_URL: str = ""
+
+    # Настройки вебхука (используются при BOT_MODE=webhook)
+    WEBHOOK_BASE_URL: str = ""  # Публичный HTTPS-адрес, на который Telegram отправляет обновления
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: str = ""  # Секретный токен для проверки заголовка X-Telegram-Bot-Api-Secret-Token
+    WEBHOOK_SET_ON_STARTUP: bool = True  # Регистрировать вебхук при запуске (достаточно одного экземпляра)
+    WEBAPP_HOST: str = "0.0.0.0"
+    WEBAPP_PORT: int = 8080
+
+    # Ограничения частоты запросов к Telegram Bot API (сверх них запросы ждут очереди)
+    TELEGRAM_GLOBAL_RATE: float = 30  # Всех запросов в секунду
+    TELEGRAM_CHAT_RATE: float = 1  # Запросов в секунду в один личный чат
+    TELEGRAM_CHAT_BURST: int = 3  # Сколько запросов в личный чат можно отправить подряд без ожидания
+    TELEGRAM_GROUP_RATE: float = 20 / 60  # Запросов в секунду в одну группу
+    TELEGRAM_MAX_RETRIES: int = 3  # Повторы при RetryAfter, сетевых ошибках и ошибках сервера Telegram
+    TELEGRAM_MAX_RETRY_AFTER: float = 60  # Если Telegram просит ждать дольше (сек), запрос завершается ошибкой
+    TELEGRAM_RETRY_BACKOFF: float = 1  # Базовая пауза перед повтором (сек), удваивается с каждой попыткой
+    TELEGRAM_WAIT_WARNING: float = 1  # Порог ожидания в очереди на отправку для предупреждения в логе (сек)
+
+    # Метрики в формате Prometheus (время обработчиков, запросов к БД и к Telegram), 0 - не запускать сервер
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 9464  # Не 9100: этот порт обычно занят node_exporter
+
     # Настройки для подключения к базе данных
     DB_HOST: str
     DB_PORT: str
@@ -20,9 +58,74 @@ class Settings(BaseSettings):
     DB_USER: str
     DB_PASS: str
 
+    # Настройки пула соединений с базой данных
+    DB_POOL_SIZE: int = 10  # Количество постоянно открытых соединений
+    DB_MAX_OVERFLOW: int = 10  # Количество дополнительных соединений при нехватке пула
+    DB_POOL_TIMEOUT: float = 30  # Максимальное время ожидания свободного соединения (сек)
+    DB_POOL_RECYCLE: int = 1800  # Время, после которого соединение пересоздается (сек)
+    DB_POOL_PRE_PING: bool = True  # Проверка соединения перед выдачей из пула
+    DB_POOL_WAIT_WARNING: float = 0.1  # Порог ожидания соединения для предупреждения в логе (сек)
+    DB_STATEMENT_CACHE_SIZE: int = 100  # Размер кэша подготовленных запросов (0 - отключить)
+    DB_STATEMENT_TIMEOUT: int = 5000  # Ограничение времени выполнения запроса на сервере (мс, 0 - без ограничения)
+    DB_COMMAND_TIMEOUT: float = 10  # Ограничение времени выполнения запроса на стороне клиента (сек)
+
+    # Учет запросов к БД (см. bot/querylog.py)
+    DB_SLOW_QUERY_THRESHOLD: float = 0.5  # Запросы дольше этого пишутся в лог с параметрами (сек, 0 - отключить)
+    DB_REPEATED_QUERY_THRESHOLD: int = 2  # Повторов запроса одного вида за обновление для предупреждения (0 - отключить)
+    DB_QUERY_BUDGET_STRICT: bool = False  # Превышение бюджета запросов обработчика - ошибка, а не предупреждение
+
     # Настройки логирования
     FORMAT_LOG: str = "{time:YYYY-MM-DD at HH:mm:ss} | {level} | {message}"
     LOG_ROTATION: str = "10 MB"
+    LOG_LEVEL: str = "INFO"  # Минимальный уровень сообщений (DEBUG включает подробные логи DAO)
+    LOG_ENQUEUE: bool = False  # Писать файл логов в отдельном потоке через очередь, не блокируя цикл событий
+    LOG_BUFFERING: int = 1  # Буферизация файла логов: 1 - построчно, больше 1 - размер буфера в байтах
+
+    # Настройки кэша зарегистрированных пользователей
+    USER_CACHE_SIZE: int = 10000  # Максимальное количество записей
+    USER_CACHE_TTL: int = 300  # Время жизни записи о зарегистрированном пользователе (сек)
+    USER_CACHE_NEGATIVE_TTL: int = 30  # Время жизни записи об отсутствующем пользователе (сек)
+
+    # Настройки синхронизации команд чатов (установленные наборы хранятся в таблице chatcommands)
+    CHAT_COMMANDS_CACHE_SIZE: int = 100000  # Максимальное количество чатов в локальном кэше
+    CHAT_COMMANDS_CACHE_TTL: int = 600  # Время жизни записи в локальном кэше (сек), кэш не видит изменений других экземпляров
+    CHAT_COMMANDS_FLUSH_INTERVAL: float = 1.0  # Интервал, за который изменения команд объединяются в один запрос (сек)
+
+    # Размер кэша результатов поиска предмета по введенному тексту
+    SUBJECT_MATCH_CACHE_SIZE: int = 1024
+
+    # Время, в течение которого гистограммы баллов для /rank берутся из памяти без обращения к БД (сек)
+    SCORE_HISTOGRAM_TTL: int = 60
+
+    # Настройки рейтинга по предмету (/leaderboard)
+    LEADERBOARD_PAGE_SIZE: int = 10  # Количество строк на странице
+    LEADERBOARD_CACHE_SIZE: int = 1000  # Максимальное количество страниц в кэше
+    LEADERBOARD_CACHE_TTL: int = 10  # Время жизни страницы в кэше (сек)
+
+    # Настройки выгрузки баллов в CSV
+    EXPORT_BATCH_SIZE: int = 5000  # Количество строк, получаемых из БД за один раз
+    EXPORT_SPOOL_SIZE: int = 10 * 1024 * 1024  # Размер файла, до которого выгрузка хранится в памяти (байт)
+    EXPORT_UPLOAD_TIMEOUT: int = 300  # Ограничение времени отправки файла в Telegram (сек)
+
+    # Настройки загрузки баллов из CSV
+    IMPORT_BATCH_SIZE: int = 10000  # Количество строк, проверяемых и загружаемых в БД за один раз
+    IMPORT_TIMEOUT: float = 3600  # Ограничение времени выполнения запросов загрузки и выгрузки баллов (сек)
+    IMPORT_MAX_REPORTED_ERRORS: int = 20  # Количество ошибок, показываемых в отчете о загрузке
+
+    # Настройки рассылки сообщений всем пользователям
+    BROADCAST_RATE: float = 25  # Сообщений в секунду (лимит Telegram около 30, запас остается для ответов бота)
+    BROADCAST_CONCURRENCY: int = 10  # Количество одновременно отправляемых сообщений
+    BROADCAST_CHUNK_SIZE: int = 100  # Количество получателей между контрольными точками
+    BROADCAST_LEASE: float = 60  # Время, на которое экземпляр бота берет рассылку в работу (сек)
+
+    # Настройки хранилища FSM
+    FSM_STORAGE: Literal["memory", "postgres"] = "postgres"  # Где хранить состояния пользователей
+    FSM_FLUSH_INTERVAL: float = 0.5  # Интервал пакетного сохранения изменений в БД (сек)
+    FSM_CACHE_SIZE: int = 10000  # Максимальное количество записей в локальном кэше
+    FSM_CACHE_TTL: int = 60  # Время жизни записи в локальном кэше (сек)
+    # Обновления одного чата могут обрабатывать разные экземпляры бота (без привязки чата к экземпляру):
+    # состояние читается из БД при каждом обращении и сохраняется сразу, без кэша и пакетной записи
+    FSM_SHARED: bool = False
 
     model_config = SettingsConfigDict(
         env_file=os.path.join(BASEDIR, "..", ".env")  # Файл с переменными окружения
@@ -36,18 +139,56 @@ class Settings(BaseSettings):
 # Инициализация настроек приложения
 settings = Settings()
 
+# Получение строки подключения к базе данных
+database_url = settings.DATABASE_URL
+
+
+def create_fsm_storage() -> BaseStorage:
+    """Создает хранилище FSM в соответствии с настройками"""
+    if settings.FSM_STORAGE == "postgres":
+        from bot.fsm.storage import PostgresStorage
+        return PostgresStorage(
+            flush_interval=settings.FSM_FLUSH_INTERVAL,
+            cache_size=settings.FSM_CACHE_SIZE,
+            cache_ttl=settings.FSM_CACHE_TTL,
+            shared=settings.FSM_SHARED,
+        )
+    return MemoryStorage()
+
+
+def create_bot_session() -> AiohttpSession:
+    """Создает HTTP-сессию бота для Bot API сервера из настроек"""
+    if settings.TELEGRAM_API_URL:
+        return AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL))
+    return AiohttpSession()
+
+
 # Инициализация бота и диспетчера
 bot = Bot(
     token=settings.BOT_TOKEN,
+    session=create_bot_session(),
     default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN),  # Используем Markdown для форматирования сообщений
 )
-dp = Dispatcher(storage=MemoryStorage())  # В качестве хранилища FSM используем память
+# Все исходящие запросы проходят через ограничитель частоты с очередью и повторами
+telegram_limiter = TelegramRateLimitMiddleware(
+    global_rate=settings.TELEGRAM_GLOBAL_RATE,
+    chat_rate=settings.TELEGRAM_CHAT_RATE,
+    chat_burst=settings.TELEGRAM_CHAT_BURST,
+    group_rate=settings.TELEGRAM_GROUP_RATE,
+    max_retries=settings.TELEGRAM_MAX_RETRIES,
+    max_retry_after=settings.TELEGRAM_MAX_RETRY_AFTER,
+    backoff=settings.TELEGRAM_RETRY_BACKOFF,
+    wait_warning=settings.TELEGRAM_WAIT_WARNING,
+    chats_cache_size=settings.CHAT_COMMANDS_CACHE_SIZE,
+)
+bot.session.middleware(telegram_limiter)
+dp = Dispatcher(storage=create_fsm_storage())
 
 # Настройка логирования с использованием ротации логов
+logger.remove()
+logger.add(sys.stderr, level=settings.LOG_LEVEL)
 log_file_path = os.path.join(BASEDIR, "..", "log.txt")  # Путь до файла логов
 logger.add(
-    log_file_path, format=settings.FORMAT_LOG, rotation=settings.LOG_ROTATION, retention="7 days", compression="zip"
+    log_file_path, level=settings.LOG_LEVEL, format=settings.FORMAT_LOG, rotation=settings.LOG_ROTATION,
+    retention="7 days", compression="zip", enqueue=settings.LOG_ENQUEUE, buffering=settings.LOG_BUFFERING
 )
-
-# Получение строки подключения к базе данных
-database_url = settings.DATABASE_URL
@@ -1,5 +1,7 @@
-from typing import TypeVar, Generic, List, Optional
+from typing import Any, Dict, Iterable, Sequence, TypeVar, Generic, List, Optional, Tuple
+from asyncpg import PostgresError
 from pydantic import BaseModel
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import update as sqlalchemy_update, delete as sqlalchemy_delete, func
@@ -10,23 +12,48 @@ from loguru import logger
 # Типовой параметр T с ограничением, что это наследник Base
 T = TypeVar("T", bound=Base)
 
+# Количество записей в одном вызове upsert_many (внутри SQLAlchemy делит его на многострочные INSERT)
+UPSERT_CHUNK_SIZE = 10000
+
+
+async def copy_records(
+        session: AsyncSession, table_name: str, columns: Sequence[str], records: Iterable[Tuple[Any, ...]]
+) -> int:
+    """
+    Загрузить строки в таблицу командой COPY через соединение asyncpg текущей сессии
+    COPY выполняется в транзакции сессии и фиксируется или откатывается вместе с ней
+    Возвращает количество загруженных строк
+    """
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    if not driver_connection.is_in_transaction():
+        # Адаптер asyncpg открывает транзакцию при первом запросе, а COPY идет в обход адаптера
+        await connection.exec_driver_sql("SELECT 1")
+    status = await driver_connection.copy_records_to_table(table_name, records=records, columns=list(columns))
+    return int(status.split()[-1])  # Статус команды вида "COPY 1000"
+
 
 class BaseDAO(Generic[T]):
-    """Базовый класс DAO для работы с моделями SQLAlchemy"""
+    """
+    Базовый класс DAO для работы с моделями SQLAlchemy
+    Штатные сообщения пишутся на уровне DEBUG с отложенным форматированием:
+    при уровне логирования INFO и выше они не форматируются
+    """
     model: type[T]
 
     @classmethod
     async def find_one_or_none_by_id(cls, data_id: int, session: AsyncSession):
         """Найти запись по ID"""
-        logger.info(f"Поиск {cls.model.__name__} с ID: {data_id}")
+        logger.debug("Поиск {} с ID: {}", cls.model.__name__, data_id)
         try:
             query = select(cls.model).filter_by(id=data_id)
             result = await session.execute(query)
             record = result.scalar_one_or_none()
             if record:
-                logger.info(f"Запись {cls.model.__name__} с ID {data_id} найдена")
+                logger.debug("Запись {} с ID {} найдена", cls.model.__name__, data_id)
             else:
-                logger.info(f"Запись {cls.model.__name__} с ID {data_id} не найдена")
+                logger.debug("Запись {} с ID {} не найдена", cls.model.__name__, data_id)
             return record
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при поиске записи {cls.model.__name__} с ID {data_id}: {e}")
@@ -36,15 +63,15 @@ class BaseDAO(Generic[T]):
     async def find_one_or_none(cls, session: AsyncSession, filters: BaseModel):
         """Найти одну запись по фильтрам"""
         filter_dict = filters.model_dump(exclude_unset=True)
-        logger.info(f"Поиск {cls.model.__name__} с фильтрами: {filter_dict}")
+        logger.debug("Поиск {} с фильтрами: {}", cls.model.__name__, filter_dict)
         try:
             query = select(cls.model).filter_by(**filter_dict)
             result = await session.execute(query)
             record = result.scalar_one_or_none()
             if record:
-                logger.info(f"Запись {cls.model.__name__} найдена: {record}")
+                logger.debug("Запись {} найдена: {}", cls.model.__name__, record)
             else:
-                logger.info(f"Запись {cls.model.__name__} не найдена по фильтрам: {filter_dict}")
+                logger.debug("Запись {} не найдена по фильтрам: {}", cls.model.__name__, filter_dict)
             return record
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при поиске записи {cls.model.__name__} по фильтрам {filter_dict}: {e}")
@@ -54,12 +81,12 @@ class BaseDAO(Generic[T]):
     async def find_all(cls, session: AsyncSession, filters: Optional[BaseModel] = None):
         """Найти все записи (с фильтром или без)"""
         filter_dict = filters.model_dump(exclude_unset=True) if filters else None
-        logger.info(f"Поиск всех записей {cls.model.__name__} с фильтрами: {filter_dict}")
+        logger.debug("Поиск всех записей {} с фильтрами: {}", cls.model.__name__, filter_dict)
         try:
             query = select(cls.model) if not filter_dict else select(cls.model).filter_by(**filter_dict)
             result = await session.execute(query)
             records = result.scalars().all()
-            logger.info(f"Найдено записей {cls.model.__name__}: {len(records)}")
+            logger.debug("Найдено записей {}: {}", cls.model.__name__, len(records))
             return records
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при поиске записей {cls.model.__name__} с фильтрами {filter_dict}: {e}")
@@ -69,12 +96,12 @@ class BaseDAO(Generic[T]):
     async def add(cls, session: AsyncSession, values: BaseModel):
         """Добавить одну запись"""
         values_dict = values.model_dump(exclude_unset=True)
-        logger.info(f"Добавление новой записи {cls.model.__name__} с данными: {values_dict}")
+        logger.debug("Добавление новой записи {} с данными: {}", cls.model.__name__, values_dict)
         try:
             new_instance = cls.model(**values_dict)
             session.add(new_instance)
             await session.commit()
-            logger.info(f"Запись {cls.model.__name__} успешно добавлена: {new_instance}")
+            logger.debug("Запись {} успешно добавлена: {}", cls.model.__name__, new_instance)
             return new_instance
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при добавлении записи {cls.model.__name__} с данными {values_dict}: {e}")
@@ -84,23 +111,105 @@ class BaseDAO(Generic[T]):
     async def add_many(cls, session: AsyncSession, instances: List[BaseModel]):
         """Добавить несколько записей"""
         values_list = [item.model_dump(exclude_unset=True) for item in instances]
-        logger.info(f"Добавление нескольких записей {cls.model.__name__}: {values_list}")
+        logger.debug("Добавление нескольких записей {}: {}", cls.model.__name__, values_list)
         try:
             new_instances = [cls.model(**values) for values in values_list]
             session.add_all(new_instances)
             await session.commit()
-            logger.info(f"Успешно добавлено записей {cls.model.__name__}: {len(new_instances)}")
+            logger.debug("Успешно добавлено записей {}: {}", cls.model.__name__, len(new_instances))
             return new_instances
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при добавлении записей {cls.model.__name__}: {e}")
             raise
 
+    @classmethod
+    async def upsert_many(
+            cls,
+            session: AsyncSession,
+            instances: List[BaseModel],
+            index_elements: Sequence[str],
+            update_fields: Optional[Sequence[str]] = None,
+            chunk_size: int = UPSERT_CHUNK_SIZE,
+    ) -> int:
+        """
+        Создать или обновить несколько записей запросами INSERT ... ON CONFLICT DO UPDATE
+        index_elements - столбцы уникального ограничения, по которому определяется конфликт
+        update_fields - обновляемые при конфликте столбцы (по умолчанию все переданные, кроме index_elements)
+        Записи отправляются пачками по chunk_size строк в одной транзакции, возвращается количество
+        созданных и обновленных записей
+        """
+        # Повторы одного ключа в одном запросе недопустимы для ON CONFLICT: оставляем последнее значение
+        values_by_key: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+        for item in instances:
+            values = item.model_dump(exclude_unset=True)
+            values_by_key[tuple(values[column] for column in index_elements)] = values
+        values_list = list(values_by_key.values())
+        logger.debug("Создание или обновление записей {}: {}", cls.model.__name__, len(values_list))
+        if not values_list:
+            return 0
+
+        columns = list(values_list[0])
+        if update_fields is None:
+            update_fields = [column for column in columns if column not in index_elements]
+
+        query = pg_insert(cls.model)
+        set_ = {column: query.excluded[column] for column in update_fields}
+        if set_ and "updated_at" in cls.model.__table__.c:
+            set_["updated_at"] = func.now()
+        if set_:
+            query = query.on_conflict_do_update(index_elements=list(index_elements), set_=set_)
+        else:
+            query = query.on_conflict_do_nothing(index_elements=list(index_elements))
+        query = query.returning(cls.model.id)
+
+        try:
+            affected = 0
+            for start in range(0, len(values_list), chunk_size):
+                # SQLAlchemy собирает пачку в многострочные INSERT ... VALUES (insertmanyvalues)
+                result = await session.execute(query, values_list[start:start + chunk_size])
+                affected += len(result.all())
+            await session.commit()
+            logger.debug("Создано или обновлено записей {}: {}", cls.model.__name__, affected)
+            return affected
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при создании или обновлении записей {cls.model.__name__}: {e}")
+            raise
+
+    @classmethod
+    async def bulk_insert(cls, session: AsyncSession, instances: List[BaseModel]) -> int:
+        """
+        Добавить большое количество записей командой COPY, минуя ORM
+        Все записи должны содержать одинаковый набор полей, возвращается количество добавленных записей
+        """
+        values_list = [item.model_dump(exclude_unset=True) for item in instances]
+        logger.debug("Загрузка записей {} через COPY: {}", cls.model.__name__, len(values_list))
+        if not values_list:
+            return 0
+
+        columns = list(values_list[0])
+        if any(values.keys() != values_list[0].keys() for values in values_list):
+            raise ValueError("Все записи для COPY должны содержать одинаковый набор полей")
+
+        try:
+            inserted = await copy_records(
+                session, cls.model.__table__.name, columns,
+                (tuple(values[column] for column in columns) for values in values_list)
+            )
+            await session.commit()
+            logger.debug("Загружено записей {}: {}", cls.model.__name__, inserted)
+            return inserted
+        except (SQLAlchemyError, PostgresError) as e:
+            logger.error(f"Ошибка при загрузке записей {cls.model.__name__} через COPY: {e}")
+            raise
+
     @classmethod
     async def update(cls, session: AsyncSession, filters: BaseModel, values: BaseModel):
         """Обновить записи по фильтрам"""
         filter_dict = filters.model_dump(exclude_unset=True)
         values_dict = values.model_dump(exclude_unset=True)
-        logger.info(f"Обновление записей {cls.model.__name__} с фильтрами {filter_dict} и данными {values_dict}")
+        logger.debug(
+            "Обновление записей {} с фильтрами {} и данными {}", cls.model.__name__, filter_dict, values_dict
+        )
         try:
             query = (
                 sqlalchemy_update(cls.model)
@@ -110,7 +219,7 @@ class BaseDAO(Generic[T]):
             )
             result = await session.execute(query)
             await session.commit()
-            logger.info(f"Обновлено записей {cls.model.__name__}: {result.rowcount}")
+            logger.debug("Обновлено записей {}: {}", cls.model.__name__, result.rowcount)
             return result.rowcount
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при обновлении записей {cls.model.__name__}: {e}")
@@ -120,7 +229,7 @@ class BaseDAO(Generic[T]):
     async def delete(cls, session: AsyncSession, filters: BaseModel):
         """Удалить записи по фильтрам"""
         filter_dict = filters.model_dump(exclude_unset=True)
-        logger.info(f"Удаление записей {cls.model.__name__} с фильтрами: {filter_dict}")
+        logger.debug("Удаление записей {} с фильтрами: {}", cls.model.__name__, filter_dict)
         if not filter_dict:
             logger.error("Удаление невозможно: не указан ни один фильтр")
             raise ValueError("Нужен хотя бы один фильтр для удаления")
@@ -128,7 +237,7 @@ class BaseDAO(Generic[T]):
             query = sqlalchemy_delete(cls.model).filter_by(**filter_dict)
             result = await session.execute(query)
             await session.commit()
-            logger.info(f"Удалено записей {cls.model.__name__}: {result.rowcount}")
+            logger.debug("Удалено записей {}: {}", cls.model.__name__, result.rowcount)
             return result.rowcount
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при удалении записей {cls.model.__name__} с фильтрами {filter_dict}: {e}")
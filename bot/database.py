@@ -1,23 +1,157 @@
+import asyncio
+import time
+from contextvars import ContextVar
 from datetime import datetime
-from sqlalchemy import Integer, func
+from typing import Dict
+from loguru import logger
+from sqlalchemy import Integer, event, func, text
 from sqlalchemy.ext.asyncio import (
     AsyncSession, create_async_engine, async_sessionmaker, AsyncAttrs
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from bot.config import database_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from bot.config import database_url, settings
+from bot.querylog import track_queries
+
+
+class PoolWaitStats:
+    """Статистика ожидания свободного соединения в пуле"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        if wait >= settings.DB_POOL_WAIT_WARNING:
+            logger.warning(f"Ожидание соединения из пула заняло {wait:.3f} с ({engine.pool.status()})")
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "checkouts": self.checkouts,
+            "total_wait": self.total_wait,
+            "avg_wait": self.total_wait / self.checkouts if self.checkouts else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, измеряющий время ожидания при выдаче соединения"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_stats.record(time.perf_counter() - started)
+
 
 # Асинхронный движок для подключения к базе данных
-engine = create_async_engine(database_url)
+engine = create_async_engine(
+    database_url,
+    poolclass=TimedAsyncQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={
+        # Кэши подготовленных запросов asyncpg и SQLAlchemy (0 - отключить, например, для pgbouncer)
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "command_timeout": settings.DB_COMMAND_TIMEOUT,
+        "server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT)},
+    },
+)
+
+# Медленные запросы пишутся в лог, запросы обработчиков считаются (см. QueryTrackingMiddleware)
+track_queries(engine)
+
+# Ключ в info соединения: запрос в текущей транзакции завершился ошибкой. Postgres отклоняет все
+# последующие запросы такой транзакции до отката, даже если ошибку перехватил сервис (см. connection)
+TRANSACTION_FAILED = "transaction_failed"
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def mark_failed_transaction(exception_context):
+    if exception_context.connection is not None:
+        exception_context.connection.info[TRANSACTION_FAILED] = True
+
+
+@event.listens_for(engine.sync_engine, "rollback")
+def clear_failed_transaction(conn):
+    conn.info.pop(TRANSACTION_FAILED, None)
+
+
+async def transaction_failed(session: AsyncSession) -> bool:
+    """Нужно ли откатить транзакцию сессии: ошибка сброса изменений или запроса, обработанная внутри метода"""
+    if not session.is_active:
+        return True
+    if not session.in_transaction():
+        return False
+    connection = await session.connection()
+    return connection.info.get(TRANSACTION_FAILED, False)
+
 
 # Асинхронные сессии
 async_session_maker = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# Движок для редких длительных операций (загрузка и выгрузка баллов администратором): соединение открывается
+# на время операции, без ограничения времени запроса на сервере и с увеличенным ограничением на клиенте
+maintenance_engine = create_async_engine(
+    database_url,
+    poolclass=NullPool,
+    connect_args={
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "command_timeout": settings.IMPORT_TIMEOUT,
+        "server_settings": {"statement_timeout": "0"},
+    },
+)
+maintenance_session_maker = async_sessionmaker(
+    maintenance_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+async def warm_up_pool() -> None:
+    """Заранее открывает соединения пула, чтобы первые запросы не ждали подключения к БД"""
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*[ping() for _ in range(settings.DB_POOL_SIZE)])
+    logger.info(f"Пул соединений с БД прогрет: {engine.pool.status()}")
+
+
+# Сессия, открытая на время обработки текущего обновления (см. DatabaseSessionMiddleware)
+current_session: ContextVar[AsyncSession | None] = ContextVar("current_session", default=None)
+
 
 # Декоратор для автоматического создания и управления сессией базы данных
 def connection(method):
     async def wrapper(*args, **kwargs):
+        session = current_session.get()
+        if session is not None:
+            # Используем сессию текущего обновления, её закрытием управляет middleware
+            try:
+                result = await method(*args, session=session, **kwargs)
+            except Exception as e:
+                await session.rollback()  # Откатываем транзакцию в случае ошибки
+                raise e
+            if await transaction_failed(session):
+                # Сбрасываем транзакцию, ошибка которой была обработана внутри метода: иначе все следующие
+                # запросы обновления завершатся ошибкой "current transaction is aborted"
+                await session.rollback()
+            return result
+
         async with async_session_maker() as session:
             try:
                 # Передаем сессию в метод
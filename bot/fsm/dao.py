@@ -0,0 +1,43 @@
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.dao.base import BaseDAO
+from bot.fsm.models import FSMStates
+
+
+class FSMStatesDAO(BaseDAO):
+    model = FSMStates
+
+    @classmethod
+    async def save_many(
+            cls, session: AsyncSession, records: Dict[str, Tuple[Optional[str], Dict[str, Any]]]
+    ) -> None:
+        """
+        Сохранить состояния и данные FSM одной транзакцией
+        Записи без состояния и данных удаляются, остальные создаются или обновляются одним запросом
+        """
+        to_delete = [key for key, (state, data) in records.items() if state is None and not data]
+        to_upsert = [
+            {"key": key, "state": state, "data": data}
+            for key, (state, data) in records.items() if state is not None or data
+        ]
+        logger.debug(
+            "Сохранение записей {}: обновлено {}, удалено {}", cls.model.__name__, len(to_upsert), len(to_delete)
+        )
+        try:
+            if to_delete:
+                await session.execute(delete(cls.model).where(cls.model.key.in_(to_delete)))
+            if to_upsert:
+                query = pg_insert(cls.model).values(to_upsert)
+                query = query.on_conflict_do_update(
+                    index_elements=[cls.model.key],
+                    set_={"state": query.excluded.state, "data": query.excluded.data, "updated_at": func.now()}
+                )
+                await session.execute(query)
+            await session.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при сохранении записей {cls.model.__name__}: {e}")
+            raise
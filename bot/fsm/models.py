@@ -0,0 +1,14 @@
+from typing import Any, Dict
+from sqlalchemy import String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from bot.database import Base
+
+
+class FSMStates(Base):
+    key: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    state: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    data: Mapped[Dict[str, Any]] = mapped_column(JSONB, nullable=False, server_default="{}")
+
+    def __str__(self):
+        return f"<FSMState {self.key}: {self.state}>"
@@ -0,0 +1,5 @@
+from pydantic import BaseModel, Field
+
+
+class FSMKeyModel(BaseModel):
+    key: str = Field(..., min_length=1, max_length=255, description="Ключ записи FSM (чат и пользователь)")
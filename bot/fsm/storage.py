@@ -0,0 +1,154 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from bot.cache import TTLCache, NOT_CACHED
+
+# Запись FSM: состояние и данные
+FSMRecord = Tuple[Optional[str], Dict[str, Any]]
+
+
+class PostgresStorage(BaseStorage):
+    """
+    Хранилище FSM в таблице fsmstates
+    Чтение идет через локальный кэш, а изменения копятся в памяти и сохраняются в БД
+    одной транзакцией раз в flush_interval секунд (и при закрытии хранилища).
+    Кэш не знает об изменениях в других процессах, поэтому так хранилище можно использовать, только если
+    обновления одного чата всегда обрабатывает один экземпляр бота. Если это не так, нужен режим shared:
+    запись читается из БД при каждом обращении и сохраняется сразу (последняя запись побеждает)
+
+    Хранилище создается в bot.config, поэтому модули работы с БД импортируются
+    при первом обращении, а не при импорте этого модуля
+    """
+
+    def __init__(
+            self,
+            session_maker: Optional[async_sessionmaker[AsyncSession]] = None,
+            flush_interval: float = 0.5,
+            cache_size: int = 10000,
+            cache_ttl: float = 60,
+            key_builder: Optional[KeyBuilder] = None,
+            shared: bool = False,
+    ):
+        self._session_maker = session_maker
+        self.shared = shared
+        self.flush_interval = flush_interval
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self._cache: TTLCache[str, FSMRecord] = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._pending: Dict[str, FSMRecord] = {}  # Изменения, еще не сохраненные в БД
+        self._flushing: Dict[str, FSMRecord] = {}  # Изменения, которые сохраняются в данный момент
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def session_maker(self) -> async_sessionmaker[AsyncSession]:
+        if self._session_maker is None:
+            from bot.database import async_session_maker
+            self._session_maker = async_session_maker
+        return self._session_maker
+
+    @asynccontextmanager
+    async def _session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Сессия обновления, если обращение идет из хендлера (второе соединение из пула на каждое обновление
+        при нагрузке исчерпывает пул), иначе новая сессия
+        """
+        from bot.database import current_session
+        session = current_session.get()
+        if session is not None:
+            yield session
+            return
+        async with self.session_maker() as session:
+            yield session
+
+    async def _load(self, key: StorageKey) -> Tuple[str, FSMRecord]:
+        """Возвращает запись по ключу: из несохраненных изменений, кэша или БД"""
+        db_key = self.key_builder.build(key)
+        for records in (self._pending, self._flushing):
+            if db_key in records:
+                return db_key, records[db_key]
+
+        if not self.shared:
+            record = self._cache.get(db_key)
+            if record is not NOT_CACHED:
+                return db_key, record
+
+        from bot.fsm.dao import FSMStatesDAO
+        from bot.fsm.schemas import FSMKeyModel
+        async with self._session() as session:
+            row = await FSMStatesDAO.find_one_or_none(session, FSMKeyModel(key=db_key))
+        record = (row.state, row.data) if row else (None, {})
+        if self.shared:
+            return db_key, record
+
+        # Пока выполнялся запрос, запись могла измениться: изменение в очереди на сохранение, в процессе
+        # сохранения или уже сохраненное (тогда оно в кэше) новее прочитанной строки и не должно ею заменяться
+        for records in (self._pending, self._flushing):
+            if db_key in records:
+                return db_key, records[db_key]
+        cached = self._cache.get(db_key)
+        if cached is not NOT_CACHED:
+            return db_key, cached
+        self._cache.set(db_key, record)
+        return db_key, record
+
+    async def _write(self, db_key: str, record: FSMRecord) -> None:
+        """Обновляет запись в кэше и планирует её сохранение в БД (в режиме shared - сохраняет сразу)"""
+        if self.shared:
+            from bot.fsm.dao import FSMStatesDAO
+            async with self._session() as session:
+                await FSMStatesDAO.save_many(session, {db_key: record})
+            return
+        self._cache.set(db_key, record)
+        self._pending[db_key] = record
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Сохраняет накопленные изменения в БД одной транзакцией"""
+        if not self._pending:
+            return
+        records, self._pending = self._pending, {}
+        self._flushing = records
+        try:
+            from bot.fsm.dao import FSMStatesDAO
+            async with self.session_maker() as session:
+                await FSMStatesDAO.save_many(session, records)
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении состояний FSM ({len(records)} записей): {e}")
+            # Возвращаем изменения в очередь, если после них не было более новых
+            for db_key, record in records.items():
+                self._pending.setdefault(db_key, record)
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._delayed_flush())
+        finally:
+            self._flushing = {}
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        db_key, (_, data) = await self._load(key)
+        await self._write(db_key, (state.state if isinstance(state, State) else state, data))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, (state, _) = await self._load(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        db_key, (state, _) = await self._load(key)
+        await self._write(db_key, (state, data.copy()))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, (_, data) = await self._load(key)
+        return data.copy()
+
+    async def close(self) -> None:
+        # Дожидаемся запланированного сохранения и сохраняем оставшиеся изменения
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
@@ -1,9 +1,22 @@
 import asyncio
+from aiohttp import web
 from aiogram.types import BotCommand, BotCommandScopeDefault
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from loguru import logger
-from bot.config import bot, dp
+from bot.config import bot, dp, settings, telegram_limiter
+from bot.database import async_session_maker, engine, maintenance_engine, pool_wait_stats, warm_up_pool
+from bot.metrics import CallbackMetric, MetricsServer, instrument_engine, registry
+from bot.middlewares.database import DatabaseSessionMiddleware
+from bot.middlewares.metrics import HandlerMetricsMiddleware, TelegramMetricsMiddleware
+from bot.middlewares.querylog import QueryTrackingMiddleware
+from bot.querylog import QUERY_BUDGETS
+from bot.admin.router import router as admin_router
+from bot.broadcast.service import broadcaster, resume_broadcasts
 from bot.users.router import router as users_router
+from bot.users.service import chat_commands, user_cache
+from bot.scores.leaderboard import leaderboard_pages
 from bot.scores.router import router as scores_router
+from bot.scores.service import load_subjects
 
 
 async def set_default_commands():
@@ -22,24 +35,155 @@ async def start_bot():
 
 async def stop_bot():
     """Выполняется при завершении работы бота"""
+    await dp.storage.close()  # Сохраняем несохраненные состояния FSM
+    await chat_commands.close()  # Устанавливаем отложенные изменения команд чатов
     logger.info("Бот остановлен")
 
 
-async def main():
-    """Основная функция запуска приложения"""
-    # Регистрация маршрутов (обработчиков)
+async def set_webhook():
+    """Регистрирует вебхук в Telegram"""
+    await bot.set_webhook(
+        f"{settings.WEBHOOK_BASE_URL.rstrip('/')}{settings.WEBHOOK_PATH}",
+        secret_token=settings.WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=True,
+    )
+    logger.info(f"Вебхук установлен: {settings.WEBHOOK_BASE_URL}{settings.WEBHOOK_PATH}")
+
+
+def register_runtime_metrics():
+    """Метрики состояния пула соединений, очереди запросов к Telegram и кэшей (вычисляются при запросе)"""
+    pool = engine.pool
+    caches = {"users": user_cache, "leaderboard": leaderboard_pages}
+    for metric in [
+        CallbackMetric(
+            "bot_db_pool_connections", "Соединения пула БД", ["state"],
+            collect=lambda: {("checked_out",): pool.checkedout(), ("idle",): pool.checkedin(),
+                             ("overflow",): max(pool.overflow(), 0)},
+        ),
+        CallbackMetric(
+            "bot_db_pool_checkouts_total", "Выдачи соединений из пула БД",
+            collect=lambda: {(): pool_wait_stats.checkouts}, metric_type="counter",
+        ),
+        CallbackMetric(
+            "bot_db_pool_wait_seconds_total", "Суммарное ожидание свободного соединения в пуле БД",
+            collect=lambda: {(): pool_wait_stats.total_wait}, metric_type="counter",
+        ),
+        CallbackMetric(
+            "bot_telegram_queued_requests", "Запросы к Telegram, ожидающие разрешения ограничителя частоты",
+            collect=lambda: {(): telegram_limiter.stats.queued},
+        ),
+        CallbackMetric(
+            "bot_telegram_queue_wait_seconds_total", "Суммарное ожидание запросов в очереди ограничителя частоты",
+            collect=lambda: {(): telegram_limiter.stats.total_wait}, metric_type="counter",
+        ),
+        CallbackMetric(
+            "bot_telegram_retries_total", "Повторы запросов к Telegram",
+            collect=lambda: {(): telegram_limiter.stats.retries}, metric_type="counter",
+        ),
+        CallbackMetric(
+            "bot_cache_requests_total", "Обращения к локальным кэшам", ["cache", "result"],
+            collect=lambda: {
+                labels: value for name, cache in caches.items()
+                for labels, value in (((name, "hit"), cache.hits), ((name, "miss"), cache.misses))
+            },
+            metric_type="counter",
+        ),
+        CallbackMetric(
+            "bot_cache_entries", "Записи в локальных кэшах", ["cache"],
+            collect=lambda: {(name,): len(cache) for name, cache in caches.items()},
+        ),
+    ]:
+        registry.register(metric)
+
+
+def setup_metrics():
+    """Подключает сбор метрик и HTTP-сервер для их получения (METRICS_PORT=0 - отключено)"""
+    if not settings.METRICS_PORT:
+        return
+    instrument_engine(engine)
+    instrument_engine(maintenance_engine)
+    bot.session.middleware(TelegramMetricsMiddleware())  # После ограничителя частоты: без ожидания в очереди
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    register_runtime_metrics()
+
+    metrics_server = MetricsServer(settings.METRICS_HOST, settings.METRICS_PORT)
+    dp.startup.register(metrics_server.start)
+    dp.shutdown.register(metrics_server.stop)
+
+
+def setup_dispatcher():
+    """Регистрирует middleware, маршруты и хуки диспетчера"""
+    # Одна сессия БД на каждое обновление
+    dp.update.outer_middleware(DatabaseSessionMiddleware(async_session_maker))
+    # Количество запросов к БД каждого обработчика: повторы одного запроса и превышение бюджета
+    query_tracking = QueryTrackingMiddleware(
+        QUERY_BUDGETS, settings.DB_REPEATED_QUERY_THRESHOLD, settings.DB_QUERY_BUDGET_STRICT
+    )
+    dp.message.middleware(query_tracking)
+    dp.callback_query.middleware(query_tracking)
+
+    # Регистрация маршрутов (обработчиков), команды администраторов доступны в любом состоянии диалога
+    dp.include_router(admin_router)
     dp.include_router(users_router)
     dp.include_router(scores_router)
 
     # Регистрация хуков на запуск и завершение
+    dp.startup.register(load_subjects)  # Справочник предметов нужен до обработки первого обновления
     dp.startup.register(start_bot)
     dp.startup.register(set_default_commands)
+    dp.startup.register(warm_up_pool)
+    dp.startup.register(resume_broadcasts)  # Незавершенная рассылка продолжается в фоне
+    dp.shutdown.register(broadcaster.stop)
     dp.shutdown.register(stop_bot)
 
-    # Запуск бота в режиме long polling и очистка всех ожидающих обновлений
+
+async def run_polling():
+    """Запуск бота в режиме long polling и очистка всех ожидающих обновлений"""
+    await bot.delete_webhook(drop_pending_updates=True)
+    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+
+
+async def run_webhook():
+    """
+    Запуск бота в режиме вебхука на aiohttp-сервере
+    Сервер сразу отвечает Telegram и обрабатывает обновления в фоне, параллельно друг другу.
+    Можно запускать несколько экземпляров за балансировщиком нагрузки, при этом вебхук
+    должен регистрировать только один из них (WEBHOOK_SET_ON_STARTUP)
+    """
+    if not settings.WEBHOOK_SECRET:
+        raise ValueError("Для режима вебхука необходимо задать WEBHOOK_SECRET")
+
+    if settings.WEBHOOK_SET_ON_STARTUP:
+        dp.startup.register(set_webhook)
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp, bot=bot, secret_token=settings.WEBHOOK_SECRET, handle_in_background=True
+    ).register(app, path=settings.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host=settings.WEBAPP_HOST, port=settings.WEBAPP_PORT).start()
+        logger.info(f"Вебхук-сервер слушает {settings.WEBAPP_HOST}:{settings.WEBAPP_PORT}{settings.WEBHOOK_PATH}")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def main():
+    """Основная функция запуска приложения"""
+    setup_dispatcher()
+    setup_metrics()
+
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if settings.BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            await run_polling()
     except KeyboardInterrupt:
         logger.warning("Бот остановлен вручную")
     except Exception as e:
@@ -47,6 +191,7 @@ async def main():
     finally:
         await bot.session.close()
         logger.info("Сессия бота закрыта")
+        await logger.complete()  # Дожидаемся записи сообщений из очереди логирования
 
 
 if __name__ == "__main__":
@@ -0,0 +1,225 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from aiohttp import web
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+LabelValues = Tuple[str, ...]
+
+# Границы интервалов гистограмм времени (сек)
+HANDLER_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+TELEGRAM_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """Метрика в текстовом формате Prometheus"""
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Histogram(Metric):
+    """Распределение значений по интервалам (для времени выполнения)"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Для каждого набора меток: количество значений по интервалам (последний - выше всех границ) и их сумма
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(self._sums[labels])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """Метрика, значения которой вычисляются при каждом запросе (статистика пула, кэшей, очереди)"""
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            *,
+            collect: Callable[[], Dict[LabelValues, float]],
+            metric_type: str = "gauge",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.type = metric_type
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.collect().items()
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        blocks = []
+        for metric in self._metrics.values():
+            try:
+                blocks.append(metric.render())
+            except Exception as e:
+                # Ошибка одной метрики не должна лишать нас остальных
+                logger.error(f"Ошибка при сборе метрики {metric.name}: {e}")
+        return "\n".join(blocks) + "\n"
+
+
+registry = MetricsRegistry()
+
+handler_duration = registry.register(Histogram(
+    "bot_handler_duration_seconds", "Время работы обработчика обновления", ["handler"], HANDLER_BUCKETS
+))
+handler_errors = registry.register(Counter(
+    "bot_handler_errors_total", "Исключения, вышедшие из обработчика", ["handler", "error"]
+))
+db_statement_duration = registry.register(Histogram(
+    "bot_db_statement_duration_seconds", "Время выполнения SQL-запроса", ["operation"], DB_BUCKETS
+))
+db_statement_errors = registry.register(Counter(
+    "bot_db_statement_errors_total", "Ошибки выполнения SQL-запросов", ["operation", "error"]
+))
+telegram_request_duration = registry.register(Histogram(
+    "bot_telegram_request_duration_seconds", "Время запроса к Telegram Bot API (каждая попытка отдельно)",
+    ["method"], TELEGRAM_BUCKETS
+))
+telegram_request_errors = registry.register(Counter(
+    "bot_telegram_request_errors_total", "Ошибки запросов к Telegram Bot API", ["method", "error"]
+))
+
+
+def statement_operation(statement: str) -> str:
+    """Тип SQL-запроса для метки метрики (SELECT, INSERT, ...), без текста запроса"""
+    words = statement.lstrip(" \n(").split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подключает измерение времени выполнения запросов к движку через события SQLAlchemy"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        db_statement_duration.observe(time.perf_counter() - started, statement_operation(statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_started"):
+            conn.info["metrics_started"].pop()
+        operation = statement_operation(exception_context.statement or "")
+        db_statement_errors.inc(operation, type(exception_context.original_exception).__name__)
+
+
+class MetricsServer:
+    """Локальный HTTP-сервер, отдающий метрики в текстовом формате Prometheus"""
+
+    def __init__(self, host: str, port: int, metrics: MetricsRegistry = registry):
+        self.host = host
+        self.port = port
+        self.metrics = metrics
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.metrics.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, host=self.host, port=self.port).start()
+        except OSError as e:
+            # Метрики не должны мешать запуску бота (например, если порт занят другим экспортером)
+            logger.error(f"Не удалось запустить сервер метрик на {self.host}:{self.port}: {e}")
+            await self.stop()
+            return
+        logger.info(f"Метрики доступны по адресу http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,33 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from bot.database import current_session
+
+
+class DatabaseSessionMiddleware(BaseMiddleware):
+    """
+    Открывает одну сессию базы данных на всё обновление
+    Сессия передается хендлерам (аргумент session) и сервисам (через декоратор connection)
+    и закрывается после завершения обработки обновления
+    """
+
+    def __init__(self, session_maker: async_sessionmaker[AsyncSession]):
+        self.session_maker = session_maker
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        async with self.session_maker() as session:
+            token = current_session.set(session)
+            data["session"] = session
+            try:
+                return await handler(event, data)
+            except Exception:
+                await session.rollback()  # Откатываем транзакцию в случае ошибки
+                raise
+            finally:
+                current_session.reset(token)
@@ -0,0 +1,58 @@
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+from bot.metrics import handler_duration, handler_errors, telegram_request_duration, telegram_request_errors
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Измеряет время работы и считает исключения каждого обработчика (метка - имя функции обработчика)
+    Регистрируется как внутренний middleware, чтобы обработчик для обновления был уже выбран
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        name = data["handler"].callback.__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            handler_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            handler_duration.observe(time.perf_counter() - started, name)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Считает запросы к Telegram Bot API и измеряет время их выполнения по методам
+    Подключается после ограничителя частоты: ожидание в его очереди не входит во время запроса,
+    а каждый повтор учитывается как отдельный запрос
+    """
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: "Bot",
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            telegram_request_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            telegram_request_duration.observe(time.perf_counter() - started, name)
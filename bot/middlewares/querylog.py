@@ -0,0 +1,55 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from loguru import logger
+from bot.querylog import QueryBudgetExceeded, UpdateQueryStats, current_query_stats
+
+
+class QueryTrackingMiddleware(BaseMiddleware):
+    """
+    Считает запросы к БД, выполненные обработчиком обновления (см. track_queries)
+    Предупреждает, если запрос одного вида повторился repeat_threshold раз (признак N+1) и если
+    обработчик превысил свой бюджет запросов. В строгом режиме (для тестов и бенчмарков) превышение
+    бюджета завершается исключением QueryBudgetExceeded
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, repeat_threshold: int = 2, strict: bool = False):
+        self.budgets = budgets or {}
+        self.repeat_threshold = repeat_threshold
+        self.strict = strict
+        self.max_queries: Dict[str, int] = {}  # Наибольшее количество запросов за обновление по обработчикам
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        stats = UpdateQueryStats(data["handler"].callback.__name__)
+        token = current_query_stats.set(stats)
+        try:
+            result = await handler(event, data)
+        finally:
+            current_query_stats.reset(token)
+            stats.active = False
+            self.report(stats)
+        self.check_budget(stats)
+        return result
+
+    def report(self, stats: UpdateQueryStats) -> None:
+        self.max_queries[stats.handler] = max(self.max_queries.get(stats.handler, 0), stats.count)
+        if not stats.count:
+            return
+        logger.debug(f"Обработчик {stats.handler}: запросов к БД {stats.count}, {stats.total_time * 1000:.1f} мс")
+        if self.repeat_threshold:
+            for shape, count in stats.repeated(self.repeat_threshold).items():
+                logger.warning(f"Запрос повторился {count} раз в обработчике {stats.handler}: {shape[:300]}")
+
+    def check_budget(self, stats: UpdateQueryStats) -> None:
+        budget = self.budgets.get(stats.handler)
+        if budget is None or stats.count <= budget:
+            return
+        message = f"Обработчик {stats.handler} выполнил {stats.count} запросов к БД при бюджете {budget}"
+        if self.strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
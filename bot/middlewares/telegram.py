@@ -0,0 +1,165 @@
+import asyncio
+import random
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Union
+from aiohttp import ClientConnectorError
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import (
+    TelegramEntityTooLarge, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+)
+from aiogram.methods import (
+    DeleteMyCommands, DeleteWebhook, GetChat, GetFile, GetMe, GetMyCommands, GetUpdates, GetWebhookInfo,
+    Response, SetMyCommands, SetWebhook, TelegramMethod
+)
+from aiogram.methods.base import TelegramType
+from loguru import logger
+from bot.cache import TTLCache, NOT_CACHED
+from bot.ratelimit import TokenBucket
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+# Методы, повторный вызов которых ничего не меняет: их можно повторять, даже если неизвестно,
+# выполнил ли Telegram первый запрос (тайм-аут, обрыв соединения после отправки)
+IDEMPOTENT_METHODS = (
+    GetMe, GetFile, GetChat, GetMyCommands, GetWebhookInfo, SetMyCommands, DeleteMyCommands, SetWebhook, DeleteWebhook
+)
+
+
+def request_not_sent(error: TelegramNetworkError) -> bool:
+    """Соединение с Telegram не было установлено, значит, запрос точно не дошел до сервера"""
+    return isinstance(error.__context__, ClientConnectorError)
+
+
+class TelegramRequestStats:
+    """Статистика исходящих запросов к Telegram: очередь на отправку, ожидание и повторы"""
+
+    def __init__(self, wait_warning: float):
+        self.wait_warning = wait_warning
+        self.requests = 0
+        self.queued = 0  # Запросов, ожидающих разрешения на отправку в данный момент
+        self.max_queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.retries = 0
+
+    def enter_queue(self) -> None:
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+
+    def leave_queue(self, method: str, wait: float) -> None:
+        self.queued -= 1
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        if wait >= self.wait_warning:
+            logger.warning(f"Запрос {method} ждал отправки {wait:.3f} с (в очереди {self.queued})")
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "total_wait": self.total_wait,
+            "avg_wait": self.total_wait / self.requests if self.requests else 0.0,
+            "max_wait": self.max_wait,
+            "retries": self.retries,
+        }
+
+
+class TelegramRateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Ограничение частоты исходящих запросов к Telegram Bot API
+    Все запросы проходят через общую корзину токенов (global_rate в секунду), запросы к конкретному
+    чату - еще и через корзину этого чата (chat_rate для личных чатов, group_rate для групп).
+    При превышении лимита запрос ждет своей очереди, а не завершается ошибкой.
+    На ответ RetryAfter отправка в чат (или все запросы, если чата нет) приостанавливается на указанное
+    время, ошибки сервера Telegram (5xx) повторяются с нарастающей паузой со случайным разбросом.
+    Сетевая ошибка повторяется, только если запрос точно не дошел до Telegram (не удалось соединиться)
+    или метод идемпотентный: иначе после тайм-аута повтор sendMessage мог бы отправить сообщение дважды
+    """
+
+    def __init__(
+            self,
+            global_rate: float,
+            chat_rate: float,
+            chat_burst: float,
+            group_rate: float,
+            max_retries: int,
+            max_retry_after: float,
+            backoff: float,
+            wait_warning: float,
+            chats_cache_size: int = 100000,
+    ):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.backoff = backoff
+        self.global_bucket = TokenBucket(rate=global_rate)
+        # Корзины чатов: через 60 с без запросов корзина снова полна, поэтому запись можно удалить
+        self._chat_buckets: TTLCache[Union[int, str], TokenBucket] = TTLCache(maxsize=chats_cache_size, ttl=60)
+        self.stats = TelegramRequestStats(wait_warning)
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is NOT_CACHED:
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            bucket = TokenBucket(
+                rate=self.chat_rate if is_private else self.group_rate,
+                capacity=self.chat_burst if is_private else 1,
+            )
+        self._chat_buckets.set(chat_id, bucket)  # Продлеваем время жизни при каждом запросе
+        return bucket
+
+    async def _wait_turn(self, method: TelegramMethod, chat_bucket: Optional[TokenBucket]) -> None:
+        """Дожидается разрешения на отправку: сначала в лимите чата, затем в общем лимите"""
+        started = time.monotonic()
+        self.stats.enter_queue()
+        try:
+            if chat_bucket is not None:
+                await chat_bucket.acquire()
+            await self.global_bucket.acquire()
+        finally:
+            self.stats.leave_queue(type(method).__name__, time.monotonic() - started)
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: "Bot",
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if isinstance(method, GetUpdates):
+            return await make_request(bot, method)  # Long polling не расходует лимиты отправки
+
+        chat_id = getattr(method, "chat_id", None)
+        chat_bucket = self._chat_bucket(chat_id) if chat_id is not None else None
+        attempt = 0
+        while True:
+            await self._wait_turn(method, chat_bucket)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries or e.retry_after > self.max_retry_after:
+                    raise
+                delay = e.retry_after + random.uniform(0, self.backoff)
+                (chat_bucket or self.global_bucket).pause(delay)
+                logger.warning(
+                    f"Telegram ограничил частоту запросов {type(method).__name__} (чат {chat_id}), "
+                    f"повтор через {delay:.1f} с"
+                )
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if isinstance(e, TelegramEntityTooLarge) or attempt == self.max_retries:
+                    raise
+                if (
+                        isinstance(e, TelegramNetworkError)
+                        and not request_not_sent(e)
+                        and not isinstance(method, IDEMPOTENT_METHODS)
+                ):
+                    raise  # Запрос мог быть выполнен: повтор может продублировать сообщение
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                logger.warning(f"Ошибка запроса {type(method).__name__}: {e}, повтор через {delay:.1f} с")
+                await asyncio.sleep(delay)
+            attempt += 1
+            self.stats.retries += 1
@@ -0,0 +1,102 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from bot.config import settings
+
+# Запросы add_remove_cancel_command для чата, набор команд которого еще не в кэше: чтение chatcommands и check_user
+COMMANDS_SYNC_QUERIES = 2
+
+# Бюджеты запросов к БД на одно обновление для обработчиков из сценариев benchmarks.dispatcher_load
+# (имя функции обработчика -> количество запросов) при холодных кэшах. Превышение означает, что
+# обработчик стал обращаться к БД чаще, чем раньше
+QUERY_BUDGETS: Dict[str, int] = {
+    "register_handler": 1 + COMMANDS_SYNC_QUERIES,  # check_user
+    "get_first_name": 0,
+    "get_last_name": 1 + COMMANDS_SYNC_QUERIES,  # register_user
+    "enter_score_handler": 1 + COMMANDS_SYNC_QUERIES,  # check_user
+    "handle_subject_input": COMMANDS_SYNC_QUERIES,
+    "handle_subject_choice": 1 + COMMANDS_SYNC_QUERIES,  # get_existing_score
+    "handle_score_input": 1 + COMMANDS_SYNC_QUERIES,  # save_score
+    "handle_bulk_confirmation": 1 + COMMANDS_SYNC_QUERIES,  # save_scores
+    "view_scores_handler": 2,  # check_user, get_exam_scores
+}
+
+PARAMETERS_LOG_LIMIT = 1000  # Длина параметров медленного запроса в логе (символов)
+
+_PLACEHOLDER = re.compile(r"\$\d+(::[\w\[\]]+)?")
+_PLACEHOLDER_LIST = re.compile(r"\?(\s*,\s*\?)+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Обработчик выполнил больше запросов к БД, чем допускает его бюджет (в строгом режиме)"""
+
+
+class UpdateQueryStats:
+    """Запросы к БД, выполненные при обработке одного обновления"""
+
+    def __init__(self, handler: str):
+        self.handler = handler
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Counter[str] = Counter()
+        self.active = True  # Запросы фоновых задач, созданных хендлером, после его завершения не учитываются
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.total_time += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Запросы одного вида, выполненные threshold раз и больше (признак N+1)"""
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+
+# Статистика запросов обновления, которое обрабатывается в текущей задаче (см. QueryTrackingMiddleware)
+current_query_stats: ContextVar[Optional[UpdateQueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """Вид запроса: текст без номеров параметров и длины списков IN (...)"""
+    shape = _PLACEHOLDER_LIST.sub("?", _PLACEHOLDER.sub("?", statement))
+    return " ".join(shape.split())
+
+
+def format_parameters(parameters: Any) -> str:
+    text = repr(parameters)
+    return text if len(text) <= PARAMETERS_LOG_LIMIT else text[:PARAMETERS_LOG_LIMIT] + "..."
+
+
+def track_queries(engine: AsyncEngine) -> None:
+    """
+    Подключает к движку учет запросов через события SQLAlchemy: запросы дольше DB_SLOW_QUERY_THRESHOLD
+    пишутся в лог с параметрами, а внутри обработчика обновления запросы считаются в его статистике
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("querylog_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["querylog_started"].pop()
+        stats = current_query_stats.get()
+        if stats is not None and stats.active:
+            stats.record(statement, duration)
+        if settings.DB_SLOW_QUERY_THRESHOLD and duration >= settings.DB_SLOW_QUERY_THRESHOLD:
+            handler = f" в обработчике {stats.handler}" if stats is not None and stats.active else ""
+            logger.warning(
+                f"Медленный запрос{handler} ({duration * 1000:.0f} мс): {' '.join(statement.split())} "
+                f"| параметры: {format_parameters(parameters)}"
+            )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("querylog_started"):
+            conn.info["querylog_started"].pop()
@@ -1,6 +1,225 @@
+from typing import AsyncIterator, List, Sequence, Tuple
+from loguru import logger
+from sqlalchemy import Integer, Row, SmallInteger, and_, column, delete, func, literal, or_, select, text, true, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from bot.dao.base import BaseDAO
-from bot.scores.models import ExamScores
+from bot.scores.models import ExamScores, ScoreHistograms, Subjects
+from bot.users.models import Users
+
+
+class SubjectsDAO(BaseDAO):
+    model = Subjects
+
+    @classmethod
+    async def find_names(cls, session: AsyncSession) -> List[Tuple[int, str]]:
+        """Получить справочник предметов в виде (ID, название) в порядке ID"""
+        logger.debug("Загрузка справочника предметов")
+        try:
+            result = await session.execute(select(cls.model.id, cls.model.name).order_by(cls.model.id))
+            return [tuple(row) for row in result.all()]
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при загрузке справочника предметов: {e}")
+            raise
 
 
 class ExamScoresDAO(BaseDAO):
     model = ExamScores
+
+    @classmethod
+    async def find_user_score(
+            cls, session: AsyncSession, telegram_id: int, subject_id: int
+    ) -> Tuple[Users | None, ExamScores | None]:
+        """Найти пользователя по Telegram ID и его балл по предмету одним запросом"""
+        logger.debug("Поиск пользователя {} и балла {} по предмету {}", telegram_id, cls.model.__name__, subject_id)
+        try:
+            query = (
+                select(Users, cls.model)
+                .outerjoin(cls.model, and_(cls.model.user_id == Users.id, cls.model.subject_id == subject_id))
+                .where(Users.telegram_id == telegram_id)
+            )
+            result = await session.execute(query)
+            row = result.first()
+            return (row[0], row[1]) if row else (None, None)
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске балла пользователя {telegram_id} по предмету {subject_id}: {e}")
+            raise
+
+    @classmethod
+    async def find_all_by_telegram_id(cls, session: AsyncSession, telegram_id: int) -> List[ExamScores]:
+        """Найти все баллы пользователя по его Telegram ID одним запросом"""
+        logger.debug("Поиск всех записей {} пользователя {}", cls.model.__name__, telegram_id)
+        try:
+            query = (
+                select(cls.model)
+                .join(Users, cls.model.user_id == Users.id)
+                .where(Users.telegram_id == telegram_id)
+            )
+            result = await session.execute(query)
+            records = result.scalars().all()
+            logger.debug("Найдено записей {}: {}", cls.model.__name__, len(records))
+            return records
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске баллов пользователя {telegram_id}: {e}")
+            raise
+
+    @classmethod
+    async def upsert_by_telegram_id(
+            cls, session: AsyncSession, telegram_id: int, subject_id: int, score: int
+    ) -> int | None:
+        """
+        Создать или обновить балл пользователя одним запросом (INSERT ... ON CONFLICT DO UPDATE)
+        Возвращает ID записи или None, если пользователь с указанным Telegram ID не найден
+        """
+        logger.debug("Сохранение балла {} по предмету {} для пользователя {}", score, subject_id, telegram_id)
+        try:
+            user_query = select(
+                Users.id, literal(subject_id, SmallInteger), literal(score, Integer)
+            ).where(Users.telegram_id == telegram_id)
+            query = pg_insert(cls.model).from_select(["user_id", "subject_id", "score"], user_query)
+            query = query.on_conflict_do_update(
+                index_elements=[cls.model.user_id, cls.model.subject_id],
+                set_={"score": query.excluded.score, "updated_at": func.now()}
+            ).returning(cls.model.id)
+            result = await session.execute(query)
+            score_id = result.scalar_one_or_none()
+            await session.commit()
+            return score_id
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при сохранении балла пользователя {telegram_id} по предмету {subject_id}: {e}")
+            raise
+
+    @classmethod
+    async def upsert_many_by_telegram_id(
+            cls, session: AsyncSession, telegram_id: int, scores: Sequence[Tuple[int, int]]
+    ) -> int:
+        """
+        Создать или обновить несколько баллов пользователя, заданных парами (ID предмета, балл),
+        одним запросом в одной транзакции
+        Возвращает количество сохраненных записей (0, если пользователь с указанным Telegram ID не найден)
+        """
+        logger.debug("Сохранение баллов пользователя {}: {}", telegram_id, scores)
+        try:
+            scores_values = values(
+                column("subject_id", SmallInteger), column("score", Integer), name="new_scores"
+            ).data(list(scores))
+            user_query = select(
+                Users.id, scores_values.c.subject_id, scores_values.c.score
+            ).join(scores_values, true()).where(Users.telegram_id == telegram_id)
+            query = pg_insert(cls.model).from_select(["user_id", "subject_id", "score"], user_query)
+            query = query.on_conflict_do_update(
+                index_elements=[cls.model.user_id, cls.model.subject_id],
+                set_={"score": query.excluded.score, "updated_at": func.now()}
+            ).returning(cls.model.id)
+            result = await session.execute(query)
+            saved_count = len(result.scalars().all())
+            await session.commit()
+            return saved_count
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при сохранении баллов пользователя {telegram_id}: {e}")
+            raise
+
+    @classmethod
+    async def find_leaderboard_page(
+            cls,
+            session: AsyncSession,
+            subject_id: int,
+            limit: int,
+            after: Tuple[int, int] | None = None,
+            before: Tuple[int, int] | None = None,
+    ) -> List[Tuple[int, int, str, str]]:
+        """
+        Найти страницу рейтинга предмета в порядке (score DESC, id) в виде (балл, ID балла, имя, фамилия)
+        Используется пагинация по ключу вместо OFFSET: after - (балл, ID) последней строки предыдущей
+        страницы, before - (балл, ID) первой строки следующей. Возвращает до limit строк
+        """
+        logger.debug("Поиск страницы рейтинга {}: after={}, before={}", subject_id, after, before)
+        try:
+            query = (
+                select(cls.model.score, cls.model.id, Users.first_name, Users.last_name)
+                .join(Users, Users.id == cls.model.user_id)
+                .where(cls.model.subject_id == subject_id)
+            )
+            if after is not None:
+                score, score_id = after
+                query = query.where(
+                    cls.model.score <= score,
+                    or_(cls.model.score < score, cls.model.id > score_id)
+                ).order_by(cls.model.score.desc(), cls.model.id)
+            elif before is not None:
+                # Идем по индексу в обратную сторону и разворачиваем результат
+                score, score_id = before
+                query = query.where(
+                    cls.model.score >= score,
+                    or_(cls.model.score > score, cls.model.id < score_id)
+                ).order_by(cls.model.score, cls.model.id.desc())
+            else:
+                query = query.order_by(cls.model.score.desc(), cls.model.id)
+            result = await session.execute(query.limit(limit))
+            rows = [tuple(row) for row in result.all()]
+            return rows[::-1] if after is None and before is not None else rows
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске страницы рейтинга {subject_id}: {e}")
+            raise
+
+    @classmethod
+    async def stream_with_users(cls, session: AsyncSession, batch_size: int) -> AsyncIterator[Sequence[Row]]:
+        """
+        Выгрузить все баллы вместе с данными пользователей пачками по batch_size строк (предмет - ID)
+        Используется серверный курсор, поэтому в памяти одновременно находится не больше одной пачки
+        """
+        logger.debug("Выгрузка баллов с данными пользователей пачками по {} строк", batch_size)
+        try:
+            query = (
+                select(
+                    Users.telegram_id, Users.first_name, Users.last_name,
+                    cls.model.subject_id, cls.model.score, cls.model.updated_at
+                )
+                .join(Users, Users.id == cls.model.user_id)
+                .execution_options(yield_per=batch_size)
+            )
+            result = await session.stream(query)
+            async for partition in result.partitions():
+                yield partition
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при выгрузке баллов: {e}")
+            raise
+
+
+class ScoreHistogramsDAO(BaseDAO):
+    model = ScoreHistograms
+
+    @classmethod
+    async def find_counts(cls, session: AsyncSession) -> List[Tuple[int, int, int]]:
+        """Получить ненулевые счетчики гистограмм всех предметов в виде (ID предмета, балл, количество)"""
+        logger.debug("Загрузка гистограмм баллов")
+        try:
+            query = select(cls.model.subject_id, cls.model.score, cls.model.count).where(cls.model.count > 0)
+            result = await session.execute(query)
+            return [tuple(row) for row in result.all()]
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при загрузке гистограмм баллов: {e}")
+            raise
+
+    @classmethod
+    async def rebuild(cls, session: AsyncSession) -> int:
+        """
+        Пересчитать гистограммы по таблице examscores (исправление расхождений)
+        На время пересчета изменения баллов блокируются, возвращается количество непустых корзин
+        """
+        logger.debug("Пересчет гистограмм баллов")
+        try:
+            await session.execute(text("LOCK TABLE examscores IN SHARE MODE"))
+            await session.execute(delete(cls.model))
+            query = pg_insert(cls.model).from_select(
+                ["subject_id", "score", "count"],
+                select(ExamScores.subject_id, ExamScores.score, func.count())
+                .group_by(ExamScores.subject_id, ExamScores.score)
+            )
+            result = await session.execute(query)
+            await session.commit()
+            return result.rowcount
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при пересчете гистограмм баллов: {e}")
+            raise
@@ -1,14 +1,42 @@
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from bot.config import settings
+from bot.scores.subjects import subject_registry
 
 
-def choose_subject_kb(subjects: List[str]) -> InlineKeyboardMarkup:
+class LeaderboardCallback(CallbackData, prefix="lb"):
+    """Данные кнопок рейтинга: ID предмета и ключ (балл, ID) границы страницы"""
+    subject: int
+    after_score: Optional[int] = None
+    after_id: Optional[int] = None
+    before_score: Optional[int] = None
+    before_id: Optional[int] = None
+
+
+class SubjectCallback(CallbackData, prefix="subj"):
+    """Выбор предмета: ID предмета"""
+    code: int
+
+
+class CancelCallback(CallbackData, prefix="cancel"):
+    """Отмена ввода"""
+
+
+class ConfirmCallback(CallbackData, prefix="cf"):
+    """Ответ на вопрос с кнопками "Да" и "Нет" """
+    answer: bool
+
+
+@lru_cache(maxsize=settings.SUBJECT_MATCH_CACHE_SIZE)
+def _subject_kb(subjects: Tuple[str, ...]) -> InlineKeyboardMarkup:
     subject_buttons = [
         [
-            InlineKeyboardButton(text=subject, callback_data=subject)
+            InlineKeyboardButton(text=subject, callback_data=SubjectCallback(code=subject_registry.get_id(subject)).pack())
         ] for subject in subjects
     ]
-    button_cancel = [InlineKeyboardButton(text="Отмена", callback_data="Отмена")]
+    button_cancel = [InlineKeyboardButton(text="Отмена", callback_data=CancelCallback().pack())]
     subject_buttons.append(button_cancel)
     markup = InlineKeyboardMarkup(
         inline_keyboard=subject_buttons
@@ -16,10 +44,53 @@ def choose_subject_kb(subjects: List[str]) -> InlineKeyboardMarkup:
     return markup
 
 
+def choose_subject_kb(subjects: Iterable[str]) -> InlineKeyboardMarkup:
+    """Клавиатура выбора предмета (для каждого набора предметов строится один раз)"""
+    return _subject_kb(tuple(subjects))
+
+
+CONFIRM_KB = InlineKeyboardMarkup(
+    inline_keyboard=[[
+        InlineKeyboardButton(text="Да", callback_data=ConfirmCallback(answer=True).pack()),
+        InlineKeyboardButton(text="Нет", callback_data=ConfirmCallback(answer=False).pack()),
+    ]]
+)
+
+
 def confirm_kb() -> InlineKeyboardMarkup:
-    button_yes = InlineKeyboardButton(text="Да", callback_data="да")
-    button_no = InlineKeyboardButton(text="Нет", callback_data="нет")
+    return CONFIRM_KB
+
+
+@lru_cache(maxsize=1)
+def _leaderboard_subjects_kb(subjects: Tuple[str, ...]) -> InlineKeyboardMarkup:
     markup = InlineKeyboardMarkup(
-        inline_keyboard=[[button_yes, button_no]]
+        inline_keyboard=[
+            [InlineKeyboardButton(text=subject, callback_data=LeaderboardCallback(subject=subject_registry.get_id(subject)).pack())]
+            for subject in subjects
+        ]
     )
     return markup
+
+
+def leaderboard_subjects_kb(subjects: Iterable[str]) -> InlineKeyboardMarkup:
+    return _leaderboard_subjects_kb(tuple(subjects))
+
+
+def leaderboard_page_kb(
+        subject: int, first: Optional[Tuple[int, int]] = None, last: Optional[Tuple[int, int]] = None
+) -> InlineKeyboardMarkup | None:
+    """Кнопки перехода на предыдущую (до first) и следующую (после last) страницы рейтинга"""
+    buttons = []
+    if first is not None:
+        buttons.append(InlineKeyboardButton(
+            text="◀ Назад",
+            callback_data=LeaderboardCallback(subject=subject, before_score=first[0], before_id=first[1]).pack()
+        ))
+    if last is not None:
+        buttons.append(InlineKeyboardButton(
+            text="Вперед ▶",
+            callback_data=LeaderboardCallback(subject=subject, after_score=last[0], after_id=last[1]).pack()
+        ))
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
@@ -0,0 +1,88 @@
+from typing import List, Tuple
+from aiogram.types import InlineKeyboardMarkup
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.cache import NOT_CACHED, SingleFlight, TTLCache
+from bot.config import settings
+from bot.database import connection
+from bot.scores.dao import ExamScoresDAO
+from bot.scores.keyboards import leaderboard_page_kb
+from bot.scores.ranking import score_ranking
+from bot.scores.subjects import subject_registry
+
+# Ключ страницы: (ID предмета, (балл, ID) после которого, (балл, ID) до которого)
+PageKey = Tuple[int, Tuple[int, int] | None, Tuple[int, int] | None]
+Page = Tuple[str, InlineKeyboardMarkup | None]
+
+# Готовые страницы рейтинга: при всплеске обращений к одной странице БД получает один запрос
+leaderboard_pages: TTLCache[PageKey, Page] = TTLCache(
+    maxsize=settings.LEADERBOARD_CACHE_SIZE, ttl=settings.LEADERBOARD_CACHE_TTL
+)
+leaderboard_loads: SingleFlight[PageKey, Page] = SingleFlight()
+
+
+@connection
+async def fetch_page_rows(
+        subject_id: int, limit: int, after: Tuple[int, int] | None, before: Tuple[int, int] | None,
+        session: AsyncSession
+) -> List[Tuple[int, int, str, str]]:
+    return await ExamScoresDAO.find_leaderboard_page(session, subject_id, limit, after=after, before=before)
+
+
+def format_page(subject: str, rows: List[Tuple[int, int, str, str]]) -> str:
+    lines = []
+    for score, _, first_name, last_name in rows:
+        rank = score_ranking.rank(subject, score)
+        place = str(rank.place) if rank else "-"
+        name = f"{first_name} {last_name[:1]}."[:20]
+        lines.append(f"{place:>5} {name:<19}{score:>5}")
+
+    table = "\n".join([f"{'Место':>5} {'Участник':<19}{'Балл':>5}", "=" * 30, *lines])
+    return f"Рейтинг по предмету {subject}:\n\n```\n{table}\n```"
+
+
+async def load_page(subject_id: int, after: Tuple[int, int] | None, before: Tuple[int, int] | None) -> Page:
+    subject = subject_registry.get_name(subject_id)
+    limit = settings.LEADERBOARD_PAGE_SIZE
+    rows = await fetch_page_rows(subject_id, limit + 1, after, before)  # Лишняя строка - признак следующей страницы
+    has_more = len(rows) > limit
+
+    if not rows:
+        if after is not None or before is not None:
+            # Строки вокруг границы страницы удалены - показываем начало рейтинга
+            return await get_leaderboard_page(subject_id)
+        return f"По предмету {subject} пока нет баллов", None
+
+    if before is not None:
+        rows = rows[-limit:]
+        has_prev, has_next = has_more, True
+    else:
+        rows = rows[:limit]
+        has_prev, has_next = after is not None, has_more
+
+    await score_ranking.refresh()
+    first, last = rows[0][:2], rows[-1][:2]
+    markup = leaderboard_page_kb(subject_id, first if has_prev else None, last if has_next else None)
+    return format_page(subject, rows), markup
+
+
+async def get_leaderboard_page(
+        subject_id: int, after: Tuple[int, int] | None = None, before: Tuple[int, int] | None = None
+) -> Page:
+    """
+    Возвращает текст и клавиатуру страницы рейтинга предмета
+    Страницы кэшируются на LEADERBOARD_CACHE_TTL секунд, одновременные запросы одной страницы
+    ожидают одну загрузку
+    """
+    key = (subject_id, after, before)
+    page = leaderboard_pages.get(key)
+    if page is not NOT_CACHED:
+        return page
+
+    async def load() -> Page:
+        loaded_page = await load_page(subject_id, after, before)
+        leaderboard_pages.set(key, loaded_page)
+        logger.debug("Страница рейтинга {} загружена из БД", key)
+        return loaded_page
+
+    return await leaderboard_loads.do(key, load)
@@ -1,10 +1,28 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey, Integer
+from sqlalchemy import String, ForeignKey, Index, Integer, SmallInteger, UniqueConstraint
 from bot.database import Base
 
 
+class Subjects(Base):
+    """
+    Справочник предметов
+    Баллы и гистограммы ссылаются на предмет по короткому числовому ID, названия загружаются в память
+    при запуске бота, поэтому новый предмет добавляется записью в эту таблицу, без изменения кода
+    """
+    id: Mapped[int] = mapped_column(SmallInteger, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+
+    def __str__(self):
+        return f"<Subject {self.id}: {self.name}>"
+
+
 class ExamScores(Base):
-    subject: Mapped[str] = mapped_column(String(100), nullable=False)
+    __table_args__ = (
+        # Один балл на предмет для каждого пользователя (используется при upsert)
+        UniqueConstraint("user_id", "subject_id", name="uq_examscores_user_id_subject_id"),
+    )
+
+    subject_id: Mapped[int] = mapped_column(SmallInteger, ForeignKey("subjects.id"), nullable=False)
     score: Mapped[int] = mapped_column(Integer, nullable=False)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
 
@@ -14,4 +32,25 @@ class ExamScores(Base):
     )
 
     def __str__(self):
-        return f"<Score {self.id}: {self.subject} {self.score}>"
+        return f"<Score {self.id}: {self.subject_id} {self.score}>"
+
+
+# Индекс для постраничного вывода рейтинга предмета в порядке (score DESC, id)
+Index("ix_examscores_subject_id_score_id", ExamScores.subject_id, ExamScores.score.desc(), ExamScores.id)
+
+
+class ScoreHistograms(Base):
+    """
+    Количество баллов по каждому значению (0-100) для каждого предмета
+    Поддерживается триггером на таблице examscores в той же транзакции, что и изменение балла
+    """
+    __table_args__ = (
+        UniqueConstraint("subject_id", "score", name="uq_scorehistograms_subject_id_score"),
+    )
+
+    subject_id: Mapped[int] = mapped_column(SmallInteger, ForeignKey("subjects.id"), nullable=False)
+    score: Mapped[int] = mapped_column(Integer, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+    def __str__(self):
+        return f"<ScoreHistogram {self.subject_id} {self.score}: {self.count}>"
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from typing import Dict, Iterable, List
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.config import settings
+from bot.database import connection
+from bot.scores.dao import ScoreHistogramsDAO
+from bot.scores.schemas import SubjectRankModel, SubjectScoreModel
+from bot.scores.subjects import subject_registry
+
+MAX_SCORE = 100
+
+
+@connection
+async def load_histograms(session: AsyncSession) -> Dict[str, List[int]]:
+    """Загружает гистограммы баллов всех предметов: предмет -> количество баллов для каждого значения 0-100"""
+    histograms: Dict[str, List[int]] = {}
+    for subject_id, score, count in await ScoreHistogramsDAO.find_counts(session):
+        subject = subject_registry.get_name(subject_id)
+        if subject is None or not 0 <= score <= MAX_SCORE:
+            continue
+        histograms.setdefault(subject, [0] * (MAX_SCORE + 1))[score] = count
+    return histograms
+
+
+class ScoreRanking:
+    """
+    Гистограммы баллов в памяти для расчета места и перцентиля за O(1)
+    Для каждого предмета хранятся накопленные суммы: below[s] - количество баллов ниже s.
+    Данные перечитываются из БД не чаще раза в ttl секунд (одним запросом на все предметы)
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._below: Dict[str, List[int]] = {}
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        """Помечает данные устаревшими (например, после сохранения балла в этом процессе)"""
+        self._loaded_at = None
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def refresh(self) -> None:
+        """Перечитывает гистограммы, если они устарели (параллельные вызовы ждут одну загрузку)"""
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            histograms = await load_histograms()
+            below = {}
+            for subject, counts in histograms.items():
+                prefix = [0] * (MAX_SCORE + 2)
+                for score, count in enumerate(counts):
+                    prefix[score + 1] = prefix[score] + count
+                below[subject] = prefix
+            self._below = below
+            self._loaded_at = time.monotonic()
+            logger.debug("Гистограммы баллов обновлены: {} предметов", len(below))
+
+    def rank(self, subject: str, score: int) -> SubjectRankModel | None:
+        """Место и перцентиль балла по предмету (None, если по предмету еще нет данных)"""
+        below = self._below.get(subject)
+        if not below or not below[-1]:
+            return None
+        total = below[-1]
+        higher = total - below[score + 1]
+        return SubjectRankModel(
+            subject=subject,
+            score=score,
+            place=higher + 1,
+            total=total,
+            percentile=round(below[score] / (total - 1) * 100, 1) if total > 1 else 100.0,
+        )
+
+    async def get_ranks(self, scores: Iterable[SubjectScoreModel]) -> List[SubjectRankModel]:
+        """Места и перцентили для списка баллов пользователя"""
+        await self.refresh()
+        ranks = [self.rank(item.subject, item.score) for item in scores]
+        return [rank for rank in ranks if rank is not None]
+
+
+score_ranking = ScoreRanking(ttl=settings.SCORE_HISTOGRAM_TTL)
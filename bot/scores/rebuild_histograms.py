@@ -0,0 +1,38 @@
+"""
+Пересчет гистограмм баллов по таблице examscores
+
+Гистограммы поддерживаются триггером, пересчет нужен только для исправления расхождений
+(например, после ручного изменения данных в обход триггера).
+
+Запуск:
+    python -m bot.scores.rebuild_histograms
+"""
+import asyncio
+from loguru import logger
+from bot.database import maintenance_engine, maintenance_session_maker
+from bot.scores.dao import ScoreHistogramsDAO
+
+
+async def rebuild_histograms() -> int:
+    """
+    Пересчитывает гистограммы через отдельное соединение для длительных операций: на большой таблице
+    examscores пересчет не укладывается в ограничения времени запросов пула обработчиков
+    """
+    async with maintenance_session_maker() as session:
+        try:
+            return await ScoreHistogramsDAO.rebuild(session)
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def main() -> None:
+    try:
+        buckets = await rebuild_histograms()
+        logger.info(f"Гистограммы баллов пересчитаны, непустых значений: {buckets}")
+    finally:
+        await maintenance_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,13 +1,17 @@
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.dispatcher.router import Router
 from aiogram.fsm.context import FSMContext
 from loguru import logger
 
-from bot.config import bot
-from bot.scores.keyboards import choose_subject_kb, confirm_kb
-from bot.scores.service import EnterScoreState, check_subject, EXAM_SUBJECTS, get_existing_score, save_score, \
-    validate_score, get_exam_scores, format_table
+from bot.scores.keyboards import choose_subject_kb, confirm_kb, leaderboard_subjects_kb, LeaderboardCallback, \
+    SubjectCallback, CancelCallback, ConfirmCallback
+from bot.scores.leaderboard import get_leaderboard_page
+from bot.scores.service import EnterScoreState, check_subject, get_existing_score, save_score, \
+    validate_score, get_exam_scores, format_table, is_bulk_input, parse_bulk_scores, save_scores, get_score_ranks, \
+    format_ranks, subject_registry
+from bot.scores.schemas import SubjectScoreModel
 from bot.users.router import cancel_handler
 from bot.users.service import check_user, add_remove_cancel_command
 
@@ -33,12 +37,19 @@ async def enter_score_handler(message: Message, state: FSMContext):
             logger.warning(f"Пользователь {telegram_id} не зарегистрирован")
             return
 
-        await message.answer("Введите название предмета:")
-        await add_remove_cancel_command(bot, message.chat.id, "add")
+        await message.answer(
+            "Введите название предмета.\n"
+            "Чтобы внести сразу несколько баллов, отправьте их одним сообщением, по предмету на строку:\n"
+            "```\n"
+            "Математика профиль 82\n"
+            "Физика 75\n"
+            "```"
+        )
+        await add_remove_cancel_command(message.chat.id, "add")
         await state.set_state(EnterScoreState.waiting_for_subject)
     except Exception as e:
         logger.error(f"Ошибка при обработке команды /enter_scores для пользователя {telegram_id}: {e}")
-        await add_remove_cancel_command(bot, message.chat.id, "remove")
+        await add_remove_cancel_command(message.chat.id, "remove")
         await state.clear()
         await message.answer("Произошла ошибка. Попробуйте снова позже")
 
@@ -52,6 +63,10 @@ async def handle_subject_input(message: Message, state: FSMContext):
     telegram_id = message.from_user.id
     subject_entered = message.text.strip()
 
+    if is_bulk_input(subject_entered):
+        await handle_bulk_input(message, state)
+        return
+
     try:
         matching_subjects = check_subject(subject_entered)
         if not matching_subjects:
@@ -64,35 +79,92 @@ async def handle_subject_input(message: Message, state: FSMContext):
             await message.answer("Подтвердите выбранный предмет:", reply_markup=subject_kb)
         else:
             await message.answer("Выберите подходящий предмет из списка:", reply_markup=subject_kb)
-        await add_remove_cancel_command(bot, message.chat.id, "add")
+        await add_remove_cancel_command(message.chat.id, "add")
         await state.set_state(EnterScoreState.waiting_for_confirmation)
     except Exception as e:
         logger.error(f"Ошибка при обработке предмета '{subject_entered}' для пользователя {telegram_id}: {e}")
-        await add_remove_cancel_command(bot, message.chat.id, "remove")
+        await add_remove_cancel_command(message.chat.id, "remove")
         await state.clear()
         await message.answer("Произошла ошибка. Попробуйте снова позже")
 
 
-@router.callback_query(EnterScoreState.waiting_for_confirmation)
-async def handle_subject_choice(callback: CallbackQuery, state: FSMContext):
+async def handle_bulk_input(message: Message, state: FSMContext):
+    """Разбирает сообщение с баллами по нескольким предметам и запрашивает подтверждение"""
+    telegram_id = message.from_user.id
+
+    try:
+        scores, errors = parse_bulk_scores(message.text)
+        if errors:
+            await message.answer(
+                "Не удалось разобрать сообщение:\n"
+                + "\n".join(errors)
+                + "\n\nИсправьте ошибки и отправьте баллы снова"
+            )
+            logger.info(f"Ошибки разбора баллов пользователя {telegram_id}: {errors}")
+            return
+
+        await message.answer(
+            format_table(scores, title="Сохранить баллы?"),
+            reply_markup=confirm_kb()
+        )
+        await state.update_data(scores=[score.model_dump() for score in scores])
+        await state.set_state(EnterScoreState.waiting_for_bulk_confirmation)
+    except Exception as e:
+        logger.error(f"Ошибка при разборе баллов для пользователя {telegram_id}: {e}")
+        await add_remove_cancel_command(message.chat.id, "remove")
+        await state.clear()
+        await message.answer("Произошла ошибка. Попробуйте снова позже")
+
+
+@router.callback_query(EnterScoreState.waiting_for_bulk_confirmation, ConfirmCallback.filter())
+async def handle_bulk_confirmation(callback: CallbackQuery, callback_data: ConfirmCallback, state: FSMContext):
+    """Сохраняет баллы по нескольким предметам одной транзакцией после подтверждения"""
+    telegram_id = callback.from_user.id
+    data = await state.get_data()
+    scores = [SubjectScoreModel(**score) for score in data.get("scores", [])]
+
+    try:
+        if callback_data.answer:
+            success = await save_scores(telegram_id, scores)
+            if success:
+                await callback.message.answer(f"Баллы успешно сохранены ({len(scores)})")
+                logger.info(f"Пользователь {telegram_id} сохранил баллы по {len(scores)} предметам")
+            else:
+                await callback.message.answer("Ошибка при сохранении баллов. Попробуйте позже")
+                logger.error(f"Ошибка сохранения баллов для пользователя {telegram_id}")
+        else:
+            await callback.message.answer("Действие отменено")
+            logger.info(f"Пользователь {telegram_id} отказался сохранять баллы")
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении баллов для пользователя {telegram_id}: {e}")
+        await callback.message.answer("Произошла ошибка. Попробуйте снова позже")
+
+    await add_remove_cancel_command(callback.message.chat.id, "remove")
+    await state.clear()
+
+
+@router.callback_query(EnterScoreState.waiting_for_confirmation, CancelCallback.filter())
+async def handle_subject_cancel(callback: CallbackQuery, state: FSMContext):
+    """Отмена выбора предмета"""
+    await callback.message.answer("Действие отменено")
+    logger.info(f"Пользователь {callback.from_user.id} отменил ввод предмета")
+    await add_remove_cancel_command(callback.message.chat.id, "remove")
+    await state.clear()
+
+
+@router.callback_query(EnterScoreState.waiting_for_confirmation, SubjectCallback.filter())
+async def handle_subject_choice(callback: CallbackQuery, callback_data: SubjectCallback, state: FSMContext):
     """
     Обрабатывает выбор предмета из инлайн-клавиатуры
     Проверяет наличие балла в базе и запрашивает действие
     """
     telegram_id = callback.from_user.id
-    selected_subject = callback.data
+    selected_subject = subject_registry.get_name(callback_data.code)
 
     try:
-        if selected_subject == "Отмена":
-            await callback.message.answer("Действие отменено")
-            logger.info(f"Пользователь {telegram_id} отменил ввод предмета")
-            await add_remove_cancel_command(bot, callback.message.chat.id, "remove")
-            await state.clear()
-            return
-
-        if selected_subject not in EXAM_SUBJECTS:
+        if selected_subject is None:
             await callback.message.answer("Выбранный предмет отсутствует в системе. Попробуйте снова")
-            logger.warning(f"Некорректный выбор предмета '{selected_subject}' от пользователя {telegram_id}")
+            logger.warning(f"Некорректный код предмета {callback_data.code} от пользователя {telegram_id}")
             await state.clear()
             return
 
@@ -112,37 +184,30 @@ async def handle_subject_choice(callback: CallbackQuery, state: FSMContext):
 
     except Exception as e:
         logger.error(f"Ошибка при выборе предмета '{selected_subject}' для пользователя {telegram_id}: {e}")
-        await add_remove_cancel_command(bot, callback.message.chat.id, "remove")
+        await add_remove_cancel_command(callback.message.chat.id, "remove")
         await state.clear()
         await callback.answer("Произошла ошибка. Попробуйте снова позже")
 
 
-@router.callback_query(EnterScoreState.waiting_for_confirmation_to_update)
-async def handle_score_update_confirmation(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(EnterScoreState.waiting_for_confirmation_to_update, ConfirmCallback.filter())
+async def handle_score_update_confirmation(callback: CallbackQuery, callback_data: ConfirmCallback, state: FSMContext):
     """Подтверждает обновление балла для предмета"""
     telegram_id = callback.from_user.id
-    confirmation = callback.data
     data = await state.get_data()
     selected_subject = data.get("subject")
 
     try:
-        if confirmation == "да":
+        if callback_data.answer:
             await callback.message.answer(f"Введите новый балл для предмета {selected_subject}:")
             await state.set_state(EnterScoreState.waiting_for_score)
-        elif confirmation == "нет":
+        else:
             await callback.message.answer("Действие отменено")
             logger.info(f"Пользователь {telegram_id} отказался обновлять балл для '{selected_subject}'")
-            await add_remove_cancel_command(bot, callback.message.chat.id, "remove")
+            await add_remove_cancel_command(callback.message.chat.id, "remove")
             await state.clear()
-        else:
-            await callback.message.answer(
-                "Ответ не распознан.\n"
-                f"Вы хотите изменить балл предмета {selected_subject}?",
-                reply_markup=confirm_kb()
-            )
     except Exception as e:
         logger.error(f"Ошибка при подтверждении обновления для пользователя {telegram_id}: {e}")
-        await add_remove_cancel_command(bot, callback.message.chat.id, "remove")
+        await add_remove_cancel_command(callback.message.chat.id, "remove")
         await state.clear()
         await callback.message.answer("Произошла ошибка. Попробуйте снова позже")
 
@@ -180,7 +245,7 @@ async def handle_score_input(message: Message, state: FSMContext):
         logger.error(f"Ошибка при вводе балла для пользователя {telegram_id}: {e}")
         await message.answer("Произошла ошибка. Попробуйте снова позже")
     finally:
-        await add_remove_cancel_command(bot, message.chat.id, "remove")
+        await add_remove_cancel_command(message.chat.id, "remove")
         await state.clear()
 
 
@@ -211,3 +276,86 @@ async def view_scores_handler(message: Message):
     except Exception as e:
         logger.error(f"Ошибка при обработке команды /view_scores для пользователя {telegram_id}: {e}")
         await message.answer("Произошла ошибка. Попробуйте снова позже")
+
+
+@router.message(Command("rank"))
+async def rank_handler(message: Message):
+    """Хендлер для команды /rank: место и перцентиль пользователя по каждому предмету"""
+    telegram_id = message.from_user.id
+    logger.info(f"Команда /rank от пользователя {telegram_id}")
+
+    try:
+        if not await check_user(telegram_id):
+            await message.answer(
+                "Вы не зарегистрированы.\n"
+                "Используйте команду /register для регистрации в системе"
+            )
+            logger.warning(f"Пользователь {telegram_id} не зарегистрирован")
+            return
+
+        ranks = await get_score_ranks(telegram_id)
+        if ranks:
+            await message.answer(format_ranks(ranks))
+        else:
+            await message.answer("У вас пока нет сохраненных баллов")
+            logger.info(f"У пользователя {telegram_id} нет сохраненных баллов")
+    except Exception as e:
+        logger.error(f"Ошибка при обработке команды /rank для пользователя {telegram_id}: {e}")
+        await message.answer("Произошла ошибка. Попробуйте снова позже")
+
+
+@router.message(Command("leaderboard"))
+async def leaderboard_handler(message: Message):
+    """Хендлер для команды /leaderboard: выбор предмета для просмотра рейтинга"""
+    telegram_id = message.from_user.id
+    logger.info(f"Команда /leaderboard от пользователя {telegram_id}")
+
+    try:
+        if not await check_user(telegram_id):
+            await message.answer(
+                "Вы не зарегистрированы.\n"
+                "Используйте команду /register для регистрации в системе"
+            )
+            logger.warning(f"Пользователь {telegram_id} не зарегистрирован")
+            return
+
+        await message.answer("Выберите предмет:", reply_markup=leaderboard_subjects_kb(subject_registry.names))
+    except Exception as e:
+        logger.error(f"Ошибка при обработке команды /leaderboard для пользователя {telegram_id}: {e}")
+        await message.answer("Произошла ошибка. Попробуйте снова позже")
+
+
+@router.callback_query(LeaderboardCallback.filter())
+async def handle_leaderboard_page(callback: CallbackQuery, callback_data: LeaderboardCallback):
+    """Показывает страницу рейтинга предмета (первую или соседнюю с текущей)"""
+    telegram_id = callback.from_user.id
+
+    try:
+        if subject_registry.get_name(callback_data.subject) is None:
+            await callback.answer("Предмет не найден")
+            logger.warning(f"Некорректный предмет рейтинга {callback_data.subject} от пользователя {telegram_id}")
+            return
+
+        after = before = None
+        if callback_data.after_score is not None and callback_data.after_id is not None:
+            after = (callback_data.after_score, callback_data.after_id)
+        elif callback_data.before_score is not None and callback_data.before_id is not None:
+            before = (callback_data.before_score, callback_data.before_id)
+
+        text, markup = await get_leaderboard_page(callback_data.subject, after=after, before=before)
+        try:
+            await callback.message.edit_text(text, reply_markup=markup)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in e.message:
+                raise  # Повторное нажатие на ту же кнопку ошибкой не считаем
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка при показе рейтинга для пользователя {telegram_id}: {e}")
+        await callback.answer("Произошла ошибка. Попробуйте снова позже")
+
+
+@router.callback_query()
+async def handle_stale_callback(callback: CallbackQuery):
+    """Нажатие кнопки, которая больше не действует (например, после завершения или отмены ввода)"""
+    logger.info(f"Устаревшая кнопка '{callback.data}' от пользователя {callback.from_user.id}")
+    await callback.answer("Кнопка больше не действует")
@@ -22,3 +22,13 @@ class ScoreModel(BaseModel):
 
 class UserExamScoreModel(UserSubjectModel, ScoreModel):
     pass
+
+
+class SubjectScoreModel(ScoreModel):
+    subject: str = Field(..., description="Название предмета")
+
+
+class SubjectRankModel(SubjectScoreModel):
+    place: int = Field(..., gt=0, description="Место среди всех участников (1 - лучший балл)")
+    total: int = Field(..., gt=0, description="Количество участников, сохранивших балл по предмету")
+    percentile: float = Field(..., ge=0, le=100, description="Доля остальных участников с более низким баллом (%)")
@@ -1,33 +1,15 @@
-from typing import Tuple, List
+import re
+from typing import Tuple, List, Sequence
 from aiogram.fsm.state import StatesGroup, State
-from difflib import get_close_matches
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 from bot.database import connection
-from bot.scores.dao import ExamScoresDAO
+from bot.scores.dao import ExamScoresDAO, SubjectsDAO
 from bot.scores.models import ExamScores
-from bot.scores.schemas import UserExamScoreModel, UserSubjectModel, ScoreModel, ExamScoreID, UserIDModel
-from bot.users.dao import UsersDAO
+from bot.scores.ranking import score_ranking
+from bot.scores.schemas import UserExamScoreModel, SubjectScoreModel, SubjectRankModel
+from bot.scores.subjects import subject_matcher, subject_registry
 from bot.users.models import Users
-from bot.users.schemas import TelegramIDModel
-
-EXAM_SUBJECTS = [
-    "Русский язык",
-    "Математика (базовая)",
-    "Математика (профильная)",
-    "Обществознание",
-    "История",
-    "Английский язык",
-    "Немецкий язык",
-    "Французский язык",
-    "Испанский язык",
-    "Литература",
-    "География",
-    "Физика",
-    "Химия",
-    "Биология",
-    "Информатика",
-]
 
 
 class EnterScoreState(StatesGroup):
@@ -35,28 +17,74 @@ class EnterScoreState(StatesGroup):
     waiting_for_confirmation = State()
     waiting_for_confirmation_to_update = State()
     waiting_for_score = State()
+    waiting_for_bulk_confirmation = State()
+
+
+# Строка вида "Предмет балл" (например, "Математика профиль 82" или "Физика - 75")
+BULK_LINE_PATTERN = re.compile(r"^(?P<subject>.*?)[\s:=—–-]*(?P<score>\d+)$")
+
+
+@connection
+async def fetch_subjects(session: AsyncSession) -> List[Tuple[int, str]]:
+    return await SubjectsDAO.find_names(session)
+
+
+async def load_subjects() -> None:
+    """Загружает справочник предметов из БД в память и перестраивает индекс поиска (при запуске бота)"""
+    subject_registry.load(await fetch_subjects())
+    subject_matcher.rebuild(subject_registry.names)
+    logger.info(f"Загружен справочник предметов: {len(subject_registry.names)}")
 
 
 def check_subject(subject_entered: str) -> List[str]:
     """Ищет подходящие предметы по введенному тексту"""
-    matching_subjects = [subject for subject in EXAM_SUBJECTS if subject_entered.lower() in subject.lower()]
-    if not matching_subjects:
-        matching_subjects = get_close_matches(subject_entered, EXAM_SUBJECTS, n=3, cutoff=0.3)
-    return matching_subjects
+    return list(subject_matcher.match(subject_entered))
+
+
+def is_bulk_input(text: str) -> bool:
+    """Проверяет, содержит ли сообщение баллы (строки вида "Предмет балл"), а не только название предмета"""
+    return any(BULK_LINE_PATTERN.match(line.strip()) for line in text.splitlines() if line.strip())
+
+
+def parse_bulk_scores(text: str) -> Tuple[List[SubjectScoreModel], List[str]]:
+    """
+    Разбирает сообщение с несколькими строками вида "Предмет балл"
+    Возвращает распознанные баллы и список ошибок по строкам
+    """
+    scores = {}
+    errors = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        match = BULK_LINE_PATTERN.match(line)
+        if not match or not match.group("subject"):
+            errors.append(f"Строка {line_number}: ожидается «Предмет балл»")
+            continue
+
+        score = match.group("score")
+        if not validate_score(score):
+            errors.append(f"Строка {line_number}: балл должен быть числом от 0 до 100")
+            continue
+
+        matching_subjects = check_subject(match.group("subject"))
+        if not matching_subjects:
+            errors.append(f"Строка {line_number}: не удалось определить предмет")
+        elif len(matching_subjects) > 1:
+            errors.append(f"Строка {line_number}: уточните предмет ({', '.join(matching_subjects)})")
+        else:
+            subject = matching_subjects[0]
+            scores[subject] = SubjectScoreModel(subject=subject, score=int(score))  # Повтор заменяет балл
+
+    return list(scores.values()), errors
 
 
 async def check_user_score(
         telegram_id: int, subject: str, session: AsyncSession
 ) -> Tuple[Users | None, ExamScores | None]:
-
-    user = await UsersDAO.find_one_or_none(session, TelegramIDModel(telegram_id=telegram_id))
-    if not user:
-        return None, None
-
-    user_score = await ExamScoresDAO.find_one_or_none(
-        session, filters=UserSubjectModel(user_id=user.id, subject=subject)
-    )
-    return user, user_score
+    """Получает пользователя и его балл по предмету одним запросом"""
+    return await ExamScoresDAO.find_user_score(session, telegram_id, subject_registry.get_id(subject))
 
 
 @connection
@@ -69,7 +97,7 @@ async def get_existing_score(telegram_id: int, subject: str, session: AsyncSessi
             return None
 
         if result:
-            return UserExamScoreModel(user_id=user.id, subject=result.subject, score=result.score)
+            return UserExamScoreModel(user_id=user.id, subject=subject, score=result.score)
         return None
 
     except Exception as e:
@@ -90,34 +118,39 @@ def validate_score(score: str) -> bool:
 async def save_score(telegram_id: int, subject: str, score: int, session: AsyncSession) -> bool:
     """Сохраняет или обновляет балл для указанного предмета"""
     try:
-        user, existing_score = await check_user_score(telegram_id, subject, session)
-        if not user:
+        score_id = await ExamScoresDAO.upsert_by_telegram_id(
+            session, telegram_id, subject_registry.get_id(subject), score
+        )
+        if score_id is None:
             logger.warning(f"Пользователь с Telegram ID {telegram_id} не найден")
+            return False
 
-        if existing_score:
-            # Обновляем балл, если запись найдена
-            updated_count = await ExamScoresDAO.update(
-                session, filters=ExamScoreID(id=existing_score.id),
-                values=ScoreModel(score=score)
-            )
-            if updated_count > 0:
-                logger.info(f"Балл для предмета {subject} обновлен для пользователя {user.id}. Новый балл: {score}")
-                return True
-            else:
-                logger.info(f"Не удалось обновить балл для предмета {subject} пользователя {user.id}")
-
-        else:
-            # Создаем новую запись, если её нет
-            new_score_schema = UserExamScoreModel(user_id=user.id, subject=subject, score=score)
-            new_score = await ExamScoresDAO.add(session, new_score_schema)
-            if new_score:
-                logger.info(f"Создание нового балла для предмета {subject} у пользователя {user.id}. Балл: {score}")
-                return True
+        score_ranking.invalidate()
+        logger.info(f"Балл для предмета {subject} сохранен для пользователя {telegram_id}. Балл: {score}")
+        return True
 
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении балла для пользователя {telegram_id} и предмета '{subject}': {e}")
         return False
 
+
+@connection
+async def save_scores(telegram_id: int, scores: Sequence[SubjectScoreModel], session: AsyncSession) -> bool:
+    """Сохраняет или обновляет баллы по нескольким предметам в одной транзакции"""
+    try:
+        saved_count = await ExamScoresDAO.upsert_many_by_telegram_id(
+            session, telegram_id, [(subject_registry.get_id(item.subject), item.score) for item in scores]
+        )
+        if not saved_count:
+            logger.warning(f"Пользователь с Telegram ID {telegram_id} не найден")
+            return False
+
+        score_ranking.invalidate()
+        logger.info(f"Сохранено баллов для пользователя {telegram_id}: {saved_count}")
+        return True
+
     except Exception as e:
-        logger.error(f"Ошибка при сохранении балла для пользователя {telegram_id} и предмета '{subject}': {e}")
+        logger.error(f"Ошибка при сохранении баллов для пользователя {telegram_id}: {e}")
         return False
 
 
@@ -125,20 +158,35 @@ async def save_score(telegram_id: int, subject: str, score: int, session: AsyncS
 async def get_exam_scores(telegram_id: int, session: AsyncSession) -> List[UserExamScoreModel] | None:
     """Получает список баллов пользователя по всем предметам"""
     try:
-        user = await UsersDAO.find_one_or_none(session, TelegramIDModel(telegram_id=telegram_id))
-        if not user:
-            logger.warning(f"Пользователь с Telegram ID {telegram_id} не найден")
-            return None
-
-        scores = await ExamScoresDAO.find_all(session, filters=UserIDModel(user_id=user.id))
-        return [UserExamScoreModel.model_validate(score) for score in scores] if scores else None
+        scores = await ExamScoresDAO.find_all_by_telegram_id(session, telegram_id)
+        return [
+            UserExamScoreModel(user_id=score.user_id, subject=subject_registry.get_name(score.subject_id), score=score.score)
+            for score in scores
+        ] if scores else None
 
     except Exception as e:
         logger.error(f"Ошибка при получении баллов для пользователя {telegram_id}: {e}")
         return None
 
 
-def format_table(scores: List[UserExamScoreModel]) -> str:
+async def get_score_ranks(telegram_id: int) -> List[SubjectRankModel]:
+    """Возвращает место и перцентиль пользователя по каждому предмету с сохраненным баллом"""
+    exam_scores = await get_exam_scores(telegram_id)
+    if not exam_scores:
+        return []
+    return await score_ranking.get_ranks(exam_scores)
+
+
+def format_ranks(ranks: Sequence[SubjectRankModel]) -> str:
+    lines = [
+        f"*{rank.subject}*: {rank.score} — место {rank.place} из {rank.total}, "
+        f"лучше, чем у {rank.percentile:g}% остальных участников"
+        for rank in ranks
+    ]
+    return "Ваши результаты среди пользователей бота:\n\n" + "\n".join(lines)
+
+
+def format_table(scores: Sequence[UserExamScoreModel | SubjectScoreModel], title: str = "Ваши баллы:") -> str:
     # Формируем таблицу с выравниванием
     delimiter_1 = f"{'-' * 30}"
     delimiter_2 = f"{'=' * 30}"
@@ -146,7 +194,7 @@ def format_table(scores: List[UserExamScoreModel]) -> str:
         [f"{score.subject:<25}{score.score:>5}\n{delimiter_1}" for score in scores]
     )
 
-    return "Ваши баллы:\n\n"\
+    return f"{title}\n\n"\
            "```\n"\
            f"{'Предмет':<25}{'Балл':>5}\n"\
            f"{delimiter_2}\n"\
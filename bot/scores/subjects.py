@@ -0,0 +1,213 @@
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set, Tuple
+from bot.config import settings
+
+# Предметы, с которыми создается справочник subjects (новые предметы добавляются записью в таблицу)
+EXAM_SUBJECTS = [
+    "Русский язык",
+    "Математика (базовая)",
+    "Математика (профильная)",
+    "Обществознание",
+    "История",
+    "Английский язык",
+    "Немецкий язык",
+    "Французский язык",
+    "Испанский язык",
+    "Литература",
+    "География",
+    "Физика",
+    "Химия",
+    "Биология",
+    "Информатика",
+]
+
+# Сокращения, разговорные и английские названия предметов
+SUBJECT_ALIASES: Dict[str, List[str]] = {
+    "Русский язык": ["русский", "рус", "русяз", "рус яз", "russian"],
+    "Математика (базовая)": [
+        "математика", "матеша", "матан", "мат", "математика база", "база", "базовая", "базовая математика",
+        "math", "maths",
+    ],
+    "Математика (профильная)": [
+        "математика", "матеша", "матан", "мат", "математика профиль", "профиль", "профильная", "профилька",
+        "профмат", "профильная математика", "math", "maths",
+    ],
+    "Обществознание": ["общество", "общага", "общест", "общ", "обществ", "social studies"],
+    "История": ["ист", "история россии", "history"],
+    "Английский язык": ["английский", "англ", "англ яз", "инглиш", "english", "eng"],
+    "Немецкий язык": ["немецкий", "нем", "немец", "german", "deutsch"],
+    "Французский язык": ["французский", "франц", "фр", "french"],
+    "Испанский язык": ["испанский", "исп", "spanish", "espanol"],
+    "Литература": ["лит", "литра", "лит ра", "литер", "literature"],
+    "География": ["гео", "геогр", "geography"],
+    "Физика": ["физ", "физон", "physics"],
+    "Химия": ["хим", "химоза", "chemistry"],
+    "Биология": ["био", "биол", "биоша", "biology"],
+    "Информатика": ["инфа", "инф", "информ", "икт", "программирование", "computer science", "cs"],
+}
+
+# Транслитерация латиницы в кириллицу (сначала многобуквенные сочетания)
+TRANSLIT = [
+    ("shch", "щ"), ("sch", "щ"), ("zh", "ж"), ("kh", "х"), ("ts", "ц"), ("ch", "ч"), ("sh", "ш"),
+    ("yu", "ю"), ("ya", "я"), ("yo", "е"), ("ye", "е"), ("iy", "ий"), ("yy", "ый"),
+    ("a", "а"), ("b", "б"), ("v", "в"), ("g", "г"), ("d", "д"), ("e", "е"), ("z", "з"), ("i", "и"),
+    ("y", "ы"), ("j", "й"), ("k", "к"), ("l", "л"), ("m", "м"), ("n", "н"), ("o", "о"), ("p", "п"),
+    ("r", "р"), ("s", "с"), ("t", "т"), ("u", "у"), ("f", "ф"), ("h", "х"), ("c", "к"), ("w", "в"),
+    ("x", "кс"), ("q", "к"),
+]
+TRANSLIT_PATTERN = re.compile("|".join(latin for latin, _ in TRANSLIT))
+TRANSLIT_MAP = dict(TRANSLIT)
+LATIN_PATTERN = re.compile("[a-z]")
+NON_WORD_PATTERN = re.compile(r"[^0-9a-zа-я]+")
+
+
+def normalize(text: str) -> str:
+    """Приводит название к нижнему регистру, заменяет ё на е и убирает знаки препинания"""
+    return NON_WORD_PATTERN.sub(" ", text.lower().replace("ё", "е")).strip()
+
+
+def transliterate(text: str) -> str:
+    """Переводит латиницу в кириллицу (matematika -> математика)"""
+    return TRANSLIT_PATTERN.sub(lambda match: TRANSLIT_MAP[match.group(0)], text)
+
+
+def trigrams(text: str) -> Set[str]:
+    """Множество триграмм строки с границами слова"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SubjectMatcher:
+    """
+    Индекс для поиска предмета по введенному тексту
+    Строится один раз из нормализованных названий и сокращений предметов и ищет по очереди:
+    точное совпадение, вхождение подстроки, затем похожесть по триграммам
+    """
+
+    def __init__(
+            self, subjects: Iterable[str], aliases: Dict[str, List[str]],
+            cutoff: float = 0.35, limit: int = 3, cache_size: int = 1024
+    ):
+        self.aliases = aliases
+        self.cutoff = cutoff
+        self.limit = limit
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+        self.rebuild(subjects)
+
+    def rebuild(self, subjects: Iterable[str]) -> None:
+        """Перестраивает индекс для нового списка предметов (например, после загрузки справочника из БД)"""
+        self.subjects = list(subjects)
+        order = {subject: i for i, subject in enumerate(self.subjects)}
+
+        # Нормализованная форма -> предметы (одна форма может относиться к нескольким предметам)
+        forms: Dict[str, Set[str]] = defaultdict(set)
+        for subject in self.subjects:
+            forms[normalize(subject)].add(subject)
+            for alias in self.aliases.get(subject, []):
+                forms[normalize(alias)].add(subject)
+        self._forms: List[Tuple[str, Tuple[str, ...]]] = [
+            (form, tuple(sorted(form_subjects, key=order.__getitem__))) for form, form_subjects in forms.items()
+        ]
+        self._exact: Dict[str, Tuple[str, ...]] = dict(self._forms)
+
+        # Триграмма -> номера форм, в которых она встречается
+        self._form_trigrams = [trigrams(form) for form, _ in self._forms]
+        self._trigram_index: Dict[str, List[int]] = defaultdict(list)
+        for i, form_trigrams in enumerate(self._form_trigrams):
+            for trigram in form_trigrams:
+                self._trigram_index[trigram].append(i)
+
+        self.match.cache_clear()
+
+    def _match(self, text: str) -> Tuple[str, ...]:
+        query = normalize(text)
+        if not query:
+            return ()
+        queries = [query]
+        if LATIN_PATTERN.search(query):
+            queries.append(transliterate(query))
+
+        for search in (self._match_exact, self._match_substring, self._match_similar):
+            found: List[str] = []
+            for candidate in queries:
+                found.extend(subject for subject in search(candidate) if subject not in found)
+            if found:
+                return tuple(found[:self.limit]) if search is self._match_similar else tuple(found)
+        return ()
+
+    def match_exact(self, text: str) -> Tuple[str, ...]:
+        """Ищет предметы только по точному совпадению названия или сокращения (без учета регистра)"""
+        return self._exact.get(normalize(text), ())
+
+    def _match_exact(self, query: str) -> Tuple[str, ...]:
+        return self._exact.get(query, ())
+
+    def _match_substring(self, query: str) -> List[str]:
+        if len(query) < 2:
+            return []
+        found: List[str] = []
+        for form, form_subjects in self._forms:
+            if query in form:
+                found.extend(subject for subject in form_subjects if subject not in found)
+        return found
+
+    def _match_similar(self, query: str) -> List[str]:
+        query_trigrams = trigrams(query)
+        shared: Dict[int, int] = defaultdict(int)
+        for trigram in query_trigrams:
+            for i in self._trigram_index.get(trigram, ()):
+                shared[i] += 1
+
+        # Коэффициент Дайса по триграммам
+        scored = sorted(
+            (
+                (2 * count / (len(query_trigrams) + len(self._form_trigrams[i])), i)
+                for i, count in shared.items()
+            ),
+            reverse=True,
+        )
+        found: List[str] = []
+        for similarity, i in scored:
+            if similarity < self.cutoff:
+                break
+            found.extend(subject for subject in self._forms[i][1] if subject not in found)
+        return found
+
+
+class SubjectRegistry:
+    """
+    Справочник предметов в памяти: ID <-> название
+    Загружается из таблицы subjects при запуске бота, баллы в БД хранят только ID предмета.
+    ID предмета используется и как короткий код в callback_data: он не меняется, поэтому кнопки
+    в уже отправленных сообщениях остаются действительными
+    """
+
+    def __init__(self):
+        self._names: Dict[int, str] = {}
+        self._ids: Dict[str, int] = {}
+
+    def load(self, subjects: Iterable[Tuple[int, str]]) -> None:
+        names = dict(sorted(subjects))
+        self._names = names
+        self._ids = {name: subject_id for subject_id, name in names.items()}
+
+    @property
+    def names(self) -> List[str]:
+        """Названия всех предметов в порядке ID"""
+        return list(self._names.values())
+
+    def get_name(self, subject_id: int) -> str | None:
+        """Название предмета по ID (None, если такого предмета нет)"""
+        return self._names.get(subject_id)
+
+    def get_id(self, name: str) -> int:
+        """ID предмета по точному названию (KeyError, если такого предмета нет)"""
+        return self._ids[name]
+
+
+# Индекс строится при импорте по списку по умолчанию и перестраивается после загрузки справочника
+subject_matcher = SubjectMatcher(EXAM_SUBJECTS, SUBJECT_ALIASES, cache_size=settings.SUBJECT_MATCH_CACHE_SIZE)
+
+subject_registry = SubjectRegistry()
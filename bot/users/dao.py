@@ -1,6 +1,40 @@
+from typing import List, Tuple
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from bot.dao.base import BaseDAO
 from bot.users.models import Users
 
 
 class UsersDAO(BaseDAO):
     model = Users
+
+    @classmethod
+    async def find_telegram_ids_after(cls, session: AsyncSession, after_id: int, limit: int) -> List[Tuple[int, int]]:
+        """
+        Получить пачку (ID, Telegram ID) пользователей с ID больше after_id в порядке ID
+        Постраничный обход по первичному ключу не замедляется с ростом номера страницы, в отличие от OFFSET
+        """
+        logger.debug("Поиск пользователей с ID больше {} (не больше {})", after_id, limit)
+        try:
+            query = (
+                select(cls.model.id, cls.model.telegram_id)
+                .where(cls.model.id > after_id)
+                .order_by(cls.model.id)
+                .limit(limit)
+            )
+            result = await session.execute(query)
+            return [tuple(row) for row in result.all()]
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске пользователей с ID больше {after_id}: {e}")
+            raise
+
+    @classmethod
+    async def count(cls, session: AsyncSession) -> int:
+        """Количество зарегистрированных пользователей"""
+        try:
+            return (await session.execute(select(func.count()).select_from(cls.model))).scalar_one()
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при подсчете пользователей: {e}")
+            raise
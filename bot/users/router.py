@@ -3,8 +3,7 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.dispatcher.router import Router
 from aiogram.fsm.context import FSMContext
 from loguru import logger
-from bot.config import bot
-from bot.scores.keyboards import confirm_kb
+from bot.scores.keyboards import confirm_kb, ConfirmCallback
 from bot.users.service import RegisterState, register_user, check_user, update_commands_based_on_registration, \
     check_name, add_remove_cancel_command
 
@@ -20,34 +19,20 @@ async def start_handler(message: Message, state: FSMContext):
     telegram_id = message.from_user.id
     logger.info(f"Команда /start от пользователя с Telegram ID: {telegram_id}")
 
-    # Проверка пользователя
+    # Проверка пользователя и обновление команд в зависимости от регистрации
     existing_user = await check_user(telegram_id)
+    update_commands_based_on_registration(message.chat.id, existing_user is not None)
     if existing_user:
-        # Обновление команд для зарегистрированного пользователя
-        commands_updated = await update_commands_based_on_registration(bot, message.chat.id, True)
-        if commands_updated:
-            await message.answer(
-                f"С возвращением, {existing_user.full_name()}!\n"
-                "Вы уже зарегистрированы. Используйте команды /enter\\_scores и /view\\_scores "
-                "для работы с баллами ЕГЭ\n"
-                "Для редактирования аккаунта используйте команду /register"
-            )
-        else:
-            await message.answer(
-                "Вы уже зарегистрированы, но произошла ошибка при обновлении команд. "
-                "Функционал может работать некорректно"
-            )
+        await message.answer(
+            f"С возвращением, {existing_user.full_name()}!\n"
+            "Вы уже зарегистрированы. Используйте команды /enter\\_scores и /view\\_scores "
+            "для работы с баллами ЕГЭ\n"
+            "Для редактирования аккаунта используйте команду /register"
+        )
     else:
-        # Обновление команд для незарегистрированного пользователя
-        commands_updated = await update_commands_based_on_registration(bot, message.chat.id, False)
-        if commands_updated:
-            await message.answer(
-                "Добро пожаловать! Чтобы продолжить, пожалуйста, зарегистрируйтесь, используя команду /register"
-            )
-        else:
-            await message.answer(
-                "Произошла ошибка при обновлении команд. Функционал может работать некорректно"
-            )
+        await message.answer(
+            "Добро пожаловать! Чтобы продолжить, пожалуйста, зарегистрируйтесь, используя команду /register"
+        )
 
 
 @router.message(Command("register"))
@@ -73,41 +58,34 @@ async def register_handler(message: Message, state: FSMContext):
             return
     except Exception as e:
         logger.error(f"Ошибка при проверке регистрации пользователя {telegram_id}: {e}")
-        await add_remove_cancel_command(bot, message.chat.id, "remove")
+        await add_remove_cancel_command(message.chat.id, "remove")
         await state.clear()
         await message.answer("Ошибка при проверке данных. Попробуйте позже")
         return
 
     await message.answer("Введите ваше имя:")
-    await add_remove_cancel_command(bot, message.chat.id, "add")
+    await add_remove_cancel_command(message.chat.id, "add")
     await state.set_state(RegisterState.waiting_for_first_name)
 
 
-@router.callback_query(RegisterState.waiting_for_confirmation_to_update)
-async def handle_profile_update_confirmation(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(RegisterState.waiting_for_confirmation_to_update, ConfirmCallback.filter())
+async def handle_profile_update_confirmation(callback: CallbackQuery, callback_data: ConfirmCallback, state: FSMContext):
     """Подтверждает обновление имени и фамилии пользователя"""
     telegram_id = callback.from_user.id
-    confirmation = callback.data
 
     try:
-        if confirmation == "да":
-            await add_remove_cancel_command(bot, callback.message.chat.id, "add")
+        if callback_data.answer:
+            await add_remove_cancel_command(callback.message.chat.id, "add")
             await callback.message.answer(f"Введите новое имя:")
             await state.update_data(update_profile=True)
             await state.set_state(RegisterState.waiting_for_first_name)
-        elif confirmation == "нет":
+        else:
             await callback.message.answer("Действие отменено")
             logger.info(f"Пользователь {telegram_id} отказался обновлять данные аккаунта")
             await state.clear()
-        else:
-            await callback.message.answer(
-                "Ответ не распознан.\n"
-                f"Хотите изменить данные аккаунта?",
-                reply_markup=confirm_kb()
-            )
     except Exception as e:
         logger.error(f"Ошибка при подтверждении обновления для пользователя {telegram_id}: {e}")
-        await add_remove_cancel_command(bot, callback.message.chat.id, "remove")
+        await add_remove_cancel_command(callback.message.chat.id, "remove")
         await state.clear()
         await callback.message.answer("Произошла ошибка. Попробуйте снова позже")
 
@@ -146,7 +124,7 @@ async def get_last_name(message: Message, state: FSMContext):
         try:
             # Сохранение данных пользователя
             await register_user(telegram_id, first_name, last_name, update=update_profile)
-            await update_commands_based_on_registration(bot, message.chat.id, True)  # Обновление команд
+            update_commands_based_on_registration(message.chat.id, True)  # Обновление команд
             message_include = "Аккаунт обновлен!\nВаши новые данные:" if update_profile \
                 else "Регистрация завершена!\nВаши данные:\n"
             await message.answer(
@@ -166,7 +144,7 @@ async def get_last_name(message: Message, state: FSMContext):
             logger.error(f"Ошибка при регистрации пользователя {telegram_id}: {e}")
             await message.answer("Произошла ошибка при регистрации. Попробуйте позже")
         finally:
-            await add_remove_cancel_command(bot, message.chat.id, "remove")
+            await add_remove_cancel_command(message.chat.id, "remove")
             await state.clear()
 
     else:
@@ -182,6 +160,6 @@ async def cancel_handler(message: Message, state: FSMContext):
     if current_state:
         await state.clear()
         await message.answer("Действие отменено. Вы можете начать заново")
-        await add_remove_cancel_command(bot, message.chat.id, "remove")
+        await add_remove_cancel_command(message.chat.id, "remove")
     else:
         await message.answer("Нет активного действия для отмены")
@@ -1,11 +1,14 @@
 import re
-from typing import Union
-from aiogram import Bot
-from aiogram.types import BotCommand, BotCommandScopeChat
+from typing import List
+from aiogram.types import BotCommand
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from aiogram.fsm.state import StatesGroup, State
 from loguru import logger
+from bot.admin.filters import is_admin
+from bot.cache import TTLCache, NOT_CACHED
+from bot.commands.sync import ChatCommandsSync
+from bot.config import bot, settings
 from bot.database import connection
 from bot.users.dao import UsersDAO
 from bot.users.schemas import TelegramIDModel, TelegramUserModel, UserModel
@@ -17,38 +20,75 @@ class RegisterState(StatesGroup):
     waiting_for_confirmation_to_update = State()
 
 
+# Кэш пользователей по Telegram ID (хранит и отрицательные результаты проверки)
+user_cache: TTLCache[int, TelegramUserModel | None] = TTLCache(
+    maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL
+)
+
+
+async def check_user(telegram_id: int) -> TelegramUserModel | None:
+    """Проверяет, существует ли пользователь с указанным Telegram ID (сначала в кэше, затем в БД)"""
+    cached_user = user_cache.get(telegram_id)
+    if cached_user is not NOT_CACHED:
+        return cached_user
+    return await fetch_user(telegram_id)
+
+
 @connection
-async def check_user(telegram_id: int, session: AsyncSession) -> TelegramUserModel | None:
-    """Проверяет, существует ли пользователь с указанным Telegram ID"""
+async def fetch_user(telegram_id: int, session: AsyncSession) -> TelegramUserModel | None:
+    """Загружает пользователя с указанным Telegram ID из БД и обновляет кэш"""
     try:
         logger.info(f"Проверка пользователя с Telegram ID: {telegram_id}")
         user = await UsersDAO.find_one_or_none(session, TelegramIDModel(telegram_id=telegram_id))
-        return TelegramUserModel.model_validate(user) if user else None
+        if user:
+            user_data = TelegramUserModel.model_validate(user)
+            user_cache.set(telegram_id, user_data)
+            return user_data
+        user_cache.set(telegram_id, None, ttl=settings.USER_CACHE_NEGATIVE_TTL)
+        return None
     except Exception as e:
         logger.error(f"Ошибка при проверке пользователя с Telegram ID {telegram_id}: {e}")
         return None
 
 
-async def update_commands_based_on_registration(bot: Bot, chat_id: Union[int, str], is_registered: bool) -> bool:
-    """Обновляет доступные команды для пользователя в зависимости от статуса регистрации"""
-    try:
-        if is_registered:
-            commands = [
-                BotCommand(command="enter_scores", description="Ввести баллы ЕГЭ"),
-                BotCommand(command="view_scores", description="Посмотреть баллы ЕГЭ"),
-                BotCommand(command="register", description="Редактировать аккаунт")
-            ]
-        else:
-            commands = [
-                BotCommand(command="register", description="Зарегистрироваться"),
-            ]
-        scope = BotCommandScopeChat(chat_id=chat_id)
-        await bot.set_my_commands(commands, scope=scope)
-        logger.info(f"Обновлены команды для чата {chat_id}")
-        return True
-    except Exception as e:
-        logger.error(f"Ошибка при обновлении команд для чата {chat_id}: {e}")
-        return False
+CANCEL_COMMAND = BotCommand(command="cancel", description="Отмена")
+
+# Наборы команд чатов: изменения устанавливаются в Telegram в фоне и только если набор действительно изменился
+chat_commands = ChatCommandsSync(
+    bot,
+    flush_interval=settings.CHAT_COMMANDS_FLUSH_INTERVAL,
+    cache_size=settings.CHAT_COMMANDS_CACHE_SIZE,
+    cache_ttl=settings.CHAT_COMMANDS_CACHE_TTL,
+)
+
+
+def build_commands(chat_id: int, is_registered: bool) -> List[BotCommand]:
+    """Набор команд для пользователя в зависимости от статуса регистрации"""
+    if not is_registered:
+        return [BotCommand(command="register", description="Зарегистрироваться")]
+
+    commands = [
+        BotCommand(command="enter_scores", description="Ввести баллы ЕГЭ"),
+        BotCommand(command="view_scores", description="Посмотреть баллы ЕГЭ"),
+        BotCommand(command="rank", description="Место среди участников"),
+        BotCommand(command="leaderboard", description="Рейтинг по предмету"),
+        BotCommand(command="register", description="Редактировать аккаунт")
+    ]
+    if is_admin(chat_id):
+        commands += [
+            BotCommand(command="export", description="Выгрузить баллы в CSV"),
+            BotCommand(command="import", description="Загрузить баллы из CSV"),
+            BotCommand(command="broadcast", description="Рассылка всем пользователям"),
+        ]
+    return commands
+
+
+def update_commands_based_on_registration(chat_id: int, is_registered: bool) -> None:
+    """
+    Обновляет доступные команды для пользователя в зависимости от статуса регистрации
+    Запрос к Telegram выполняется в фоне и только при изменении набора команд
+    """
+    chat_commands.set(chat_id, build_commands(chat_id, is_registered))
 
 
 async def check_name(name: str) -> str | None:
@@ -98,6 +138,10 @@ async def register_user(
                 values=UserModel(first_name=first_name, last_name=last_name)
             )
             if updated_rows:
+                user_cache.set(
+                    telegram_id,
+                    TelegramUserModel(telegram_id=telegram_id, first_name=first_name, last_name=last_name)
+                )
                 logger.info(f"Данные пользователя (Telegram ID: {telegram_id}) успешно обновлены")
                 return
             else:
@@ -110,28 +154,35 @@ async def register_user(
         )
         logger.info(f"Регистрация нового пользователя: {user_data}")
         await UsersDAO.add(session, user_data)
+        user_cache.set(telegram_id, user_data)
         logger.info(f"Пользователь {first_name} {last_name} (Telegram ID: {telegram_id}) успешно зарегистрирован")
     except IntegrityError:
         logger.warning(f"Пользователь с Telegram ID {telegram_id} уже существует в базе")
+        user_cache.pop(telegram_id)  # Запись в кэше устарела, перечитаем пользователя из БД
         if not update:
             raise ValueError("Пользователь уже зарегистрирован")
     except Exception as e:
         logger.error(f"Ошибка при регистрации пользователя {telegram_id}: {e}")
+        user_cache.pop(telegram_id)
         raise
 
 
-async def add_remove_cancel_command(bot: Bot, chat_id: Union[int, str], action: str):
-    """Добавляет или удаляет команду /cancel для конкретного чата"""
-    scope = BotCommandScopeChat(chat_id=chat_id)
-    commands = await bot.get_my_commands(scope=scope)
-    cancel_command = BotCommand(command="cancel", description="Отмена")
+async def add_remove_cancel_command(chat_id: int, action: str):
+    """
+    Добавляет или удаляет команду /cancel для конкретного чата
+    Запрос в Telegram отправляется в фоне и только при изменении набора команд
+    """
+    commands = await chat_commands.get(chat_id)
+    if commands is None:
+        # Набор команд чата еще не устанавливался - берем набор по статусу регистрации
+        commands = build_commands(chat_id, await check_user(chat_id) is not None)
+
+    has_cancel = any(cmd.command == CANCEL_COMMAND.command for cmd in commands)
 
-    if action == "add" and cancel_command not in commands:
+    if action == "add" and not has_cancel:
         # Добавляем команду, если её ещё нет
-        commands.append(cancel_command)
-        await bot.set_my_commands(commands, scope=scope)
+        chat_commands.set(chat_id, [*commands, CANCEL_COMMAND])
 
-    elif action == "remove":
+    elif action == "remove" and has_cancel:
         # Удаляем команду, если она существует
-        commands = [cmd for cmd in commands if cmd.command != cancel_command.command]
-        await bot.set_my_commands(commands, scope=scope)
+        chat_commands.set(chat_id, [cmd for cmd in commands if cmd.command != CANCEL_COMMAND.command])
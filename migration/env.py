@@ -7,7 +7,10 @@ from alembic import context
 from bot.config import database_url
 from bot.database import Base
 from bot.users.models import Users
-from bot.scores.models import ExamScores
+from bot.scores.models import ExamScores, ScoreHistograms, Subjects
+from bot.fsm.models import FSMStates
+from bot.broadcast.models import Broadcasts
+from bot.commands.models import ChatCommands
 
 config = context.config
 config.set_main_option("sqlalchemy.url", database_url)
@@ -0,0 +1,122 @@
+"""Use statement-level triggers for score histograms
+
+Revision ID: 388748ad409f
+Revises: 828360f756a2
+Create Date: 2026-10-18 00:28:24.319269
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '388748ad409f'
+down_revision: Union[str, None] = '828360f756a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Построчный триггер при массовой записи многократно обновляет одни и те же строки гистограммы внутри
+# транзакции, и каждое следующее обновление обходится дороже. Триггеры уровня оператора получают
+# все измененные строки (transition tables) и применяют к гистограмме одно изменение на значение балла.
+# При обновлении старые значения вычитаются, новые прибавляются, а неизмененные баллы взаимно сокращаются.
+# Строки гистограммы обновляются в порядке (subject, score), чтобы параллельные транзакции не взаимоблокировались
+STATEMENT_FUNCTION = """
+CREATE FUNCTION examscores_update_histogram_batch() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO scorehistograms (subject, score, count)
+        SELECT subject, score, count(*) FROM new_rows
+        GROUP BY subject, score ORDER BY subject, score
+        ON CONFLICT (subject, score) DO UPDATE SET count = scorehistograms.count + excluded.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO scorehistograms (subject, score, count)
+        SELECT subject, score, -count(*) FROM old_rows
+        GROUP BY subject, score ORDER BY subject, score
+        ON CONFLICT (subject, score) DO UPDATE SET count = scorehistograms.count + excluded.count;
+    ELSE
+        INSERT INTO scorehistograms (subject, score, count)
+        SELECT subject, score, sum(delta) FROM (
+            SELECT subject, score, -1 AS delta FROM old_rows
+            UNION ALL
+            SELECT subject, score, 1 AS delta FROM new_rows
+        ) AS changes
+        GROUP BY subject, score HAVING sum(delta) <> 0 ORDER BY subject, score
+        ON CONFLICT (subject, score) DO UPDATE SET count = scorehistograms.count + excluded.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+ROW_FUNCTION = """
+CREATE FUNCTION examscores_update_histogram() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE scorehistograms SET count = count - 1
+        WHERE subject = OLD.subject AND score = OLD.score;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO scorehistograms (subject, score, count) VALUES (NEW.subject, NEW.score, 1)
+        ON CONFLICT (subject, score) DO UPDATE SET count = scorehistograms.count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.execute("DROP TRIGGER examscores_histogram_update ON examscores")
+    op.execute("DROP TRIGGER examscores_histogram_insert_delete ON examscores")
+    op.execute("DROP FUNCTION examscores_update_histogram()")
+
+    op.execute(STATEMENT_FUNCTION)
+    op.execute(
+        """
+        CREATE TRIGGER examscores_histogram_insert
+        AFTER INSERT ON examscores REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION examscores_update_histogram_batch()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER examscores_histogram_update
+        AFTER UPDATE ON examscores REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION examscores_update_histogram_batch()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER examscores_histogram_delete
+        AFTER DELETE ON examscores REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION examscores_update_histogram_batch()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER examscores_histogram_delete ON examscores")
+    op.execute("DROP TRIGGER examscores_histogram_update ON examscores")
+    op.execute("DROP TRIGGER examscores_histogram_insert ON examscores")
+    op.execute("DROP FUNCTION examscores_update_histogram_batch()")
+
+    op.execute(ROW_FUNCTION)
+    op.execute(
+        """
+        CREATE TRIGGER examscores_histogram_insert_delete
+        AFTER INSERT OR DELETE ON examscores
+        FOR EACH ROW EXECUTE FUNCTION examscores_update_histogram()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER examscores_histogram_update
+        AFTER UPDATE OF subject, score ON examscores
+        FOR EACH ROW
+        WHEN (OLD.subject IS DISTINCT FROM NEW.subject OR OLD.score IS DISTINCT FROM NEW.score)
+        EXECUTE FUNCTION examscores_update_histogram()
+        """
+    )
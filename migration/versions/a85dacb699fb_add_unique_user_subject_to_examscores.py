@@ -0,0 +1,36 @@
+"""Add unique (user_id, subject) constraint to examscores
+
+Revision ID: a85dacb699fb
+Revises: 6f7fffcd42cb
+Create Date: 2026-10-17 23:55:12.418263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a85dacb699fb'
+down_revision: Union[str, None] = '6f7fffcd42cb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Удаляем дубликаты, оставляя самую позднюю запись для каждой пары (user_id, subject)
+    op.execute(
+        """
+        DELETE FROM examscores AS e
+        USING examscores AS newer
+        WHERE e.user_id = newer.user_id
+          AND e.subject = newer.subject
+          AND e.id < newer.id
+        """
+    )
+    op.create_unique_constraint('uq_examscores_user_id_subject', 'examscores', ['user_id', 'subject'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_examscores_user_id_subject', 'examscores', type_='unique')
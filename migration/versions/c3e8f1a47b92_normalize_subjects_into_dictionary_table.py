@@ -0,0 +1,170 @@
+"""Normalize subjects into dictionary table
+
+Revision ID: c3e8f1a47b92
+Revises: 9a24dddaa468
+Create Date: 2026-10-18 02:14:37.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8f1a47b92'
+down_revision: Union[str, None] = '9a24dddaa468'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Предметы на момент миграции. ID совпадают с прежними кодами предметов в callback_data (номер в списке),
+# поэтому кнопки в уже отправленных сообщениях остаются действительными. Дальше справочник меняется только данными
+SUBJECTS = [
+    "Русский язык",
+    "Математика (базовая)",
+    "Математика (профильная)",
+    "Обществознание",
+    "История",
+    "Английский язык",
+    "Немецкий язык",
+    "Французский язык",
+    "Испанский язык",
+    "Литература",
+    "География",
+    "Физика",
+    "Химия",
+    "Биология",
+    "Информатика",
+]
+
+# Функция триггеров гистограммы (см. 388748ad409f) для столбца предмета {column}
+STATEMENT_FUNCTION = """
+CREATE OR REPLACE FUNCTION examscores_update_histogram_batch() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO scorehistograms ({column}, score, count)
+        SELECT {column}, score, count(*) FROM new_rows
+        GROUP BY {column}, score ORDER BY {column}, score
+        ON CONFLICT ({column}, score) DO UPDATE SET count = scorehistograms.count + excluded.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO scorehistograms ({column}, score, count)
+        SELECT {column}, score, -count(*) FROM old_rows
+        GROUP BY {column}, score ORDER BY {column}, score
+        ON CONFLICT ({column}, score) DO UPDATE SET count = scorehistograms.count + excluded.count;
+    ELSE
+        INSERT INTO scorehistograms ({column}, score, count)
+        SELECT {column}, score, sum(delta) FROM (
+            SELECT {column}, score, -1 AS delta FROM old_rows
+            UNION ALL
+            SELECT {column}, score, 1 AS delta FROM new_rows
+        ) AS changes
+        GROUP BY {column}, score HAVING sum(delta) <> 0 ORDER BY {column}, score
+        ON CONFLICT ({column}, score) DO UPDATE SET count = scorehistograms.count + excluded.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+TRIGGERS = {
+    "examscores_histogram_insert": "AFTER INSERT ON examscores REFERENCING NEW TABLE AS new_rows",
+    "examscores_histogram_update": "AFTER UPDATE ON examscores REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "examscores_histogram_delete": "AFTER DELETE ON examscores REFERENCING OLD TABLE AS old_rows",
+}
+
+
+def drop_triggers() -> None:
+    # Заполнение нового столбца обновляет все строки examscores, гистограмма при этом не меняется
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER {name} ON examscores")
+
+
+def create_triggers(column: str) -> None:
+    op.execute(STATEMENT_FUNCTION.format(column=column))
+    for name, event in TRIGGERS.items():
+        op.execute(
+            f"CREATE TRIGGER {name} {event} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION examscores_update_histogram_batch()"
+        )
+
+
+def rebuild_histograms(column: str) -> None:
+    op.execute("DELETE FROM scorehistograms")
+    op.execute(
+        f"""
+        INSERT INTO scorehistograms ({column}, score, count)
+        SELECT {column}, score, count(*) FROM examscores GROUP BY {column}, score
+        """
+    )
+
+
+def upgrade() -> None:
+    subjects = op.create_table('subjects',
+    sa.Column('id', sa.SmallInteger(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    # С драйвером asyncpg SQLAlchemy создает автоинкрементный SmallInteger как SERIAL (integer)
+    op.execute("ALTER SEQUENCE subjects_id_seq AS smallint")
+    op.alter_column('subjects', 'id', type_=sa.SmallInteger(), existing_nullable=False)
+    op.bulk_insert(subjects, [{"id": subject_id, "name": name} for subject_id, name in enumerate(SUBJECTS)])
+    op.execute("SELECT setval('subjects_id_seq', (SELECT max(id) FROM subjects))")
+    # Названия, которых нет в списке (если они попали в таблицу в обход бота), тоже становятся предметами
+    op.execute(
+        """
+        INSERT INTO subjects (name)
+        SELECT DISTINCT subject FROM examscores ORDER BY subject
+        ON CONFLICT (name) DO NOTHING
+        """
+    )
+
+    drop_triggers()
+    op.add_column('examscores', sa.Column('subject_id', sa.SmallInteger(), nullable=True))
+    op.execute("UPDATE examscores AS e SET subject_id = s.id FROM subjects AS s WHERE s.name = e.subject")
+    op.alter_column('examscores', 'subject_id', nullable=False)
+    op.drop_index('ix_examscores_subject_score_id', table_name='examscores')
+    op.drop_constraint('uq_examscores_user_id_subject', 'examscores', type_='unique')
+    op.drop_column('examscores', 'subject')
+    op.create_foreign_key('examscores_subject_id_fkey', 'examscores', 'subjects', ['subject_id'], ['id'])
+    op.create_unique_constraint('uq_examscores_user_id_subject_id', 'examscores', ['user_id', 'subject_id'])
+    op.create_index(
+        'ix_examscores_subject_id_score_id', 'examscores', ['subject_id', sa.text('score DESC'), 'id'], unique=False
+    )
+
+    # Гистограммы полностью пересчитываются по examscores
+    op.drop_constraint('uq_scorehistograms_subject_score', 'scorehistograms', type_='unique')
+    op.drop_column('scorehistograms', 'subject')
+    op.execute("DELETE FROM scorehistograms")
+    op.add_column('scorehistograms', sa.Column('subject_id', sa.SmallInteger(), nullable=False))
+    op.create_foreign_key('scorehistograms_subject_id_fkey', 'scorehistograms', 'subjects', ['subject_id'], ['id'])
+    op.create_unique_constraint('uq_scorehistograms_subject_id_score', 'scorehistograms', ['subject_id', 'score'])
+    rebuild_histograms('subject_id')
+    create_triggers('subject_id')
+
+
+def downgrade() -> None:
+    drop_triggers()
+    op.add_column('examscores', sa.Column('subject', sa.String(length=100), nullable=True))
+    op.execute("UPDATE examscores AS e SET subject = s.name FROM subjects AS s WHERE s.id = e.subject_id")
+    op.alter_column('examscores', 'subject', nullable=False)
+    op.drop_index('ix_examscores_subject_id_score_id', table_name='examscores')
+    op.drop_constraint('uq_examscores_user_id_subject_id', 'examscores', type_='unique')
+    op.drop_constraint('examscores_subject_id_fkey', 'examscores', type_='foreignkey')
+    op.drop_column('examscores', 'subject_id')
+    op.create_unique_constraint('uq_examscores_user_id_subject', 'examscores', ['user_id', 'subject'])
+    op.create_index('ix_examscores_subject_score_id', 'examscores', ['subject', sa.text('score DESC'), 'id'], unique=False)
+
+    op.drop_constraint('uq_scorehistograms_subject_id_score', 'scorehistograms', type_='unique')
+    op.drop_constraint('scorehistograms_subject_id_fkey', 'scorehistograms', type_='foreignkey')
+    op.drop_column('scorehistograms', 'subject_id')
+    op.execute("DELETE FROM scorehistograms")
+    op.add_column('scorehistograms', sa.Column('subject', sa.String(length=100), nullable=False))
+    op.create_unique_constraint('uq_scorehistograms_subject_score', 'scorehistograms', ['subject', 'score'])
+    rebuild_histograms('subject')
+    create_triggers('subject')
+
+    op.drop_table('subjects')